@@ -0,0 +1,108 @@
+"""
+Activity state from the two leg IMUs, classified once per logged second.
+
+Each MPU-6050 keeps its last WINDOW_SAMPLES accelerometer readings in an array
+(mpu6050.accel_window). window_features() turns both legs' windows into four numbers in
+one pass of array maths:
+
+- magnitude_var: variance of |accel| (g^2), averaged over the legs
+- dominant_freq: gait frequency (Hz) at the autocorrelation peak, both legs pooled
+- periodicity: height of that peak (0-1); rhythmic gait is high, play / scratching low
+- leg_corr: correlation of the two legs' |accel|; alternating legs are negative
+
+and a small decision tree (TREE) maps them to rest / active / walk / trot / run
+(gaits split by dominant frequency, with hard impacts counted as running). The
+tree is plain arrays, so predict() also runs over many windows at once (tuning
+against labelled recordings).
+"""
+from typing import Optional
+
+import numpy as np
+
+IMU_RATE_HZ = 50
+WINDOW_SAMPLES = 128  # 2.56 s at 50 Hz (mpu6050.MOTION_HISTORY)
+
+# Stored per row as the index, so new labels are appended
+ACTIVITY_LABELS = ("rest", "active", "walk", "run", "trot")
+REST, ACTIVE, WALK, RUN, TROT = range(len(ACTIVITY_LABELS))
+# Labels where the legs are moving through a gait (the dog is on its feet)
+GAITS = (WALK, TROT, RUN)
+
+FEATURES = ("magnitude_var", "dominant_freq", "periodicity", "leg_corr")
+MAGNITUDE_VAR, DOMINANT_FREQ, PERIODICITY, LEG_CORR = range(len(FEATURES))
+
+# Gait frequencies searched for the autocorrelation peak
+MIN_GAIT_HZ = 0.5
+MAX_GAIT_HZ = 5.0
+
+# Decision tree: node -> (feature, threshold, next if <=, next if >); a next
+# value < 0 is the leaf -(label + 1). Thresholds are placeholders to tune.
+_LEAF = [-(label + 1) for label in range(len(ACTIVITY_LABELS))]
+TREE = np.array([
+    (MAGNITUDE_VAR, 1e-3, _LEAF[REST], 1),    # still
+    (PERIODICITY, 0.4, _LEAF[ACTIVE], 2),     # moving without a gait rhythm
+    (DOMINANT_FREQ, 2.2, 3, 5),               # faster than a walk
+    (MAGNITUDE_VAR, 0.5, 4, _LEAF[RUN]),      # hard impacts
+    (LEG_CORR, 0.5, _LEAF[WALK], _LEAF[ACTIVE]),  # legs in phase: hopping / shaking
+    (DOMINANT_FREQ, 3.2, 6, _LEAF[RUN]),      # faster than a trot
+    (MAGNITUDE_VAR, 0.5, _LEAF[TROT], _LEAF[RUN]),  # hard impacts
+])
+TREE_FEATURE = TREE[:, 0].astype(np.intp)
+TREE_THRESHOLD = TREE[:, 1]
+TREE_NEXT = TREE[:, 2:].astype(np.intp)
+# The same nodes as Python numbers: walking one window without per-node array calls
+_TREE_NODES = [(int(f), float(t), int(le), int(gt)) for f, t, le, gt in TREE]
+
+# Added to the High HR limit (BPM) while the dog is doing this
+ACTIVITY_HR_ALLOWANCE = {REST: 0, ACTIVE: 30, WALK: 30, TROT: 45, RUN: 60}
+
+
+def window_features(left, right, fs=IMU_RATE_HZ) -> np.ndarray:
+    """FEATURES for one window: left / right are (n, 3) accelerometer arrays in g."""
+    acc = np.stack((left, right))
+    mag = np.sqrt(np.einsum("lij,lij->li", acc, acc))
+    dev = mag - mag.mean(axis=1, keepdims=True)
+    power = np.einsum("li,li->l", dev, dev)
+    n = dev.shape[1]
+
+    # Zero-padded to 2n: linear, not circular, autocorrelation
+    spectrum = np.fft.rfft(dev, 2 * n)
+    acf = np.fft.irfft((spectrum.real ** 2 + spectrum.imag ** 2).sum(axis=0))
+    min_lag, max_lag = int(fs / MAX_GAIT_HZ), min(int(fs / MIN_GAIT_HZ), n - 1)
+    lag = min_lag + int(np.argmax(acf[min_lag:max_lag + 1]))
+    # Unbiased: a lag-k product only has n - k terms
+    periodicity = acf[lag] * n / (n - lag) / acf[0] if acf[0] > 0 else 0.0
+
+    denom = np.sqrt(power[0] * power[1])
+    return np.array((
+        power.mean() / n,
+        fs / lag,
+        min(max(periodicity, 0.0), 1.0),
+        dev[0] @ dev[1] / denom if denom > 0 else 0.0,
+    ))
+
+
+def predict(features) -> np.ndarray:
+    """Activity labels for an (m, len(FEATURES)) feature array, all rows at once."""
+    features = np.atleast_2d(features)
+    rows = np.arange(len(features))
+    node = np.zeros(len(features), dtype=np.intp)
+    live = node >= 0
+    while live.any():
+        at = node[live]
+        above = features[rows[live], TREE_FEATURE[at]] > TREE_THRESHOLD[at]
+        node[live] = TREE_NEXT[at, above.astype(np.intp)]
+        live = node >= 0
+    return -node - 1
+
+
+def classify(left, right) -> Optional[int]:
+    """Activity label from both legs' (WINDOW_SAMPLES, 3) windows; None if either is missing."""
+    if left is None or right is None:
+        return None
+    features = window_features(left, right).tolist()
+    node = 0
+    while node >= 0:
+        feature, threshold, if_le, if_gt = _TREE_NODES[node]
+        node = if_gt if features[feature] > threshold else if_le
+    return -node - 1
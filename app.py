@@ -1,14 +1,40 @@
 # Flask UI — reads dog_harness.db (same file as sensor logging scripts)
 
+import json
 import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timezone
 from typing import Optional
 
-from flask import Flask, jsonify, render_template, request
+from flask import Flask, Response, jsonify, render_template, request
 import sqlite3
 
-from dognosis_db import DB_PATH, connect as get_db
+from dognosis_db import DB_PATH, DEFAULT_DOG_ID, connect as get_db
+from dognosis_http import compress_response, conditional_json, conditional_json_from
+from dognosis_ingest import (
+    INGEST_MAX_REPORTED_ERRORS,
+    INGEST_MAX_ROWS,
+    IngestError,
+    decode_payload,
+    identity_defaults,
+    insert_rows,
+    validate_batch,
+)
+from dognosis_tail_cache import TailCache
+from dognosis_export import (
+    CONTENT_TYPES as EXPORT_CONTENT_TYPES,
+    EXPORT_FORMATS,
+    EXPORT_TABLES,
+    arrow_available,
+    export_filename,
+    parse_time_arg,
+    stream_export,
+)
 from dog_profile_hr import age_days_from_dob
+from activity import ACTIVITY_LABELS
+from hrv import ROLLUP_SEC, HRVSums
 
 BREED_LABELS = {
     "border_collie": "Border Collie",
@@ -71,125 +97,310 @@ else:
     _static_folder = _STATIC_DIR_FALLBACK
     _static_url_path = "/static"
 
+# Rows fetched per cursor.fetchmany() when streaming large JSON responses.
+JSON_STREAM_CHUNK_ROWS = 1000
+
+# /hrv and /activity read at most this span of per-minute rollup rows (never raw data)
+HRV_MAX_WINDOW_MINUTES = 7 * 24 * 60
+
+
+def _stream_rows_json(conn, cursor, header: dict, key: str):
+    """
+    Yield `{**header, key: [{col: val, ...}, ...]}` one fetchmany() chunk at a time
+    so the full result never exists as a list of dicts. Closes conn when done.
+    """
+    try:
+        col_names = [desc[0] for desc in cursor.description]
+        prefix = json.dumps(header)[:-1]
+        yield f'{prefix}{", " if header else ""}"{key}": ['
+        first = True
+        while True:
+            rows = cursor.fetchmany(JSON_STREAM_CHUNK_ROWS)
+            if not rows:
+                break
+            chunk = ", ".join(json.dumps(dict(zip(col_names, row))) for row in rows)
+            yield chunk if first else ", " + chunk
+            first = False
+        yield "]}"
+    finally:
+        conn.close()
+
+
+def _stream_columns_json(conn, cursor, header: dict, key: str):
+    """
+    Yield `{**header, key: {col: [values...], ...}}`. Not streamed from the cursor:
+    the first column needs every row, so the whole result is buffered as one plain
+    list per column (no per-row dicts) and conn is closed before output starts.
+    Only the JSON text is produced one column at a time.
+    """
+    try:
+        col_names = [desc[0] for desc in cursor.description]
+        columns = [[] for _ in col_names]
+        while True:
+            rows = cursor.fetchmany(JSON_STREAM_CHUNK_ROWS)
+            if not rows:
+                break
+            for values, column in zip(zip(*rows), columns):
+                column.extend(values)
+    finally:
+        conn.close()
+
+    prefix = json.dumps(header)[:-1]
+    yield f'{prefix}{", " if header else ""}"{key}": {{'
+    for i, (name, column) in enumerate(zip(col_names, columns)):
+        yield f'{", " if i else ""}{json.dumps(name)}: {json.dumps(column)}'
+        columns[i] = None
+    yield "}}"
+
+
 app = Flask(
     __name__,
     template_folder=_template_folder,
     static_folder=_static_folder,
     static_url_path=_static_url_path,
 )
+app.after_request(compress_response)
+
+# Newest rows shared by `/`, `/live-data` and `/flags` (refreshed at most once per tick),
+# one cache per dog. Any ?dog_id= creates one, so only the most recently used are kept.
+TAIL_CACHE_MAX_DOGS = 64
+_tail_caches: "OrderedDict[int, TailCache]" = OrderedDict(
+    [(DEFAULT_DOG_ID, TailCache(DEFAULT_DOG_ID))]
+)
+_tail_caches_lock = threading.Lock()
+
+
+def _tail_cache_for(dog_id: int) -> TailCache:
+    with _tail_caches_lock:
+        cache = _tail_caches.get(dog_id)
+        if cache is None:
+            cache = _tail_caches[dog_id] = TailCache(dog_id)
+            if len(_tail_caches) > TAIL_CACHE_MAX_DOGS:
+                _tail_caches.popitem(last=False)
+        else:
+            _tail_caches.move_to_end(dog_id)
+        return cache
+
+
+def _invalidate_flag_caches() -> None:
+    with _tail_caches_lock:
+        caches = list(_tail_caches.values())
+    for cache in caches:
+        cache.invalidate_flags()
+
+
+class _BadDogId(ValueError):
+    pass
+
+
+def _dog_id_arg(payload: Optional[dict] = None) -> int:
+    """
+    ?dog_id= selector (or "dog_id" in a JSON body). Every query is scoped to one
+    dog; single-harness setups never pass it and get DEFAULT_DOG_ID.
+    """
+    raw = request.args.get("dog_id")
+    if (raw is None or str(raw).strip() == "") and payload:
+        raw = payload.get("dog_id")
+    if raw is None or str(raw).strip() == "":
+        return DEFAULT_DOG_ID
+    try:
+        dog_id = int(raw)
+    except (TypeError, ValueError):
+        raise _BadDogId(raw)
+    if dog_id < 1:
+        raise _BadDogId(raw)
+    return dog_id
+
+
+@app.errorhandler(_BadDogId)
+def _bad_dog_id(exc):
+    return jsonify({"status": "error", "message": "Invalid dog_id"}), 400
 
 
 @app.route("/")
 def index():
-    conn = get_db()
-    cursor = conn.cursor()
+    tail_cache = _tail_cache_for(_dog_id_arg())
+    latest_rows = tail_cache.latest_sensor(
+        1,
+        [
+            "datetime", "bpm", "high_hr", "low_hr", "rapid_change", "unstable_hr",
+            "temperature", "step_count", "timestamp",
+        ],
+    )
+    latest = latest_rows[0] if latest_rows else None
 
-    cursor.execute("""
-        SELECT datetime, bpm, high_hr, low_hr, rapid_change, unstable_hr,
-               temperature, step_count, timestamp
-        FROM sensor_data
-        ORDER BY timestamp DESC LIMIT 1
-    """)
-    row = cursor.fetchone()
-    latest = None
-    if row:
-        latest = {
-            "datetime": row[0],
-            "bpm": row[1],
-            "high_hr": row[2],
-            "low_hr": row[3],
-            "rapid_change": row[4],
-            "unstable_hr": row[5],
-            "temperature": row[6],
-            "step_count": row[7],
-            "timestamp": row[8],
-        }
+    rows = tail_cache.latest_sensor(
+        100,
+        ["timestamp", "datetime", "bpm", "temperature", "step_count"],
+        newest_first=False,
+    )
 
-    cursor.execute("""
-        SELECT timestamp, datetime, bpm, temperature, step_count
-        FROM sensor_data
-        ORDER BY timestamp DESC LIMIT 100
-    """)
-    raw_rows = cursor.fetchall()
-    conn.close()
+    return render_template("index.html", rows=rows, latest=latest)
 
-    rows = [
-        {
-            "timestamp": r[0],
-            "datetime": r[1],
-            "bpm": r[2],
-            "temperature": r[3],
-            "step_count": r[4],
-        }
-        for r in reversed(raw_rows)
-    ]
 
-    return render_template("index.html", rows=rows, latest=latest)
+def _tail_cache_version():
+    """ETag source for views served from the tail cache (see conditional_json_from)."""
+    return _tail_cache_for(_dog_id_arg()).version()
 
 
 @app.route("/live-data")
+@conditional_json_from(_tail_cache_version)
 def live_data():
-    """JSON for charts — polled by the UI; always reflects current DB."""
+    """JSON for charts — polled by the UI; served from the in-process tail cache."""
+    return jsonify(
+        _tail_cache_for(_dog_id_arg()).latest_sensor(
+            400,
+            [
+                "timestamp", "bpm", "temperature", "step_count",
+                "high_hr", "low_hr", "rapid_change", "unstable_hr", "datetime",
+                "rmssd", "sdnn", "pnn50", "activity",
+            ],
+        )
+    )
+
+
+def _rollup_window_args():
+    """
+    (window_minutes, bucket_minutes, first minute timestamp) from the query string
+    for the per-minute rollup endpoints; ValueError with the message to return.
+    """
+    try:
+        window_minutes = int(request.args.get("window_minutes", default="60"))
+        bucket_minutes = int(request.args.get("bucket_minutes", default="5"))
+    except (TypeError, ValueError):
+        raise ValueError("Invalid window_minutes or bucket_minutes") from None
+    if not 1 <= window_minutes <= HRV_MAX_WINDOW_MINUTES:
+        raise ValueError(f"window_minutes must be between 1 and {HRV_MAX_WINDOW_MINUTES}")
+    if not 1 <= bucket_minutes <= window_minutes:
+        raise ValueError("bucket_minutes must be between 1 and window_minutes")
+    since = int(time.time() // ROLLUP_SEC - window_minutes + 1) * ROLLUP_SEC
+    return window_minutes, bucket_minutes, since
+
+
+@app.route("/hrv")
+@conditional_json
+def hrv_summary():
+    """
+    HRV (RMSSD / SDNN in ms, pNN50 0-1) over the last window_minutes, plus one
+    point per bucket_minutes for charts. Combined from the per-minute hrv_rollup
+    sums, so a week costs the same as an hour of beats would.
+    """
+    dog_id = _dog_id_arg()
+    try:
+        window_minutes, bucket_minutes, since = _rollup_window_args()
+    except ValueError as exc:
+        return jsonify({"status": "error", "message": str(exc)}), 400
+
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute("""
-        SELECT timestamp, bpm, temperature, step_count,
-               high_hr, low_hr, rapid_change, unstable_hr, datetime
-        FROM sensor_data
-        ORDER BY timestamp DESC
-        LIMIT 400
-    """)
-    raw = cursor.fetchall()
+    cursor.execute(
+        """
+        SELECT minute, n_rr, sum_rr, sum_rr_sq, n_diff, sum_diff_sq, n_nn50
+        FROM hrv_rollup
+        WHERE dog_id = ? AND minute >= ?
+        ORDER BY minute
+        """,
+        (dog_id, since),
+    )
+    rows = cursor.fetchall()
     conn.close()
 
-    data = [
+    # Sums add: buckets and the whole window are plain column sums of minutes
+    bucket_sec = bucket_minutes * ROLLUP_SEC
+    total = HRVSums()
+    buckets = {}
+    for minute, *sums in rows:
+        sums = HRVSums(*sums)
+        total = total.combine(sums)
+        start = since + (minute - since) // bucket_sec * bucket_sec
+        buckets[start] = buckets.get(start, HRVSums()).combine(sums)
+
+    return jsonify(
         {
-            "timestamp": r[0],
-            "bpm": r[1],
-            "temperature": r[2],
-            "step_count": r[3],
-            "high_hr": r[4],
-            "low_hr": r[5],
-            "rapid_change": r[6],
-            "unstable_hr": r[7],
-            "datetime": r[8],
+            "window_minutes": window_minutes,
+            "bucket_minutes": bucket_minutes,
+            "beats": total.n_rr,
+            **total.metrics()._asdict(),
+            "series": [
+                {"timestamp": start, "beats": sums.n_rr, **sums.metrics()._asdict()}
+                for start, sums in buckets.items()
+            ],
         }
-        for r in raw
-    ]
-    return jsonify(data)
+    )
 
 
-@app.route("/flags")
-def flags_list():
-    """Recent flags for the Overview sidebar."""
+@app.route("/activity")
+@conditional_json
+def activity_summary():
+    """
+    Time in each activity (activity.ACTIVITY_LABELS) and the mean BPM during it
+    over the last window_minutes, plus per-bucket seconds for charts. Summed from
+    the per-minute activity_rollup rows the logger keeps.
+    """
+    dog_id = _dog_id_arg()
+    try:
+        window_minutes, bucket_minutes, since = _rollup_window_args()
+    except ValueError as exc:
+        return jsonify({"status": "error", "message": str(exc)}), 400
+
     conn = get_db()
     cursor = conn.cursor()
     cursor.execute(
         """
-        SELECT id, timestamp, flag_type, description
-        FROM flags
-        WHERE flag_type != 'Arrhythmia'
-        ORDER BY timestamp DESC
-        LIMIT 50
-        """
+        SELECT minute, activity, seconds, n_bpm, sum_bpm
+        FROM activity_rollup
+        WHERE dog_id = ? AND minute >= ?
+        ORDER BY minute, activity
+        """,
+        (dog_id, since),
     )
     rows = cursor.fetchall()
     conn.close()
+
+    bucket_sec = bucket_minutes * ROLLUP_SEC
+    totals = [[0, 0, 0.0] for _ in ACTIVITY_LABELS]  # seconds, n_bpm, sum_bpm
+    buckets = {}
+    for minute, activity, seconds, n_bpm, sum_bpm in rows:
+        if not 0 <= activity < len(ACTIVITY_LABELS):
+            continue
+        total = totals[activity]
+        total[0] += seconds
+        total[1] += n_bpm
+        total[2] += sum_bpm
+        start = since + (minute - since) // bucket_sec * bucket_sec
+        bucket = buckets.setdefault(start, [0] * len(ACTIVITY_LABELS))
+        bucket[activity] += seconds
+
     return jsonify(
-        [
-            {
-                "id": r[0],
-                "timestamp": r[1],
-                "flag_type": r[2],
-                "description": r[3],
-            }
-            for r in rows
-        ]
+        {
+            "window_minutes": window_minutes,
+            "bucket_minutes": bucket_minutes,
+            "activities": {
+                label: {
+                    "seconds": seconds,
+                    "mean_bpm": round(sum_bpm / n_bpm, 1) if n_bpm else None,
+                }
+                for label, (seconds, n_bpm, sum_bpm) in zip(ACTIVITY_LABELS, totals)
+            },
+            "series": [
+                {"timestamp": start, **dict(zip(ACTIVITY_LABELS, seconds))}
+                for start, seconds in buckets.items()
+            ],
+        }
     )
 
 
+@app.route("/flags")
+@conditional_json_from(_tail_cache_version)
+def flags_list():
+    """Recent flags for the Overview sidebar."""
+    return jsonify(_tail_cache_for(_dog_id_arg()).latest_flags(50))
+
+
 @app.route("/flags-summary")
+@conditional_json
 def flags_summary():
+    dog_id = _dog_id_arg()
     conn = get_db()
     cursor = conn.cursor()
 
@@ -208,17 +419,19 @@ def flags_summary():
             s.asymmetry
         FROM flags f
         LEFT JOIN sensor_data s
-            ON s.timestamp = (
-                SELECT sd.timestamp
+            ON s.dog_id = f.dog_id
+            AND s.id = (
+                SELECT sd.id
                 FROM sensor_data sd
-                WHERE sd.timestamp <= f.timestamp
+                WHERE sd.dog_id = f.dog_id AND sd.timestamp <= +f.timestamp
                 ORDER BY sd.timestamp DESC
                 LIMIT 1
             )
-        WHERE f.flag_type != 'Arrhythmia'
+        WHERE f.dog_id = ? AND f.flag_type != 'Arrhythmia'
         ORDER BY f.timestamp DESC
         LIMIT 200
-        """
+        """,
+        (dog_id,),
     )
 
     rows = cursor.fetchall()
@@ -230,8 +443,19 @@ def flags_summary():
 
 
 @app.route("/incident-context/<int:flag_id>")
+@conditional_json
 def incident_context(flag_id):
-    """Full sensor log around one incident (default: ±15 minutes)."""
+    """
+    Full sensor log around one incident (default: ±15 minutes).
+    shape=rows (default) streams a list of objects; shape=columns reads the whole
+    window (at most 120 minutes) before returning {"timestamp": [...], "bpm": [...], ...}
+    without repeating keys per row.
+    """
+    dog_id = _dog_id_arg()
+    shape = (request.args.get("shape") or "rows").strip().lower()
+    if shape not in ("rows", "columns"):
+        return jsonify({"status": "error", "message": "shape must be rows or columns"}), 400
+
     window_minutes_raw = request.args.get("window_minutes", default="15")
     try:
         window_minutes = int(window_minutes_raw)
@@ -253,7 +477,10 @@ def incident_context(flag_id):
     conn = get_db()
     cursor = conn.cursor()
 
-    cursor.execute("SELECT id, timestamp, flag_type FROM flags WHERE id = ?", (flag_id,))
+    cursor.execute(
+        "SELECT id, timestamp, flag_type FROM flags WHERE id = ? AND dog_id = ?",
+        (flag_id, dog_id),
+    )
     flag_row = cursor.fetchone()
     if not flag_row:
         conn.close()
@@ -280,27 +507,108 @@ def incident_context(flag_id):
             rapid_change,
             unstable_hr
         FROM sensor_data
-        WHERE timestamp BETWEEN ? AND ?
+        WHERE dog_id = ? AND timestamp BETWEEN ? AND ?
         ORDER BY timestamp ASC
         """,
-        (start_ts, end_ts),
+        (dog_id, start_ts, end_ts),
     )
-    rows = cursor.fetchall()
-    col_names = [desc[0] for desc in cursor.description]
-    conn.close()
 
-    return jsonify(
-        {
-            "incident": {
-                "id": flag_row[0],
-                "timestamp": incident_ts,
-                "flag_type": flag_row[2],
-            },
-            "window_minutes": window_minutes,
-            "window_start": start_ts,
-            "window_end": end_ts,
-            "samples": [dict(zip(col_names, row)) for row in rows],
-        }
+    header = {
+        "incident": {
+            "id": flag_row[0],
+            "timestamp": incident_ts,
+            "flag_type": flag_row[2],
+        },
+        "window_minutes": window_minutes,
+        "window_start": start_ts,
+        "window_end": end_ts,
+    }
+    if shape == "columns":
+        body = _stream_columns_json(conn, cursor, header, "samples")
+    else:
+        body = _stream_rows_json(conn, cursor, header, "samples")
+    return Response(body, mimetype="application/json")
+
+
+@app.route("/ingest", methods=["POST"])
+def ingest():
+    """
+    Bulk upload of sensor_data rows from a remote harness.
+    Body: a JSON object or list, NDJSON (application/x-ndjson) or msgpack
+    (application/msgpack), optionally with Content-Encoding: gzip.
+    Each sample may carry any sensor_data column;
+    `timestamp` (unix seconds) is required, `datetime` is derived when absent.
+    X-Dog-Id / X-Device-Id headers fill dog_id / device_id for samples without them.
+    Valid rows are inserted even when others fail; failures come back as
+    {"index": <position in batch>, "field": ..., "message": ...}.
+    """
+    try:
+        defaults = identity_defaults(request.headers, request.args)
+        samples = decode_payload(
+            request.get_data(cache=False), request.mimetype, request.content_encoding
+        )
+    except IngestError as exc:
+        return jsonify({"status": "error", "message": str(exc)}), exc.status
+
+    if not samples:
+        return jsonify({"status": "error", "message": "No samples provided"}), 400
+    if len(samples) > INGEST_MAX_ROWS:
+        return (
+            jsonify({"status": "error", "message": f"Batch exceeds {INGEST_MAX_ROWS} samples"}),
+            413,
+        )
+
+    rows, _, errors = validate_batch(samples, defaults)
+
+    inserted = 0
+    if rows:
+        conn = get_db()
+        try:
+            inserted = insert_rows(conn, rows)
+        finally:
+            conn.close()
+
+    body = {
+        "status": "ok" if not errors else ("partial" if inserted else "error"),
+        "inserted": inserted,
+        "rejected": len(samples) - inserted,
+        "errors": errors[:INGEST_MAX_REPORTED_ERRORS],
+    }
+    return jsonify(body), 201 if inserted else 400
+
+
+@app.route("/export")
+def export_data():
+    """
+    Stream sensor history for offline analysis.
+    Query: from/to (unix seconds, default: everything up to now),
+           format=csv|arrow|parquet (default csv), table=sensor_data|flags, dog_id.
+    """
+    dog_id = _dog_id_arg()
+    fmt = (request.args.get("format") or "csv").strip().lower()
+    table = (request.args.get("table") or "sensor_data").strip().lower()
+
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"status": "error", "message": "format must be csv, arrow or parquet"}), 400
+    if table not in EXPORT_TABLES:
+        return jsonify({"status": "error", "message": "table must be sensor_data or flags"}), 400
+    if fmt != "csv" and not arrow_available():
+        return jsonify({"status": "error", "message": "pyarrow is not installed on this device"}), 501
+
+    try:
+        start_ts = parse_time_arg(request.args.get("from"), 0.0)
+        end_ts = parse_time_arg(request.args.get("to"), time.time())
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "message": "Invalid from/to timestamp"}), 400
+    if end_ts < start_ts:
+        return jsonify({"status": "error", "message": "to must not be before from"}), 400
+
+    filename = export_filename(table, fmt, start_ts, end_ts)
+    conn = get_db()
+    return Response(
+        stream_export(conn, table, fmt, start_ts, end_ts, dog_id),
+        mimetype=EXPORT_CONTENT_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
 
@@ -339,18 +647,21 @@ def flags_add():
     except Exception:
         dt_str = None
 
+    dog_id = _dog_id_arg(payload)
+
     conn = get_db()
     cursor = conn.cursor()
     cursor.execute(
         """
-        INSERT INTO flags (timestamp, datetime, flag_type, description, is_user_generated)
-        VALUES (?, ?, ?, ?, 1)
+        INSERT INTO flags (timestamp, datetime, flag_type, description, is_user_generated, dog_id)
+        VALUES (?, ?, ?, ?, 1, ?)
         """,
-        (ts_int, dt_str, str(flag_type), description),
+        (ts_int, dt_str, str(flag_type), description, dog_id),
     )
     flag_id = cursor.lastrowid
     conn.commit()
     conn.close()
+    _invalidate_flag_caches()
 
     return jsonify({"status": "ok", "flag_id": flag_id}), 201
 
@@ -380,6 +691,7 @@ def flags_update():
 
     import datetime as _dt
     dt_str = _dt.datetime.fromtimestamp(ts_int).strftime("%Y-%m-%d %H:%M:%S")
+    dog_id = _dog_id_arg(payload)
 
     conn = get_db()
     cursor = conn.cursor()
@@ -387,13 +699,14 @@ def flags_update():
         """
         UPDATE flags
         SET timestamp = ?, datetime = ?, flag_type = ?, description = ?
-        WHERE id = ? AND is_user_generated = 1
+        WHERE id = ? AND dog_id = ? AND is_user_generated = 1
         """,
-        (ts_int, dt_str, str(flag_type), description, flag_id_int),
+        (ts_int, dt_str, str(flag_type), description, flag_id_int, dog_id),
     )
     conn.commit()
     updated = cursor.rowcount
     conn.close()
+    _invalidate_flag_caches()
 
     if updated == 0:
         return jsonify({"status": "error", "message": "Flag not found or not user-generated"}), 404
@@ -418,18 +731,21 @@ def flags_delete():
     except (TypeError, ValueError):
         return jsonify({"status": "error", "message": "Invalid id"}), 400
 
+    dog_id = _dog_id_arg(payload)
+
     conn = get_db()
     cursor = conn.cursor()
     cursor.execute(
         """
         DELETE FROM flags
-        WHERE id = ? AND is_user_generated = 1
+        WHERE id = ? AND dog_id = ? AND is_user_generated = 1
         """,
-        (flag_id_int,),
+        (flag_id_int, dog_id),
     )
     conn.commit()
     deleted = cursor.rowcount
     conn.close()
+    _invalidate_flag_caches()
 
     if deleted == 0:
         return jsonify({"status": "error", "message": "Flag not found or not user-generated"}), 404
@@ -437,11 +753,41 @@ def flags_delete():
     return jsonify({"status": "ok"}), 200
 
 
+@app.route("/dogs", methods=["GET", "POST"])
+def dogs():
+    """
+    GET: every dog profile as [{ "id", "name" }] for the dashboard dog selector.
+    POST: create a new (empty) profile; body may carry { "dogName": "..." }.
+    """
+    conn = get_db()
+    cursor = conn.cursor()
+
+    if request.method == "GET":
+        cursor.execute("SELECT id, name FROM dog_profile ORDER BY id")
+        rows = cursor.fetchall()
+        conn.close()
+        return jsonify([{"id": r[0], "name": r[1] or ""} for r in rows])
+
+    payload = request.get_json(force=True, silent=True) or {}
+    dog_name = str(payload.get("dogName") or "").strip()
+    updated = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    cursor.execute(
+        "INSERT INTO dog_profile (name, gender, updated_at) VALUES (?, 'male', ?)",
+        (dog_name, updated),
+    )
+    dog_id = cursor.lastrowid
+    conn.commit()
+    conn.close()
+    return jsonify({"status": "ok", "dog_id": dog_id}), 201
+
+
 @app.route("/dog-profile", methods=["GET", "POST"])
 def dog_profile():
     """
-    Single-row dog profile (id=1). JSON uses same keys as the dashboard localStorage shape.
+    Profile of one dog (?dog_id=, default 1). JSON uses same keys as the dashboard
+    localStorage shape. POST creates the row if that dog has none yet.
     """
+    dog_id = _dog_id_arg()
     conn = get_db()
     cursor = conn.cursor()
 
@@ -449,8 +795,9 @@ def dog_profile():
         cursor.execute(
             """
             SELECT name, weight, date_of_birth, breed_code, breed_other, gender
-            FROM dog_profile WHERE id = 1
-            """
+            FROM dog_profile WHERE id = ?
+            """,
+            (dog_id,),
         )
         row = cursor.fetchone()
         conn.close()
@@ -496,6 +843,7 @@ def dog_profile():
     age_years = _age_years_from_dob(dog_dob if dog_dob else None)
     updated = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
 
+    cursor.execute("INSERT OR IGNORE INTO dog_profile (id) VALUES (?)", (dog_id,))
     cursor.execute(
         """
         UPDATE dog_profile SET
@@ -508,7 +856,7 @@ def dog_profile():
             breed_other = ?,
             gender = ?,
             updated_at = ?
-        WHERE id = 1
+        WHERE id = ?
         """,
         (
             dog_name,
@@ -520,6 +868,7 @@ def dog_profile():
             breed_other or None,
             gender,
             updated,
+            dog_id,
         ),
     )
     conn.commit()
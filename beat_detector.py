@@ -0,0 +1,118 @@
+"""
+Streaming PPG beat detector: constant work per sample, each beat reported once.
+
+Replaces re-filtering and re-peak-picking the whole 10 s window on every sample:
+
+- causal band-pass (the same 2nd-order Butterworth 1-4 Hz design as before, run
+  as second-order sections with persistent state, so one sample = a few multiplies)
+- adaptive threshold: a fraction of the recent beat amplitude, decaying while no
+  beat is found so a weaker signal is picked up again within a few seconds
+- refractory period after each beat (the old find_peaks distance)
+- local-max confirmation: a candidate becomes a beat once no higher sample has
+  arrived for CONFIRM_SEC, so every beat is emitted exactly once, slightly late
+"""
+from typing import NamedTuple, Optional
+
+from scipy.signal import butter, sosfilt_zi
+
+BAND_HZ = (1.0, 4.0)
+# No second beat this soon after a beat (0.4 s = 150 bpm, as the old peak distance)
+REFRACTORY_SEC = 0.4
+# A candidate peak is confirmed after this long without a higher sample
+CONFIRM_SEC = 0.15
+# Threshold = this fraction of the running beat amplitude
+THRESHOLD_FRACTION = 0.5
+# Running amplitude halves every this many seconds without a beat
+THRESHOLD_HALF_LIFE_SEC = 2.0
+# Weight of each new beat in the running amplitude
+AMPLITUDE_ALPHA = 0.25
+# Samples used to seed the amplitude (and the filter's settling time)
+LEARN_SEC = 2.0
+# Gaps longer than this are not RR intervals (missed beats / lost signal)
+MAX_RR_SEC = 2.0
+
+
+class Beat(NamedTuple):
+    time: float  # seconds on the detector's sample clock (start_time + n / fs)
+    rr: Optional[float]  # seconds since the previous beat; None for the first beat after a gap
+    amplitude: float  # filtered peak height
+    sample: int  # index of the peak sample since the last reset
+
+
+class StreamingBeatDetector:
+    def __init__(self, fs=100, band=BAND_HZ):
+        self.fs = fs
+        nyq = fs / 2
+        self.sos = butter(2, [band[0] / nyq, band[1] / nyq], btype="band", output="sos").tolist()
+        self._zi_unit = sosfilt_zi(self.sos).tolist()
+
+        self.refractory = int(REFRACTORY_SEC * fs)
+        self.confirm = int(CONFIRM_SEC * fs)
+        self.learn = int(LEARN_SEC * fs)
+        self.decay = 0.5 ** (1 / (THRESHOLD_HALF_LIFE_SEC * fs))
+        self.reset()
+
+    def reset(self, start_time=0.0):
+        """Forget all state (after lost contact); sample times restart at start_time."""
+        self.start_time = start_time
+        self.n = 0
+        self.filtered = 0.0
+        self._zi = None
+        self.amplitude = 0.0
+        self._candidate_n = None
+        self._candidate_y = 0.0
+        self._last_beat_n = None
+
+    @property
+    def time(self):
+        """Sample-clock time of the most recent sample."""
+        return self.start_time + (self.n - 1) / self.fs
+
+    def _filter(self, x):
+        if self._zi is None:
+            # Start in steady state for this level: no step transient from the DC offset
+            self._zi = [[z0 * x, z1 * x] for z0, z1 in self._zi_unit]
+        for zi, (b0, b1, b2, _, a1, a2) in zip(self._zi, self.sos):
+            y = b0 * x + zi[0]
+            zi[0] = b1 * x - a1 * y + zi[1]
+            zi[1] = b2 * x - a2 * y
+            x = y
+        return x
+
+    def update(self, x) -> Optional[Beat]:
+        """Feed one raw sample; returns the Beat confirmed by it, if any."""
+        n = self.n
+        self.n += 1
+        y = self.filtered = self._filter(x)
+
+        if n < self.learn:
+            # Settling: seed the running amplitude, report nothing yet
+            self.amplitude = max(self.amplitude, y)
+            return None
+        self.amplitude *= self.decay
+
+        beat = None
+        if self._candidate_n is not None and n - self._candidate_n >= self.confirm:
+            beat = self._emit()
+
+        in_refractory = self._last_beat_n is not None and n - self._last_beat_n < self.refractory
+        if (
+            not in_refractory
+            and y > THRESHOLD_FRACTION * self.amplitude
+            and (self._candidate_n is None or y > self._candidate_y)
+        ):
+            self._candidate_n = n
+            self._candidate_y = y
+        return beat
+
+    def _emit(self) -> Beat:
+        n, y = self._candidate_n, self._candidate_y
+        self._candidate_n = None
+        rr = None
+        if self._last_beat_n is not None:
+            rr = (n - self._last_beat_n) / self.fs
+            if rr > MAX_RR_SEC:
+                rr = None
+        self._last_beat_n = n
+        self.amplitude += AMPLITUDE_ALPHA * (y - self.amplitude)
+        return Beat(self.start_time + n / self.fs, rr, y, n)
@@ -0,0 +1,292 @@
+"""
+Streaming change detection for the logged vitals (BPM, temperature, cadence).
+
+Each signal has one ChangeDetector, O(1) per sample:
+
+- baseline: slow exponentially weighted mean and variance (time constant
+  1 / alpha samples), so the detector follows the dog's own level and spread
+- EWMA control chart: a faster EWMA (weight lam) of the samples alarms when it
+  leaves baseline +- L sigma (scaled to the EWMA's own spread); once per excursion
+- two-sided CUSUM on the standardised deviations: accumulates evidence of a
+  sustained shift of more than k sigma and alarms when it passes h (then restarts)
+
+Nothing alarms during the first `warmup` samples. The logger feeds one sample per
+signal per second (BPM only while the dog is not exercising) and keeps the state
+in detector_state, so a restart does not relearn the baseline (CUSUM sums older
+than MAX_STATE_GAP_SEC are dropped).
+
+scan() runs the same equations over a whole array at once (lfilter for the
+EWMAs, cumulative sums for CUSUM) to tune parameters against stored history:
+
+    python change_detect.py --signal bpm --hours 48
+"""
+import argparse
+import json
+import math
+import time
+from typing import NamedTuple, Optional
+
+import numpy as np
+from scipy.signal import lfilter
+
+STATE_SAVE_SEC = 300
+# Restored CUSUM sums are dropped after a gap this long (the baseline is kept)
+MAX_STATE_GAP_SEC = 600
+
+
+class DetectorParams(NamedTuple):
+    alpha: float  # baseline EWMA weight
+    lam: float  # control-chart EWMA weight
+    L: float  # control limit, in EWMA standard deviations
+    k: float  # CUSUM slack, in baseline sigmas
+    h: float  # CUSUM decision threshold
+    warmup: int  # samples before any alarm
+    min_sigma: float  # floor on the baseline sigma (signal units)
+
+
+# One sample per second (logger tick); temperature in °F, cadence in steps/min
+DETECTORS = {
+    "bpm": DetectorParams(alpha=1 / 600, lam=0.1, L=4.0, k=0.5, h=10.0, warmup=300, min_sigma=2.0),
+    "temperature": DetectorParams(
+        alpha=1 / 1800, lam=0.02, L=4.0, k=0.5, h=20.0, warmup=600, min_sigma=0.5
+    ),
+    "cadence": DetectorParams(alpha=1 / 900, lam=0.05, L=4.0, k=0.5, h=15.0, warmup=300, min_sigma=5.0),
+}
+
+
+class Change(NamedTuple):
+    kind: str  # "ewma" or "cusum"
+    direction: str  # "up" or "down"
+    value: float  # the sample that raised the alarm
+    baseline: float  # baseline mean before it
+
+
+class ChangeDetector:
+    def __init__(self, params: DetectorParams):
+        self.params = params
+        self.n = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.z = 0.0
+        self.s_hi = 0.0
+        self.s_lo = 0.0
+        self.ewma_out = False
+        self.last_time = None
+
+    def update(self, x, timestamp=None) -> Optional[Change]:
+        p = self.params
+        self.last_time = timestamp
+        if self.n == 0:
+            self.n = 1
+            self.mean = self.z = x
+            return None
+
+        d = x - self.mean
+        sigma = max(math.sqrt(self.var / _var_weight(p.alpha, self.n)), p.min_sigma)
+        self.z += p.lam * (x - self.z)
+        change = None
+        if self.n >= p.warmup:
+            y = d / sigma
+            self.s_hi = max(0.0, self.s_hi + y - p.k)
+            self.s_lo = max(0.0, self.s_lo - y - p.k)
+            limit = p.L * sigma * math.sqrt(p.lam / (2 - p.lam))
+            out = abs(self.z - self.mean) > limit
+            if out and not self.ewma_out:
+                change = Change("ewma", "up" if self.z > self.mean else "down", x, self.mean)
+            self.ewma_out = out
+            if self.s_hi > p.h or self.s_lo > p.h:
+                change = Change("cusum", "up" if self.s_hi > p.h else "down", x, self.mean)
+                self.s_hi = self.s_lo = 0.0
+
+        # Baseline last: alarms compare against what was known before this sample
+        self.mean += p.alpha * d
+        self.var = (1 - p.alpha) * (self.var + p.alpha * d * d)
+        self.n += 1
+        return change
+
+    def state(self) -> dict:
+        return {
+            "n": self.n, "mean": self.mean, "var": self.var, "z": self.z,
+            "s_hi": self.s_hi, "s_lo": self.s_lo, "ewma_out": self.ewma_out,
+            "last_time": self.last_time,
+        }
+
+    def restore(self, state: dict, now=None) -> None:
+        for name, value in state.items():
+            setattr(self, name, value)
+        if now is not None and (self.last_time is None or now - self.last_time > MAX_STATE_GAP_SEC):
+            self.s_hi = self.s_lo = 0.0
+            self.ewma_out = False
+            self.z = self.mean
+
+
+class DetectorBank:
+    """One ChangeDetector per signal for one dog, persisted in detector_state."""
+
+    def __init__(self, dog_id, params=DETECTORS):
+        self.dog_id = dog_id
+        self.detectors = {name: ChangeDetector(p) for name, p in params.items()}
+        self._saved_at = None
+
+    def load(self, cursor, now):
+        cursor.execute(
+            "SELECT name, state FROM detector_state WHERE dog_id = ?", (self.dog_id,)
+        )
+        for name, state in cursor.fetchall():
+            if name in self.detectors:
+                self.detectors[name].restore(json.loads(state), now)
+
+    def update(self, name, x, timestamp) -> Optional[Change]:
+        """Feed one sample (None / NaN are skipped)."""
+        if x is None or x != x:
+            return None
+        return self.detectors[name].update(float(x), timestamp)
+
+    def save_if_due(self, cursor, timestamp):
+        if self._saved_at is None:
+            self._saved_at = timestamp
+        elif timestamp - self._saved_at >= STATE_SAVE_SEC:
+            self.save(cursor, timestamp)
+
+    def save(self, cursor, timestamp=None):
+        """Write every detector's state (in the caller's transaction)."""
+        timestamp = time.time() if timestamp is None else timestamp
+        self._saved_at = timestamp
+        cursor.executemany(
+            """
+            INSERT OR REPLACE INTO detector_state (dog_id, name, state, updated_at)
+            VALUES (?, ?, ?, ?)
+            """,
+            [
+                (self.dog_id, name, json.dumps(det.state()), timestamp)
+                for name, det in self.detectors.items()
+            ],
+        )
+
+
+def _var_weight(alpha, n):
+    """
+    The EW variance starts at 0 and has had n - 1 updates by sample n: dividing by
+    this removes that startup bias (it would under-state sigma for ~1 / alpha samples).
+    """
+    return 1.0 - (1.0 - alpha) ** np.maximum(n - 1, 1)
+
+
+# -------------------------
+# Vectorised replay (tuning)
+# -------------------------
+def _ewma(x, weight):
+    """y[t] = weight * x[t] + (1 - weight) * y[t-1], starting at y[0] = x[0]."""
+    return lfilter([weight], [1, weight - 1], x, zi=[(1 - weight) * x[0]])[0]
+
+
+def _cusum_alarms(y, k, h, start):
+    """Indices where the two-sided CUSUM of y (from `start`, restarting after each alarm) passes h."""
+    alarms = []
+    while start < len(y):
+        hi = np.cumsum(y[start:] - k)
+        lo = np.cumsum(-y[start:] - k)
+        # Lindley recursion S_t = max(0, S_t-1 + v_t) == C_t - min(0, min C up to t)
+        s_hi = hi - np.minimum(0.0, np.minimum.accumulate(hi))
+        s_lo = lo - np.minimum(0.0, np.minimum.accumulate(lo))
+        over = np.flatnonzero((s_hi > h) | (s_lo > h))
+        if not len(over):
+            break
+        alarms.append(start + int(over[0]))
+        start += int(over[0]) + 1
+    return np.asarray(alarms, dtype=np.intp)
+
+
+def scan(values, params: DetectorParams):
+    """
+    The streaming detector's alarms over a whole series (NaN samples skipped), for
+    tuning. Returns (ewma alarm indices, cusum alarm indices) into `values`.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    index = np.flatnonzero(~np.isnan(values))
+    x = values[index]
+    if len(x) < 2:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty
+    p = params
+
+    mean_after = _ewma(x, p.alpha)
+    mean = np.concatenate(([x[0]], mean_after[:-1]))  # baseline before each sample
+    d = x - mean
+    var_after = lfilter([(1 - p.alpha) * p.alpha], [1, p.alpha - 1], d * d)
+    var = np.concatenate(([0.0], var_after[:-1]))
+    sigma = np.maximum(np.sqrt(var / _var_weight(p.alpha, np.arange(len(x)))), p.min_sigma)
+    z = _ewma(x, p.lam)
+
+    live = np.arange(len(x)) >= max(p.warmup, 1)
+    out = live & (np.abs(z - mean) > p.L * sigma * math.sqrt(p.lam / (2 - p.lam)))
+    ewma = np.flatnonzero(out & ~np.concatenate(([False], out[:-1])))
+    cusum = _cusum_alarms(d / sigma, p.k, p.h, max(p.warmup, 1))
+    return index[ewma], index[cusum]
+
+
+def main():
+    import sqlite3
+
+    from dognosis_db import DB_PATH, DEFAULT_DOG_ID
+
+    columns = {"bpm": "bpm", "temperature": "temperature", "cadence": "step_count"}
+    parser = argparse.ArgumentParser(description="Replay change detectors over logged history")
+    parser.add_argument("--signal", choices=sorted(columns), default="bpm")
+    parser.add_argument("--hours", type=float, default=24.0)
+    parser.add_argument("--dog-id", type=int, default=DEFAULT_DOG_ID)
+    parser.add_argument("--db", default=DB_PATH)
+    for field in DetectorParams._fields:
+        parser.add_argument(f"--{field}", type=float, help="override the default")
+    args = parser.parse_args()
+
+    params = DETECTORS[args.signal]._replace(
+        **{f: getattr(args, f) for f in DetectorParams._fields if getattr(args, f) is not None}
+    )
+    params = params._replace(warmup=int(params.warmup))
+    conn = sqlite3.connect(args.db)
+    rows = conn.execute(
+        f"""
+        SELECT timestamp, {columns[args.signal]} FROM sensor_data
+        WHERE dog_id = ? AND timestamp >= ?
+        ORDER BY timestamp
+        """,
+        (args.dog_id, time.time() - args.hours * 3600),
+    ).fetchall()
+    conn.close()
+    if not rows:
+        print("No rows in range")
+        return
+    ts = np.array([r[0] for r in rows])
+    values = np.array([np.nan if r[1] is None else r[1] for r in rows], dtype=np.float64)
+    if args.signal == "cadence":
+        values = cadence_series(ts, values)
+    elif args.signal == "bpm":
+        values[values <= 0] = np.nan
+
+    ewma, cusum = scan(values, params)
+    print(f"{len(values)} samples, {len(ewma)} EWMA alarms, {len(cusum)} CUSUM alarms ({params})")
+    for kind, idx in (("ewma", ewma), ("cusum", cusum)):
+        for i in idx:
+            print(f"  {kind:5s} {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts[i]))}  {values[i]:.1f}")
+
+
+def cadence_series(timestamps, steps, window_sec=60.0):
+    """Steps per minute over the trailing window at each sample (NaN without steps)."""
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    steps = np.asarray(steps, dtype=np.float64)
+    valid = ~np.isnan(steps)
+    ts, st = timestamps[valid], steps[valid]
+    cadence = np.full(len(steps), np.nan)
+    if not len(ts):
+        return cadence
+    first = np.searchsorted(ts, ts - window_sec)
+    span = ts - ts[first]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate = np.where(span > 0, (st - st[first]) / span * 60.0, np.nan)
+    cadence[valid] = np.maximum(rate, 0.0)
+    return cadence
+
+
+if __name__ == "__main__":
+    main()
@@ -1,91 +1,43 @@
 # RUN ONCE TO CREATE DB : python db_setup.py
-
+# (Safe to re-run: tables, columns and indexes come from the numbered migrations in
+# dognosis_db.py, and only the ones this database has not seen yet are applied.)
+#
+# Optional, with app.py and the logger stopped:
+#   python db_setup.py --compact   # integer/fixed-point sensor_data storage (~3x smaller)
+
+import argparse
+import os
 import sqlite3
 
-from dognosis_db import DB_PATH
+from dognosis_db import DB_PATH, enable_compact_storage, migrate
 
 def initialize_database():
     conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    # -------------------------
-    # SENSOR DATA TABLE
-    # -------------------------
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS sensor_data (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        timestamp REAL NOT NULL,
-        datetime TEXT,
-        bpm REAL,
-        arrhythmia INTEGER,
-        temperature REAL,
-        step_count INTEGER,
-        latest_step_length REAL,
-        avg_step_length REAL,
-        asymmetry REAL,
-        limp INTEGER,
-        raw_ir REAL,
-        raw_red REAL,
-        raw_temperature REAL,
-        high_hr INTEGER DEFAULT 0,
-        low_hr INTEGER DEFAULT 0,
-        rapid_change INTEGER DEFAULT 0,
-        unstable_hr INTEGER DEFAULT 0
-    );
-    """)
-
-    # Timestamp index (CRITICAL for ±30min queries)
-    cursor.execute("""
-    CREATE INDEX IF NOT EXISTS idx_sensor_timestamp
-    ON sensor_data(timestamp);
-    """)
-
-    # -------------------------
-    # FLAGS TABLE
-    # -------------------------
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS flags (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        timestamp REAL NOT NULL,
-        datetime TEXT,
-        flag_type TEXT NOT NULL,
-        description TEXT,
-        is_user_generated INTEGER DEFAULT 0
-    );
-    """)
-
-    cursor.execute("""
-    CREATE INDEX IF NOT EXISTS idx_flag_timestamp
-    ON flags(timestamp);
-    """)
-
-    # -------------------------
-    # DOG PROFILE TABLE
-    # -------------------------
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS dog_profile (
-        id INTEGER PRIMARY KEY CHECK (id = 1),
-        name TEXT,
-        breed TEXT,
-        age INTEGER,
-        weight REAL,
-        size TEXT,
-        date_of_birth TEXT,
-        breed_code TEXT,
-        breed_other TEXT,
-        gender TEXT,
-        updated_at TEXT
-    );
-    """)
+    version = migrate(conn)
+    conn.close()
+    print(f"Database initialized successfully at {DB_PATH} (schema v{version})")
 
-    conn.commit()
+def compact_database():
+    before = os.path.getsize(DB_PATH)
+    conn = sqlite3.connect(DB_PATH)
+    copied = enable_compact_storage(conn)
+    # Give the freed pages of the old table back to the filesystem.
+    conn.execute("VACUUM")
     conn.close()
-    # Add any columns missing on older DBs
-    from dognosis_db import ensure_schema
-    _c = sqlite3.connect(DB_PATH)
-    ensure_schema(_c)
-    _c.close()
-    print(f"Database initialized successfully at {DB_PATH}")
+    after = os.path.getsize(DB_PATH)
+    print(
+        f"sensor_data uses compact storage ({copied} rows converted); "
+        f"{before / 1e6:.1f} MB -> {after / 1e6:.1f} MB"
+    )
 
 if __name__ == "__main__":
-    initialize_database()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Create / migrate dog_harness.db.")
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="store sensor_data as scaled integers in a WITHOUT ROWID table",
+    )
+    args = parser.parse_args()
+    initialize_database()
+    if args.compact:
+        compact_database()
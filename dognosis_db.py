@@ -1,19 +1,45 @@
 """
 Shared SQLite path + schema so Flask and logger scripts use the same dog_harness.db.
-Call ensure_schema() once before queries that need HR flag columns.
+
+The schema is versioned with PRAGMA user_version: MIGRATIONS are applied in order,
+once per database, and connect() only reads that integer on later startups.
 """
 import os
 import sqlite3
 import threading
+from typing import Callable, List, NamedTuple
 
 DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dog_harness.db")
 
+# Rows written before multi-dog support (and the local logger by default) belong to dog 1.
+DEFAULT_DOG_ID = 1
+
 # SQLite is single-writer; WAL + busy timeout reduce "database is locked" under
-# concurrent readers (web) and writers (sensor loggers). Schema init once per process
-# avoids running migrations on every HTTP request.
+# concurrent readers (web) and writers (sensor loggers). The schema version is
+# checked once per process, never per HTTP request.
 _SCHEMA_LOCK = threading.Lock()
 _schema_ready = False
 
+# Backfills commit every this many rows so loggers are not blocked for long.
+MIGRATION_CHUNK_ROWS = 5000
+
+# One row per dog; ids are referenced by sensor_data.dog_id / flags.dog_id.
+DOG_PROFILE_TABLE_SQL = """
+    CREATE TABLE {name} (
+        id INTEGER PRIMARY KEY,
+        name TEXT,
+        breed TEXT,
+        age INTEGER,
+        weight REAL,
+        size TEXT,
+        date_of_birth TEXT,
+        breed_code TEXT,
+        breed_other TEXT,
+        gender TEXT,
+        updated_at TEXT
+    )
+"""
+
 
 def configure_connection(conn: sqlite3.Connection) -> None:
     conn.execute("PRAGMA journal_mode=WAL")
@@ -21,99 +47,628 @@ def configure_connection(conn: sqlite3.Connection) -> None:
     conn.execute("PRAGMA busy_timeout=30000")
 
 
-def ensure_schema(conn: sqlite3.Connection) -> None:
-    """Add columns expected by test_logging_sensor_data_9.py and app.py if missing."""
-    c = conn.cursor()
-    c.execute(
-        "SELECT name FROM sqlite_master WHERE type='table' AND name='sensor_data'"
-    )
-    if not c.fetchone():
-        return
-    c.execute("PRAGMA table_info(sensor_data)")
-    sensor_cols = {row[1] for row in c.fetchall()}
-
-    for col, sql_type in (
-        ("datetime", "TEXT"),
-        ("bpm", "REAL"),
-        ("high_hr", "INTEGER DEFAULT 0"),
-        ("low_hr", "INTEGER DEFAULT 0"),
-        ("rapid_change", "INTEGER DEFAULT 0"),
-        ("unstable_hr", "INTEGER DEFAULT 0"),
-        ("temperature", "REAL"),
-        ("step_count", "INTEGER"),
-        ("limp", "INTEGER"),
-        ("asymmetry", "REAL"),
-    ):
-        if col not in sensor_cols:
-            try:
-                c.execute(f"ALTER TABLE sensor_data ADD COLUMN {col} {sql_type}")
-            except sqlite3.OperationalError:
-                pass
+def _columns(c: sqlite3.Cursor, table: str) -> set:
+    c.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in c.fetchall()}
 
-    try:
+
+def _add_missing_columns(c: sqlite3.Cursor, table: str, columns) -> None:
+    existing = _columns(c, table)
+    for col, sql_type in columns:
+        if col not in existing:
+            c.execute(f"ALTER TABLE {table} ADD COLUMN {col} {sql_type}")
+
+
+def backfill_in_chunks(
+    conn: sqlite3.Connection,
+    table: str,
+    set_sql: str,
+    where_sql: str,
+    params: tuple = (),
+    chunk_rows: int = MIGRATION_CHUNK_ROWS,
+) -> int:
+    """
+    UPDATE table SET <set_sql> WHERE <where_sql>, walking rowid ranges and committing
+    after each chunk so the write lock is only held for one chunk at a time.
+    Must be idempotent (where_sql excludes rows already done): an interrupted
+    backfill simply resumes on the next start.
+    """
+    c = conn.cursor()
+    c.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {table}")
+    lo, hi = c.fetchone()
+    if lo is None:
+        return 0
+    updated = 0
+    while lo <= hi:
+        c.execute("BEGIN IMMEDIATE")
         c.execute(
-            "CREATE INDEX IF NOT EXISTS idx_sensor_data_timestamp ON sensor_data(timestamp)"
+            f"UPDATE {table} SET {set_sql} "
+            f"WHERE rowid >= ? AND rowid < ? AND ({where_sql})",
+            (*params, lo, lo + chunk_rows),
         )
-    except sqlite3.OperationalError:
-        pass
+        updated += c.rowcount
+        c.execute("COMMIT")
+        lo += chunk_rows
+    return updated
 
-    c.execute("PRAGMA table_info(flags)")
-    flag_cols = {row[1] for row in c.fetchall()}
-    if "datetime" not in flag_cols:
-        try:
-            c.execute("ALTER TABLE flags ADD COLUMN datetime TEXT")
-        except sqlite3.OperationalError:
-            pass
 
-    if "is_user_generated" not in flag_cols:
-        try:
-            c.execute("ALTER TABLE flags ADD COLUMN is_user_generated INTEGER DEFAULT 0")
-        except sqlite3.OperationalError:
-            pass
+# -------------------------
+# Migrations
+# -------------------------
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[[sqlite3.Connection], None]
+    # Chunked migrations manage their own transactions (see backfill_in_chunks) and
+    # must be idempotent; the others run inside one BEGIN IMMEDIATE transaction.
+    chunked: bool = False
+
+
+def _m001_baseline(conn: sqlite3.Connection) -> None:
+    """Single-dog schema; also brings pre-versioning databases up to it."""
+    c = conn.cursor()
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS sensor_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp REAL NOT NULL,
+            datetime TEXT,
+            bpm REAL,
+            arrhythmia INTEGER,
+            temperature REAL,
+            step_count INTEGER,
+            latest_step_length REAL,
+            avg_step_length REAL,
+            asymmetry REAL,
+            limp INTEGER,
+            raw_ir REAL,
+            raw_red REAL,
+            raw_temperature REAL,
+            high_hr INTEGER DEFAULT 0,
+            low_hr INTEGER DEFAULT 0,
+            rapid_change INTEGER DEFAULT 0,
+            unstable_hr INTEGER DEFAULT 0
+        )
+        """
+    )
+    _add_missing_columns(
+        c,
+        "sensor_data",
+        (
+            ("datetime", "TEXT"),
+            ("bpm", "REAL"),
+            ("high_hr", "INTEGER DEFAULT 0"),
+            ("low_hr", "INTEGER DEFAULT 0"),
+            ("rapid_change", "INTEGER DEFAULT 0"),
+            ("unstable_hr", "INTEGER DEFAULT 0"),
+            ("temperature", "REAL"),
+            ("step_count", "INTEGER"),
+            ("limp", "INTEGER"),
+            ("asymmetry", "REAL"),
+        ),
+    )
+    # Timestamp index (CRITICAL for ±30min queries)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sensor_timestamp ON sensor_data(timestamp)")
+
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS flags (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp REAL NOT NULL,
+            datetime TEXT,
+            flag_type TEXT NOT NULL,
+            description TEXT,
+            is_user_generated INTEGER DEFAULT 0
+        )
+        """
+    )
+    _add_missing_columns(
+        c,
+        "flags",
+        (("datetime", "TEXT"), ("is_user_generated", "INTEGER DEFAULT 0")),
+    )
+    c.execute("CREATE INDEX IF NOT EXISTS idx_flag_timestamp ON flags(timestamp)")
 
     c.execute(
         "SELECT name FROM sqlite_master WHERE type='table' AND name='dog_profile'"
     )
     if not c.fetchone():
-        c.execute(
-            """
-            CREATE TABLE dog_profile (
-                id INTEGER PRIMARY KEY CHECK (id = 1),
-                name TEXT,
-                breed TEXT,
-                age INTEGER,
-                weight REAL,
-                size TEXT,
-                date_of_birth TEXT,
-                breed_code TEXT,
-                breed_other TEXT,
-                gender TEXT,
-                updated_at TEXT
-            )
-            """
-        )
-    else:
-        c.execute("PRAGMA table_info(dog_profile)")
-        dog_cols = {row[1] for row in c.fetchall()}
-        for col, sql_type in (
+        c.execute(DOG_PROFILE_TABLE_SQL.format(name="dog_profile"))
+    _add_missing_columns(
+        c,
+        "dog_profile",
+        (
             ("date_of_birth", "TEXT"),
             ("breed_code", "TEXT"),
             ("breed_other", "TEXT"),
             ("gender", "TEXT"),
             ("updated_at", "TEXT"),
-        ):
-            if col not in dog_cols:
-                try:
-                    c.execute(f"ALTER TABLE dog_profile ADD COLUMN {col} {sql_type}")
-                except sqlite3.OperationalError:
-                    pass
+        ),
+    )
+
+
+def _m002_multi_dog(conn: sqlite3.Connection) -> None:
+    """dog_id / device_id keys, per-dog indexes and a multi-row dog_profile."""
+    c = conn.cursor()
+    # New columns default to dog 1, so existing rows need no rewrite. Databases that
+    # picked up a nullable dog_id before versioning are backfilled by migration 3.
+    _add_missing_columns(
+        c,
+        "sensor_data",
+        (("dog_id", f"INTEGER NOT NULL DEFAULT {DEFAULT_DOG_ID}"), ("device_id", "TEXT")),
+    )
+    _add_missing_columns(
+        c, "flags", (("dog_id", f"INTEGER NOT NULL DEFAULT {DEFAULT_DOG_ID}"),)
+    )
+    # Per-dog time-range queries: (dog_id, timestamp) keeps them index-only as dogs grow.
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_sensor_dog_timestamp ON sensor_data(dog_id, timestamp)"
+    )
+    c.execute("CREATE INDEX IF NOT EXISTS idx_flags_dog_timestamp ON flags(dog_id, timestamp)")
+
+    c.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='dog_profile'")
+    if "CHECK" in (c.fetchone()[0] or "").upper():
+        # Legacy single-dog table (CHECK (id = 1)): rebuild as a multi-row table.
+        old_cols = _columns(c, "dog_profile")
+        c.execute(DOG_PROFILE_TABLE_SQL.format(name="dog_profile_multi"))
+        c.execute("PRAGMA table_info(dog_profile_multi)")
+        keep = [row[1] for row in c.fetchall() if row[1] in old_cols]
+        cols_sql = ", ".join(keep)
+        c.execute(
+            f"INSERT INTO dog_profile_multi ({cols_sql}) SELECT {cols_sql} FROM dog_profile"
+        )
+        c.execute("DROP TABLE dog_profile")
+        c.execute("ALTER TABLE dog_profile_multi RENAME TO dog_profile")
+    c.execute("INSERT OR IGNORE INTO dog_profile (id) VALUES (?)", (DEFAULT_DOG_ID,))
+
+
+def _m003_backfill_dog_id(conn: sqlite3.Connection) -> None:
+    """Rows written while dog_id was still nullable belong to the default dog."""
+    for table in ("sensor_data", "flags"):
+        backfill_in_chunks(
+            conn, table, "dog_id = ?", "dog_id IS NULL", (DEFAULT_DOG_ID,)
+        )
+
+
+def _m004_curated_indexes(conn: sqlite3.Connection) -> None:
+    """
+    Index set checked by query_audit.py. Every dashboard query filters on dog_id, so
+    the per-dog covering index replaces both (dog_id, timestamp) and the duplicate
+    single-column timestamp index older ensure_schema() versions created.
+    """
+    c = conn.cursor()
+    c.execute("DROP INDEX IF EXISTS idx_sensor_data_timestamp")  # duplicate of idx_sensor_timestamp
+    # Chart/live projections (timestamp, bpm, temperature, step_count) read from the
+    # index alone; it is a superset of idx_sensor_dog_timestamp, which goes.
+    c.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_sensor_dog_ts_vitals
+        ON sensor_data(dog_id, timestamp, bpm, temperature, step_count)
+        """
+    )
+    c.execute("DROP INDEX IF EXISTS idx_sensor_dog_timestamp")
+    # Sidebar / summary: newest non-Arrhythmia flags per dog, already in order.
+    c.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_flags_dog_visible
+        ON flags(dog_id, timestamp) WHERE flag_type != 'Arrhythmia'
+        """
+    )
+
+
+def _m005_signal_quality(conn: sqlite3.Connection) -> None:
+    """sensor_data.sqi: PPG signal quality (0-1) of the window behind each row's bpm."""
+    c = conn.cursor()
+    if is_compact(conn):
+        _add_missing_columns(c, COMPACT_TABLE, ((COMPACT_COLUMNS["sqi"][0], "INTEGER"),))
+        _create_compact_view(c)
+    else:
+        _add_missing_columns(c, "sensor_data", (("sqi", "REAL"),))
+
+
+# Per-row rolling HRV (hrv.py), appended to sensor_data after sqi
+HRV_COLUMNS = ("rmssd", "sdnn", "pnn50")
+
+
+def _m006_hrv(conn: sqlite3.Connection) -> None:
+    """
+    rr_intervals: every accepted beat-to-beat interval. hrv_rollup: one row of
+    additive HRV sums (hrv.HRVSums) per dog per minute, so HRV over any span is a
+    SUM() over minutes. sensor_data gains the rolling HRV at each row.
+    """
+    c = conn.cursor()
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS rr_intervals (
+            dog_id INTEGER NOT NULL,
+            beat_ms INTEGER NOT NULL,
+            rr_ms INTEGER NOT NULL,
+            PRIMARY KEY (dog_id, beat_ms)
+        ) WITHOUT ROWID
+        """
+    )
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS hrv_rollup (
+            dog_id INTEGER NOT NULL,
+            minute INTEGER NOT NULL,
+            n_rr INTEGER NOT NULL,
+            sum_rr REAL NOT NULL,
+            sum_rr_sq REAL NOT NULL,
+            n_diff INTEGER NOT NULL,
+            sum_diff_sq REAL NOT NULL,
+            n_nn50 INTEGER NOT NULL,
+            PRIMARY KEY (dog_id, minute)
+        ) WITHOUT ROWID
+        """
+    )
+    if is_compact(conn):
+        _add_missing_columns(
+            c, COMPACT_TABLE, ((COMPACT_COLUMNS[name][0], "INTEGER") for name in HRV_COLUMNS)
+        )
+        _create_compact_view(c)
+    else:
+        _add_missing_columns(c, "sensor_data", ((name, "REAL") for name in HRV_COLUMNS))
+
+
+def _m007_hr_baseline(conn: sqlite3.Connection) -> None:
+    """hr_baseline: per dog and local hour, a t-digest of resting BPM (hr_baseline.py)."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS hr_baseline (
+            dog_id INTEGER NOT NULL,
+            hour INTEGER NOT NULL,
+            digest BLOB NOT NULL,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (dog_id, hour)
+        ) WITHOUT ROWID
+        """
+    )
+
+
+def _m008_detector_state(conn: sqlite3.Connection) -> None:
+    """detector_state: per dog and signal, the change detector's state as JSON (change_detect.py)."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS detector_state (
+            dog_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            state TEXT NOT NULL,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (dog_id, name)
+        ) WITHOUT ROWID
+        """
+    )
+
+
+def _m009_activity(conn: sqlite3.Connection) -> None:
+    """
+    sensor_data.activity: the IMU activity label of each row (activity.ACTIVITY_LABELS
+    index). activity_rollup: per dog, minute and activity, the seconds spent and the
+    BPM sums, so time-in-activity and HR by activity over any span are SUM()s.
+    """
+    c = conn.cursor()
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS activity_rollup (
+            dog_id INTEGER NOT NULL,
+            minute INTEGER NOT NULL,
+            activity INTEGER NOT NULL,
+            seconds INTEGER NOT NULL,
+            n_bpm INTEGER NOT NULL,
+            sum_bpm REAL NOT NULL,
+            PRIMARY KEY (dog_id, minute, activity)
+        ) WITHOUT ROWID
+        """
+    )
+    if is_compact(conn):
+        _add_missing_columns(c, COMPACT_TABLE, ((COMPACT_COLUMNS["activity"][0], "INTEGER"),))
+        _create_compact_view(c)
+    else:
+        _add_missing_columns(c, "sensor_data", (("activity", "INTEGER"),))
+
+
+# Per-row leg orientation and posture (orientation.py), appended after activity
+POSTURE_COLUMNS = ("pitch", "roll", "posture")
+
+
+def _m010_posture(conn: sqlite3.Connection) -> None:
+    """sensor_data.pitch / roll (degrees from standing) and posture (orientation.POSTURE_LABELS index)."""
+    c = conn.cursor()
+    if is_compact(conn):
+        _add_missing_columns(
+            c, COMPACT_TABLE, ((COMPACT_COLUMNS[name][0], "INTEGER") for name in POSTURE_COLUMNS)
+        )
+        _create_compact_view(c)
+    else:
+        _add_missing_columns(
+            c, "sensor_data", (("pitch", "REAL"), ("roll", "REAL"), ("posture", "INTEGER"))
+        )
+
+
+def _m011_flags_write_seq(conn: sqlite3.Connection) -> None:
+    """
+    flags_meta.write_seq: bumped by trigger on every flags UPDATE / DELETE, in the
+    writer's transaction, so every process's ETags see edits MAX(id) cannot reveal.
+    """
+    c = conn.cursor()
+    c.execute(
+        "CREATE TABLE IF NOT EXISTS flags_meta ("
+        "id INTEGER PRIMARY KEY CHECK (id = 1), write_seq INTEGER NOT NULL)"
+    )
+    c.execute("INSERT OR IGNORE INTO flags_meta (id, write_seq) VALUES (1, 0)")
+    for event in ("UPDATE", "DELETE"):
+        c.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS flags_{event.lower()}_seq AFTER {event} ON flags
+            BEGIN
+                UPDATE flags_meta SET write_seq = write_seq + 1 WHERE id = 1;
+            END
+            """
+        )
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "baseline single-dog schema", _m001_baseline),
+    Migration(2, "multi-dog keys and indexes", _m002_multi_dog),
+    Migration(3, "backfill NULL dog_id", _m003_backfill_dog_id, chunked=True),
+    Migration(4, "curated covering indexes", _m004_curated_indexes),
+    Migration(5, "PPG signal quality column", _m005_signal_quality),
+    Migration(6, "RR intervals and HRV rollups", _m006_hrv),
+    Migration(7, "resting HR baseline sketches", _m007_hr_baseline),
+    Migration(8, "change detector state", _m008_detector_state),
+    Migration(9, "activity labels and rollups", _m009_activity),
+    Migration(10, "leg orientation and posture", _m010_posture),
+    Migration(11, "flags write counter", _m011_flags_write_seq),
+]
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
 
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    Apply pending migrations in order; returns the resulting schema version.
+    Safe to race from several processes: each step re-reads user_version under the
+    write lock, so a migration already applied elsewhere is skipped.
+    """
+    if schema_version(conn) >= SCHEMA_VERSION:
+        return SCHEMA_VERSION
+
+    previous_isolation = conn.isolation_level
+    conn.commit()
+    conn.isolation_level = None  # explicit BEGIN / COMMIT below
+    c = conn.cursor()
     try:
-        c.execute("INSERT OR IGNORE INTO dog_profile (id) VALUES (1)")
-    except sqlite3.OperationalError:
-        pass
+        for m in MIGRATIONS:
+            if schema_version(conn) >= m.version:
+                continue
+            if m.chunked:
+                m.apply(conn)
+                c.execute("BEGIN IMMEDIATE")
+            else:
+                c.execute("BEGIN IMMEDIATE")
+                if schema_version(conn) >= m.version:
+                    c.execute("COMMIT")
+                    continue
+                try:
+                    m.apply(conn)
+                except Exception:
+                    c.execute("ROLLBACK")
+                    raise
+            # PRAGMA does not accept bound parameters; version is an int from MIGRATIONS.
+            c.execute(f"PRAGMA user_version = {max(m.version, schema_version(conn))}")
+            c.execute("COMMIT")
+            print(f"[dognosis_db] Schema migrated to v{m.version}: {m.description}")
+    finally:
+        conn.isolation_level = previous_isolation
+    return schema_version(conn)
+
+
+def ensure_schema(conn: sqlite3.Connection) -> None:
+    """Kept for older scripts (app_v1.py): same as migrate()."""
+    migrate(conn)
+
+
+# -------------------------
+# Compact storage (opt-in: python db_setup.py --compact)
+# -------------------------
+# sensor_data becomes a view over a WITHOUT ROWID table keyed (dog_id, ts_ms) that
+# stores scaled integers, packs the HR flags into one bitfield, drops the unused
+# arrhythmia column and derives datetime on read. Readers and INSERTs keep using
+# sensor_data unchanged; `id` reads back as ts_ms and re-sent samples (same dog,
+# same millisecond) replace instead of duplicating.
+COMPACT_TABLE = "sensor_data_compact"
+
+# sensor_data column -> (compact column, scale or None, type the view reads back as)
+COMPACT_COLUMNS = {
+    "bpm": ("bpm_x10", 10, "REAL"),
+    "temperature": ("temp_x100", 100, "REAL"),
+    "step_count": ("step_count", None, "INTEGER"),
+    "latest_step_length": ("latest_step_length_x1000", 1000, "REAL"),
+    "avg_step_length": ("avg_step_length_x1000", 1000, "REAL"),
+    "asymmetry": ("asymmetry_x1000", 1000, "REAL"),
+    "limp": ("limp", None, "INTEGER"),
+    "raw_ir": ("raw_ir", None, "REAL"),
+    "raw_red": ("raw_red", None, "REAL"),
+    "raw_temperature": ("raw_temperature_x100", 100, "REAL"),
+    "sqi": ("sqi_x1000", 1000, "REAL"),
+    "rmssd": ("rmssd_x10", 10, "REAL"),
+    "sdnn": ("sdnn_x10", 10, "REAL"),
+    "pnn50": ("pnn50_x1000", 1000, "REAL"),
+    "activity": ("activity", None, "INTEGER"),
+    "pitch": ("pitch_x10", 10, "REAL"),
+    "roll": ("roll_x10", 10, "REAL"),
+    "posture": ("posture", None, "INTEGER"),
+}
+# Columns sensor_data gained after the multi-dog keys; the view lists them last too
+COMPACT_TRAILING_COLUMNS = ("sqi", *HRV_COLUMNS, "activity", *POSTURE_COLUMNS)
+COMPACT_FLAG_BITS = {"high_hr": 1, "low_hr": 2, "rapid_change": 4, "unstable_hr": 8}
+
+# Declared types of the view's columns (PRAGMA table_info leaves expressions untyped).
+COMPACT_VIEW_TYPES = {
+    "id": "INTEGER",
+    "timestamp": "REAL",
+    "datetime": "TEXT",
+    "arrhythmia": "INTEGER",
+    **{name: decl for name, (_, _, decl) in COMPACT_COLUMNS.items()},
+    **{name: "INTEGER" for name in COMPACT_FLAG_BITS},
+    "dog_id": "INTEGER",
+    "device_id": "TEXT",
+}
+
+
+def is_compact(conn: sqlite3.Connection) -> bool:
+    row = conn.execute(
+        "SELECT type FROM sqlite_master WHERE name = 'sensor_data'"
+    ).fetchone()
+    return row is not None and row[0] == "view"
+
+
+def _compact_encode(src: str) -> dict:
+    """compact column -> SQL expression reading sensor_data columns via `src.`."""
+    exprs = {
+        "dog_id": f"COALESCE({src}dog_id, {DEFAULT_DOG_ID})",
+        "ts_ms": f"CAST(round({src}timestamp * 1000) AS INTEGER)",
+    }
+    for name, (col, scale, _) in COMPACT_COLUMNS.items():
+        exprs[col] = f"{src}{name}" if scale is None else (
+            f"CAST(round({src}{name} * {scale}) AS INTEGER)"
+        )
+    exprs["flags"] = " | ".join(
+        f"(CASE WHEN COALESCE({src}{name}, 0) != 0 THEN {bit} ELSE 0 END)"
+        for name, bit in COMPACT_FLAG_BITS.items()
+    )
+    exprs["device_id"] = f"{src}device_id"
+    return exprs
+
+
+def _create_compact_view(c: sqlite3.Cursor) -> None:
+    """(Re)create the sensor_data view + triggers from COMPACT_COLUMNS."""
+    c.execute(f"PRAGMA table_info({COMPACT_TABLE})")
+    stored = {row[1] for row in c.fetchall()}
+
+    def decode(name: str) -> str:
+        col, scale, decl = COMPACT_COLUMNS[name]
+        if col not in stored:
+            return f"NULL AS {name}"
+        if scale is not None:
+            return f"{col} / {float(scale)} AS {name}"
+        return f"CAST({col} AS {decl}) AS {name}" if decl == "REAL" else f"{col} AS {name}"
 
+    select = [
+        "ts_ms AS id",
+        # Must match idx_sensor_compact_dog_ts exactly for range queries to use it.
+        "ts_ms / 1000.0 AS timestamp",
+        "datetime(ts_ms / 1000, 'unixepoch', 'localtime') AS datetime",
+        decode("bpm"),
+        "NULL AS arrhythmia",
+        *(
+            decode(name)
+            for name in COMPACT_COLUMNS
+            if name != "bpm" and name not in COMPACT_TRAILING_COLUMNS
+        ),
+        *(f"(flags & {bit}) != 0 AS {name}" for name, bit in COMPACT_FLAG_BITS.items()),
+        "dog_id",
+        "device_id",
+        *(decode(name) for name in COMPACT_TRAILING_COLUMNS),
+    ]
+    encode = {col: expr for col, expr in _compact_encode("NEW.").items() if col in stored}
+
+    c.execute("DROP VIEW IF EXISTS sensor_data")
+    c.execute(f"CREATE VIEW sensor_data AS SELECT {', '.join(select)} FROM {COMPACT_TABLE}")
+    c.execute(
+        f"""
+        CREATE TRIGGER sensor_data_insert INSTEAD OF INSERT ON sensor_data
+        BEGIN
+            INSERT OR REPLACE INTO {COMPACT_TABLE} ({", ".join(encode)})
+            VALUES ({", ".join(encode.values())});
+            UPDATE compact_meta SET write_seq = write_seq + 1 WHERE id = 1;
+        END
+        """
+    )
+    c.execute(
+        f"""
+        CREATE TRIGGER sensor_data_delete INSTEAD OF DELETE ON sensor_data
+        BEGIN
+            DELETE FROM {COMPACT_TABLE} WHERE dog_id = OLD.dog_id AND ts_ms = OLD.id;
+            UPDATE compact_meta SET write_seq = write_seq + 1 WHERE id = 1;
+        END
+        """
+    )
+
+
+def enable_compact_storage(
+    conn: sqlite3.Connection, chunk_rows: int = MIGRATION_CHUNK_ROWS
+) -> int:
+    """
+    Convert sensor_data to compact storage; returns the number of rows copied.
+    Rows are copied in rowid chunks (one short write transaction each) and the swap
+    happens in a final transaction that also picks up rows logged meanwhile.
+    Restart app.py / the logger afterwards so cached query plans pick up the view.
+    """
+    migrate(conn)
+    if is_compact(conn):
+        return 0
+
+    columns = [
+        "dog_id INTEGER NOT NULL",
+        "ts_ms INTEGER NOT NULL",
+        *(f"{col} INTEGER" for col, _, _ in COMPACT_COLUMNS.values()),
+        "flags INTEGER NOT NULL DEFAULT 0",
+        "device_id TEXT",
+        "PRIMARY KEY (dog_id, ts_ms)",
+    ]
+    encode = _compact_encode("")
+    copy_sql = (
+        f"INSERT OR REPLACE INTO {COMPACT_TABLE} ({', '.join(encode)}) "
+        f"SELECT {', '.join(encode.values())} FROM sensor_data "
+        "WHERE rowid >= ? AND rowid < ?"
+    )
+
+    previous_isolation = conn.isolation_level
     conn.commit()
+    conn.isolation_level = None
+    c = conn.cursor()
+    copied = 0
+    try:
+        c.execute(
+            f"CREATE TABLE IF NOT EXISTS {COMPACT_TABLE} ({', '.join(columns)}) WITHOUT ROWID"
+        )
+        c.execute("SELECT MIN(rowid), MAX(rowid) FROM sensor_data")
+        lo, hi = c.fetchone()
+        lo = lo or 0
+        while hi is not None and lo <= hi:
+            c.execute("BEGIN IMMEDIATE")
+            c.execute(copy_sql, (lo, lo + chunk_rows))
+            copied += c.rowcount
+            c.execute("COMMIT")
+            lo += chunk_rows
+
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            c.execute(copy_sql, (lo, 2 ** 63 - 1))
+            copied += c.rowcount
+            c.execute("DROP TABLE sensor_data")
+            c.execute(
+                "CREATE TABLE IF NOT EXISTS compact_meta ("
+                "id INTEGER PRIMARY KEY CHECK (id = 1), write_seq INTEGER NOT NULL)"
+            )
+            c.execute("INSERT OR IGNORE INTO compact_meta (id, write_seq) VALUES (1, 0)")
+            c.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_sensor_compact_dog_ts "
+                f"ON {COMPACT_TABLE}(dog_id, ts_ms / 1000.0)"
+            )
+            _create_compact_view(c)
+            c.execute("COMMIT")
+        except Exception:
+            c.execute("ROLLBACK")
+            raise
+    finally:
+        conn.isolation_level = previous_isolation
+    return copied
 
 
 def connect():
@@ -126,6 +681,6 @@ def connect():
     configure_connection(conn)
     with _SCHEMA_LOCK:
         if not _schema_ready:
-            ensure_schema(conn)
+            migrate(conn)
             _schema_ready = True
     return conn
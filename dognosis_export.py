@@ -0,0 +1,189 @@
+"""
+Chunked export of sensor_data / flags for offline analysis (used by app.py /export).
+
+Rows are pulled from SQLite with fetchmany() and encoded one chunk at a time so a
+month of history never sits in memory at once. CSV needs only the stdlib; Arrow IPC
+and Parquet need pyarrow (optional on the Pi).
+"""
+import csv
+import io
+import math
+import sqlite3
+from typing import Iterator, List, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional; CSV export still works without it
+    pa = None
+    pq = None
+
+from dognosis_db import COMPACT_VIEW_TYPES
+
+EXPORT_CHUNK_ROWS = 5000
+EXPORT_TABLES = ("sensor_data", "flags")
+EXPORT_FORMATS = ("csv", "arrow", "parquet")
+
+# Low-cardinality text columns that compress far better dictionary-encoded.
+DICTIONARY_COLUMNS = {"flag_type"}
+
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def arrow_available() -> bool:
+    return pa is not None
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> List[Tuple[str, str]]:
+    """(name, declared type) for every column of table, in table order."""
+    c = conn.cursor()
+    c.execute(f"PRAGMA table_info({table})")
+    # Compact storage serves sensor_data from a view whose expressions are untyped.
+    return [
+        (row[1], (row[2] or COMPACT_VIEW_TYPES.get(row[1], "")).upper())
+        for row in c.fetchall()
+    ]
+
+
+def _iter_chunks(
+    conn: sqlite3.Connection,
+    table: str,
+    columns: List[str],
+    start_ts: float,
+    end_ts: float,
+    dog_id: Optional[int] = None,
+) -> Iterator[list]:
+    c = conn.cursor()
+    if dog_id is None:
+        c.execute(
+            f"SELECT {', '.join(columns)} FROM {table} "
+            "WHERE timestamp BETWEEN ? AND ? ORDER BY timestamp ASC",
+            (start_ts, end_ts),
+        )
+    else:
+        c.execute(
+            f"SELECT {', '.join(columns)} FROM {table} "
+            "WHERE timestamp BETWEEN ? AND ? AND dog_id = ? ORDER BY timestamp ASC",
+            (start_ts, end_ts, dog_id),
+        )
+    while True:
+        rows = c.fetchmany(EXPORT_CHUNK_ROWS)
+        if not rows:
+            return
+        yield rows
+
+
+def _arrow_type(name: str, decl_type: str):
+    if name in DICTIONARY_COLUMNS:
+        return pa.dictionary(pa.int32(), pa.string())
+    if "INT" in decl_type:
+        return pa.int64()
+    if "REAL" in decl_type or "FLOA" in decl_type or "DOUB" in decl_type:
+        return pa.float64()
+    return pa.string()
+
+
+def _arrow_batch(schema, rows: list):
+    columns = list(zip(*rows))
+    arrays = [pa.array(list(col), type=field.type) for col, field in zip(columns, schema)]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands back whatever was written since the last drain."""
+
+    def __init__(self):
+        super().__init__()
+        self._parts = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        data = bytes(b)
+        self._parts.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def stream_export(
+    conn: sqlite3.Connection,
+    table: str,
+    fmt: str,
+    start_ts: float,
+    end_ts: float,
+    dog_id: Optional[int] = None,
+) -> Iterator[bytes]:
+    """
+    Yield the encoded export in pieces. Closes conn when exhausted (or when the
+    client disconnects and the WSGI server closes the generator).
+    """
+    try:
+        col_info = _table_columns(conn, table)
+        names = [name for name, _ in col_info]
+
+        if fmt == "csv":
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            writer.writerow(names)
+            for rows in _iter_chunks(conn, table, names, start_ts, end_ts, dog_id):
+                writer.writerows(rows)
+                yield buf.getvalue().encode("utf-8")
+                buf.seek(0)
+                buf.truncate(0)
+            if buf.tell():
+                yield buf.getvalue().encode("utf-8")
+            return
+
+        schema = pa.schema([pa.field(name, _arrow_type(name, t)) for name, t in col_info])
+        sink = _ChunkSink()
+        if fmt == "arrow":
+            writer = pa.ipc.new_stream(
+                sink,
+                schema,
+                options=pa.ipc.IpcWriteOptions(compression="zstd", emit_dictionary_deltas=True),
+            )
+            write = writer.write_batch
+        else:
+            writer = pq.ParquetWriter(sink, schema, compression="zstd")
+            write = writer.write_batch
+
+        for rows in _iter_chunks(conn, table, names, start_ts, end_ts, dog_id):
+            write(_arrow_batch(schema, rows))
+            data = sink.drain()
+            if data:
+                yield data
+        writer.close()
+        data = sink.drain()
+        if data:
+            yield data
+    finally:
+        conn.close()
+
+
+def export_filename(table: str, fmt: str, start_ts: float, end_ts: float) -> str:
+    ext = {"csv": "csv", "arrow": "arrows", "parquet": "parquet"}[fmt]
+    return f"{table}_{int(start_ts)}_{int(end_ts)}.{ext}"
+
+
+def parse_time_arg(raw: Optional[str], default: float) -> float:
+    """Unix seconds from a query argument; ValueError unless a finite number."""
+    if raw is None or str(raw).strip() == "":
+        return default
+    value = float(raw)
+    if not math.isfinite(value):
+        raise ValueError(f"Not a finite timestamp: {raw!r}")
+    return value
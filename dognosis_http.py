@@ -0,0 +1,197 @@
+"""
+Conditional GET + response compression for the dashboard JSON API (app.py).
+
+Validators are derived from the newest sensor_data / flags row ids, which only grow
+as the logger writes, plus a counter in the database that triggers bump whenever a
+flag is edited or deleted (by any process).
+Polling dashboards then get an empty 304 instead of re-downloading unchanged data.
+"""
+import functools
+import gzip
+import threading
+import time
+import zlib
+from typing import Iterable, Iterator, Tuple
+
+from flask import current_app, request
+
+from dognosis_db import connect, is_compact
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Responses smaller than this are cheaper to send as-is than to compress.
+COMPRESS_MIN_BYTES = 1024
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "text/html",
+    "text/csv",
+    "text/plain",
+}
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+_state_lock = threading.Lock()
+_last_version = None
+_last_version_seen_at = time.time()
+
+# flags edits / deletes, counted by trigger (dognosis_db migration 11)
+_FLAGS_WRITE_SEQ = "(SELECT write_seq FROM flags_meta WHERE id = 1)"
+
+
+def data_version(conn) -> Tuple[int, int, int]:
+    """
+    (max sensor_data.id, max flags.id, flags write_seq) — O(1) lookups. All three
+    live in the database, so every app worker and writer process agrees on them.
+    """
+    c = conn.cursor()
+    if is_compact(conn):
+        # No rowid to take MAX() of; the insert trigger counts writes instead.
+        c.execute(
+            "SELECT (SELECT write_seq FROM compact_meta WHERE id = 1), "
+            f"(SELECT MAX(id) FROM flags), {_FLAGS_WRITE_SEQ}"
+        )
+    else:
+        c.execute(
+            "SELECT (SELECT MAX(id) FROM sensor_data), "
+            f"(SELECT MAX(id) FROM flags), {_FLAGS_WRITE_SEQ}"
+        )
+    sensor_max, flag_max, flags_seq = c.fetchone()
+    return (sensor_max or 0, flag_max or 0, flags_seq or 0)
+
+
+def _last_modified_for(version) -> float:
+    """Wall-clock time this process first saw `version` (monotonic for clients)."""
+    global _last_version, _last_version_seen_at
+    with _state_lock:
+        if version != _last_version:
+            _last_version = version
+            _last_version_seen_at = time.time()
+        return _last_version_seen_at
+
+
+def _db_version() -> Tuple[int, int, int]:
+    conn = connect()
+    try:
+        return data_version(conn)
+    finally:
+        conn.close()
+
+
+def _conditional(view, current_version):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        version = current_version()
+        etag = f"{version[0]}-{version[1]}-{version[2]}"
+        last_modified = int(_last_modified_for(version))
+
+        not_modified = False
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains_weak(etag)
+        elif request.if_modified_since is not None:
+            not_modified = request.if_modified_since.timestamp() >= last_modified
+
+        if not_modified:
+            response = current_app.response_class(status=304)
+        else:
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag, weak=True)
+        response.last_modified = last_modified
+        # Browsers may store the body but must revalidate before reusing it.
+        response.cache_control.no_cache = True
+        return response
+
+    return wrapper
+
+
+def conditional_json(view):
+    """
+    Route decorator: answer 304 when the client's validator matches the current DB
+    version, otherwise run the view and tag the response with ETag/Last-Modified.
+    """
+    return _conditional(view, _db_version)
+
+
+def conditional_json_from(current_version):
+    """
+    conditional_json for views served from a cache: the validator is
+    `current_version()`, the data_version() the cached body was read at. Tagging an
+    older cached body with the live DB version would let clients keep it as a 304.
+    """
+    return lambda view: _conditional(view, current_version)
+
+
+def _choose_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+
+def _compress_stream(chunks: Iterable, encoding: str) -> Iterator[bytes]:
+    """Compress a streamed body chunk by chunk, closing the source iterable when done."""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        compress, finish = compressor.process, compressor.finish
+    else:
+        # wbits 16 + MAX_WBITS: gzip container, like gzip.compress()
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        compress, finish = compressor.compress, compressor.flush
+    try:
+        for chunk in chunks:
+            out = compress(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+            if out:
+                yield out
+        yield finish()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def compress_response(response):
+    """
+    after_request hook: gzip/brotli JSON, HTML and CSV bodies. Buffered bodies are
+    compressed when above COMPRESS_MIN_BYTES; streamed ones (size unknown) always,
+    incrementally, as they are sent.
+    """
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    if response.is_streamed:
+        encoding = _choose_encoding()
+        if encoding is not None:
+            response.response = _compress_stream(response.response, encoding)
+            response.headers.pop("Content-Length", None)
+            response.headers["Content-Encoding"] = encoding
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+
+    encoding = _choose_encoding()
+    if encoding is None:
+        return response
+
+    if encoding == "br":
+        body = brotli.compress(data, quality=BROTLI_QUALITY)
+    else:
+        body = gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    return response
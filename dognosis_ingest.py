@@ -0,0 +1,294 @@
+"""
+Batch decoding + column-wise validation for the `/ingest` contract.
+
+Remote harnesses (see raspi_live_stream_example.py) upload buffered samples in large
+batches after connectivity gaps. Each column of a batch is converted in one NumPy
+pass; bad values are reported per row index instead of rejecting the whole batch,
+and every valid row goes to SQLite with a single executemany().
+"""
+import json
+import time
+import zlib
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from activity import ACTIVITY_LABELS
+from dognosis_db import DEFAULT_DOG_ID
+from orientation import POSTURE_LABELS
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional; JSON / NDJSON always work
+    msgpack = None
+
+INGEST_MAX_ROWS = 50000
+INGEST_MAX_REPORTED_ERRORS = 200
+# Cap on a gzip body once inflated (INGEST_MAX_ROWS samples are well under this)
+INGEST_MAX_INFLATED_BYTES = 64 * 1024 * 1024
+
+NDJSON_MIMETYPES = {"application/x-ndjson", "application/ndjson", "application/jsonlines"}
+MSGPACK_MIMETYPES = {"application/msgpack", "application/x-msgpack"}
+
+# sensor_data column -> (kind, (min, max) or None)
+#   float : REAL, NULL allowed
+#   int   : INTEGER, NULL allowed
+#   flag  : INTEGER 0/1, missing -> 0 (matches the table DEFAULT)
+#   text  : TEXT, NULL allowed
+INGEST_COLUMNS = {
+    # time.localtime() needs a 32-bit time_t on the Pi
+    "timestamp": ("float", (0.0, 2.0 ** 31 - 1)),
+    "datetime": ("text", None),
+    "bpm": ("float", (0.0, 400.0)),
+    "arrhythmia": ("int", (0, 1)),
+    "temperature": ("float", (-60.0, 200.0)),
+    "step_count": ("int", (0, None)),
+    "latest_step_length": ("float", (0.0, None)),
+    "avg_step_length": ("float", (0.0, None)),
+    "asymmetry": ("float", (0.0, None)),
+    "limp": ("int", (0, 1)),
+    "raw_ir": ("float", None),
+    "raw_red": ("float", None),
+    "raw_temperature": ("float", None),
+    "high_hr": ("flag", None),
+    "low_hr": ("flag", None),
+    "rapid_change": ("flag", None),
+    "unstable_hr": ("flag", None),
+    "dog_id": ("int", (1, None)),
+    "device_id": ("text", None),
+    "sqi": ("float", (0.0, 1.0)),
+    "rmssd": ("float", (0.0, None)),
+    "sdnn": ("float", (0.0, None)),
+    "pnn50": ("float", (0.0, 1.0)),
+    "activity": ("int", (0, len(ACTIVITY_LABELS) - 1)),
+    "pitch": ("float", (-180.0, 180.0)),
+    "roll": ("float", (-180.0, 180.0)),
+    "posture": ("int", (0, len(POSTURE_LABELS) - 1)),
+}
+REQUIRED_COLUMNS = ("timestamp",)
+
+INSERT_SQL = (
+    f"INSERT INTO sensor_data ({', '.join(INGEST_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in INGEST_COLUMNS)})"
+)
+
+
+class IngestError(ValueError):
+    """Payload could not be decoded at all (as opposed to individual bad rows)."""
+
+    status = 400
+
+
+class IngestTooLarge(IngestError):
+    """Payload is over a size limit."""
+
+    status = 413
+
+
+# Per-request defaults for samples that do not carry their own identity.
+DOG_ID_HEADER = "X-Dog-Id"
+DEVICE_ID_HEADER = "X-Device-Id"
+
+
+def identity_defaults(headers: Mapping[str, str], args: Mapping[str, str]) -> Dict[str, Any]:
+    """
+    dog_id / device_id from headers (or query args), validated like sample columns.
+    Samples that name no dog anywhere belong to DEFAULT_DOG_ID.
+    """
+    dog_id = headers.get(DOG_ID_HEADER) or args.get("dog_id")
+    device_id = headers.get(DEVICE_ID_HEADER) or args.get("device_id")
+    defaults: Dict[str, Any] = {}
+    if dog_id not in (None, ""):
+        try:
+            defaults["dog_id"] = int(dog_id)
+        except (TypeError, ValueError):
+            raise IngestError(f"Invalid dog_id: {dog_id!r}")
+        if defaults["dog_id"] < 1:
+            raise IngestError(f"Invalid dog_id: {dog_id!r}")
+    if device_id not in (None, ""):
+        defaults["device_id"] = str(device_id)
+    defaults.setdefault("dog_id", DEFAULT_DOG_ID)
+    return defaults
+
+
+def decode_payload(body: bytes, mimetype: str, content_encoding: str = "") -> List[Any]:
+    """
+    JSON object/list, NDJSON (one object per line) or msgpack -> list of samples.
+    Bodies sent with Content-Encoding: gzip (harness_uploader) are inflated first.
+    """
+    mimetype = (mimetype or "").lower()
+    content_encoding = (content_encoding or "").strip().lower()
+
+    if content_encoding == "gzip":
+        body = _gunzip(body, INGEST_MAX_INFLATED_BYTES)
+    elif content_encoding not in ("", "identity"):
+        raise IngestError(f"Unsupported Content-Encoding: {content_encoding}")
+
+    if mimetype in MSGPACK_MIMETYPES:
+        if msgpack is None:
+            raise IngestError("msgpack is not installed on this server")
+        try:
+            payload = msgpack.unpackb(body, raw=False)
+        except Exception as exc:  # noqa: BLE001 - msgpack raises several types
+            raise IngestError(f"Invalid msgpack: {exc}") from exc
+    elif mimetype in NDJSON_MIMETYPES:
+        try:
+            payload = [json.loads(line) for line in body.splitlines() if line.strip()]
+        except ValueError as exc:
+            raise IngestError(f"Invalid NDJSON: {exc}") from exc
+    else:
+        try:
+            payload = json.loads(body)
+        except ValueError as exc:
+            raise IngestError("Invalid or missing JSON") from exc
+
+    if isinstance(payload, dict):
+        return [payload]
+    if isinstance(payload, list):
+        return payload
+    raise IngestError("Payload must be object or list")
+
+
+def _gunzip(body: bytes, limit: int) -> bytes:
+    """Inflate a (possibly multi-member) gzip body, never producing more than `limit` bytes."""
+    out = []
+    size = 0
+    data = body
+    try:
+        while data:
+            inflater = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+            chunk = inflater.decompress(data, limit - size + 1)
+            size += len(chunk)
+            if size > limit:
+                raise IngestTooLarge(f"Body inflates to more than {limit} bytes")
+            if not inflater.eof:
+                raise IngestError("Invalid gzip body: truncated")
+            out.append(chunk)
+            # Concatenated members; gzip writers may pad the end with zeros
+            data = inflater.unused_data.lstrip(b"\0")
+    except zlib.error as exc:
+        raise IngestError(f"Invalid gzip body: {exc}") from exc
+    return b"".join(out)
+
+
+def _column_values(samples: Sequence[Any], name: str) -> list:
+    return [s.get(name) if isinstance(s, Mapping) else None for s in samples]
+
+
+def _convert_numeric(values: list, integer: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    -> (float64 array with NaN for NULL, bool mask of unparseable entries).
+    Fast path converts the whole column at once; only a failing column is walked.
+    """
+    bad = np.zeros(len(values), dtype=bool)
+    try:
+        arr = np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        arr = None
+    # Equal-length lists in every sample convert "fine" to a 2-D array
+    if arr is None or arr.ndim != 1:
+        arr = np.empty(len(values), dtype=np.float64)
+        for i, v in enumerate(values):
+            if v is None or v == "":
+                arr[i] = np.nan
+                continue
+            try:
+                arr[i] = float(v)
+            except (TypeError, ValueError):
+                arr[i] = np.nan
+                bad[i] = True
+    if integer:
+        finite = np.isfinite(arr)
+        bad |= finite & (arr != np.round(arr))
+    # NaN from the client reads as NULL; infinities are never valid readings.
+    bad |= np.isinf(arr)
+    return arr, bad
+
+
+def validate_batch(
+    samples: Sequence[Any], defaults: Optional[Mapping[str, Any]] = None
+) -> Tuple[List[tuple], List[int], List[Dict[str, Any]]]:
+    """
+    Validate a batch column by column.
+    `defaults` fills columns a sample leaves out (e.g. dog_id/device_id from headers).
+    Returns (rows ready for INSERT_SQL, source index of each row, per-row errors).
+    """
+    n = len(samples)
+    row_ok = np.array([isinstance(s, Mapping) for s in samples], dtype=bool)
+    errors: List[Dict[str, Any]] = [
+        {"index": i, "field": None, "message": "Sample must be an object"}
+        for i in np.flatnonzero(~row_ok).tolist()
+    ]
+
+    columns: Dict[str, list] = {}
+    for name, (kind, bounds) in INGEST_COLUMNS.items():
+        values = _column_values(samples, name)
+        if defaults and defaults.get(name) is not None:
+            default = defaults[name]
+            values = [default if v is None else v for v in values]
+
+        if kind == "text":
+            columns[name] = [None if v is None else str(v) for v in values]
+            continue
+
+        arr, bad = _convert_numeric(values, integer=kind in ("int", "flag"))
+        missing = np.isnan(arr) & ~bad
+
+        if name in REQUIRED_COLUMNS:
+            bad |= missing
+        if kind == "flag":
+            arr[missing] = 0
+            bad |= (arr != 0) & (arr != 1) & ~np.isnan(arr)
+        elif bounds is not None:
+            lo, hi = bounds
+            with np.errstate(invalid="ignore"):
+                if lo is not None:
+                    bad |= arr < lo
+                if hi is not None:
+                    bad |= arr > hi
+
+        for i in np.flatnonzero(bad & row_ok).tolist():
+            if name in REQUIRED_COLUMNS and values[i] is None:
+                message = "Missing required value"
+            else:
+                message = f"Invalid value: {values[i]!r}"
+            errors.append({"index": i, "field": name, "message": message})
+        row_ok &= ~bad
+
+        out = arr.tolist()
+        if kind in ("int", "flag"):
+            columns[name] = [None if v != v else int(v) for v in out]
+        else:
+            columns[name] = [None if v != v else v for v in out]
+
+    # Derive the human-readable datetime the logger would have written.
+    datetimes = columns["datetime"]
+    timestamps = columns["timestamp"]
+    for i in range(n):
+        if datetimes[i] is None and timestamps[i] is not None and row_ok[i]:
+            try:
+                datetimes[i] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamps[i]))
+            except (OverflowError, OSError, ValueError):
+                errors.append(
+                    {"index": i, "field": "timestamp", "message": f"Invalid value: {timestamps[i]!r}"}
+                )
+                row_ok[i] = False
+
+    keep = np.flatnonzero(row_ok).tolist()
+    names = list(INGEST_COLUMNS)
+    rows = [tuple(columns[name][i] for name in names) for i in keep]
+    errors.sort(key=lambda e: e["index"])
+    return rows, keep, errors
+
+
+def insert_rows(conn, rows: List[tuple]) -> int:
+    """Insert and commit `rows` as one transaction; on failure none of them are kept."""
+    if not rows:
+        return 0
+    try:
+        conn.executemany(INSERT_SQL, rows)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(rows)
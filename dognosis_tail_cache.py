@@ -0,0 +1,262 @@
+"""
+In-process cache of the newest sensor_data / flags rows for the Flask API.
+
+`/`, `/live-data` and `/flags` all want the same few hundred newest rows. Instead
+of every request sorting the table, one TailCache per process pulls only rows with
+id > last seen id (at most once per tick) into NumPy column arrays and the routes
+slice those. Request cost no longer depends on DB size or on how many dashboards poll.
+version() is the data_version() each refresh read first, so ETags describe the
+cached rows rather than the (possibly newer) database.
+"""
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from dognosis_db import DEFAULT_DOG_ID, connect, is_compact
+from dognosis_http import data_version
+
+TAIL_WINDOW_SEC = 600
+TAIL_MIN_SENSOR_ROWS = 400  # /live-data returns this many rows even if older than the window
+TAIL_FLAG_ROWS = 50  # /flags sidebar size
+TAIL_REFRESH_TICK_SEC = 1.0  # logger writes at 1 Hz
+
+# column -> storage kind
+#   id    : int64, never NULL
+#   float : float64, NULL -> NaN
+#   int   : float64, NULL -> NaN, served back as int
+#   flag  : int8, NULL -> -1
+#   text  : object (str / None)
+SENSOR_COLUMNS = {
+    "id": "id",
+    "timestamp": "float",
+    "datetime": "text",
+    "bpm": "float",
+    "temperature": "float",
+    "step_count": "int",
+    "high_hr": "flag",
+    "low_hr": "flag",
+    "rapid_change": "flag",
+    "unstable_hr": "flag",
+    "rmssd": "float",
+    "sdnn": "float",
+    "pnn50": "float",
+    "activity": "int",
+}
+FLAG_COLUMNS = {
+    "id": "id",
+    "timestamp": "float",
+    "flag_type": "text",
+    "description": "text",
+}
+
+
+def _to_array(kind: str, values) -> np.ndarray:
+    if kind == "id":
+        return np.asarray(values, dtype=np.int64)
+    if kind in ("float", "int"):
+        return np.asarray([np.nan if v is None else v for v in values], dtype=np.float64)
+    if kind == "flag":
+        return np.asarray([-1 if v is None else v for v in values], dtype=np.int8)
+    return np.asarray(values, dtype=object)
+
+
+def _to_list(kind: str, arr: np.ndarray) -> list:
+    values = arr.tolist()
+    if kind == "float":
+        return [None if v != v else v for v in values]
+    if kind == "int":
+        return [None if v != v else int(v) for v in values]
+    if kind == "flag":
+        return [None if v < 0 else v for v in values]
+    return values
+
+
+def _empty(spec: Dict[str, str]) -> Dict[str, np.ndarray]:
+    return {name: _to_array(kind, []) for name, kind in spec.items()}
+
+
+class _ColumnTail:
+    """Newest `keep` rows of one table by timestamp, held column-wise."""
+
+    def __init__(self, spec: Dict[str, str]):
+        self.spec = spec
+        self.columns = _empty(spec)
+        self.last_id = 0
+
+    def merge(self, rows: list, keep_from_ts: Optional[float], min_rows: int) -> None:
+        if not rows:
+            return
+        incoming = list(zip(*rows))
+        merged = {}
+        for (name, kind), values in zip(self.spec.items(), incoming):
+            merged[name] = np.concatenate([self.columns[name], _to_array(kind, values)])
+
+        # Late (backfilled) rows can carry older timestamps than rows already held.
+        order = np.argsort(merged["timestamp"], kind="stable")
+        n = len(order)
+        start = max(0, n - min_rows)
+        if keep_from_ts is not None:
+            start = min(start, int(np.searchsorted(merged["timestamp"][order], keep_from_ts)))
+        order = order[start:]
+
+        # Publish a fresh dict so readers never see a half-updated set of columns.
+        self.columns = {name: arr[order] for name, arr in merged.items()}
+        self.last_id = max(self.last_id, int(merged["id"].max()))
+
+    def newest(self, limit: int, names: List[str], newest_first: bool) -> List[dict]:
+        cols = self.columns
+        n = len(cols["id"])
+        lo = max(0, n - limit)
+        lists = []
+        for name in names:
+            arr = cols[name][lo:n]
+            if newest_first:
+                arr = arr[::-1]
+            lists.append(_to_list(self.spec[name], arr))
+        return [dict(zip(names, row)) for row in zip(*lists)]
+
+
+class TailCache:
+    """Tail of one dog's sensor_data and flags (one instance per dog)."""
+
+    def __init__(
+        self,
+        dog_id: int = DEFAULT_DOG_ID,
+        window_sec: float = TAIL_WINDOW_SEC,
+        min_sensor_rows: int = TAIL_MIN_SENSOR_ROWS,
+        flag_rows: int = TAIL_FLAG_ROWS,
+        tick_sec: float = TAIL_REFRESH_TICK_SEC,
+    ):
+        self.dog_id = dog_id
+        self.window_sec = window_sec
+        self.min_sensor_rows = min_sensor_rows
+        self.flag_rows = flag_rows
+        self.tick_sec = tick_sec
+
+        self._lock = threading.Lock()
+        self._last_refresh = None
+        self._compact = None  # compact storage: id is ts_ms, keyed (dog_id, ts_ms)
+        self._sensor = _ColumnTail(SENSOR_COLUMNS)
+        self._flags = _ColumnTail(FLAG_COLUMNS)
+        self._reload_flags = False
+        self._version = (0, 0, 0)
+
+    def invalidate_flags(self) -> None:
+        """Flag edits/deletes are invisible to `id > last_id`; reload flags next refresh."""
+        with self._lock:
+            # Readers keep the old rows until the reload replaces them
+            self._reload_flags = True
+            self._last_refresh = None
+
+    def refresh(self) -> None:
+        now = time.monotonic()
+        if self._last_refresh is not None and now - self._last_refresh < self.tick_sec:
+            return
+        with self._lock:
+            # Another request may have refreshed while we waited for the lock.
+            if self._last_refresh is not None and now - self._last_refresh < self.tick_sec:
+                return
+            conn = connect()
+            try:
+                # Read before the rows: the cache then holds at least this version
+                version = data_version(conn)
+                self._pull(conn)
+            finally:
+                conn.close()
+            self._version = version
+            self._last_refresh = time.monotonic()
+
+    def version(self) -> Tuple[int, int, int]:
+        """data_version() as of the rows latest_sensor / latest_flags serve."""
+        self.refresh()
+        return self._version
+
+    def _pull(self, conn) -> None:
+        c = conn.cursor()
+        if self._compact is None:
+            self._compact = is_compact(conn)
+        if self._sensor.last_id == 0:
+            # Cold start: newest rows only via (dog_id, timestamp), never a full-table read.
+            c.execute(
+                f"""
+                SELECT {", ".join(SENSOR_COLUMNS)} FROM sensor_data
+                WHERE dog_id = ?
+                ORDER BY timestamp DESC LIMIT ?
+                """,
+                (self.dog_id, max(self.min_sensor_rows, int(self.window_sec * 2))),
+            )
+        elif self._compact:
+            # Primary-key range. ids are timestamps here, so rows backfilled with
+            # older timestamps only show up after the next cold start.
+            c.execute(
+                f"""
+                /* compact storage */
+                SELECT {", ".join(SENSOR_COLUMNS)} FROM sensor_data
+                WHERE dog_id = ? AND id > ?
+                ORDER BY id ASC
+                """,
+                (self.dog_id, self._sensor.last_id),
+            )
+        else:
+            # +dog_id keeps the planner on the rowid range; the dog index would
+            # otherwise walk (and sort) every row this dog has ever logged.
+            c.execute(
+                f"""
+                /* rowid storage */
+                SELECT {", ".join(SENSOR_COLUMNS)} FROM sensor_data
+                WHERE id > ? AND +dog_id = ?
+                ORDER BY id ASC
+                """,
+                (self._sensor.last_id, self.dog_id),
+            )
+        rows = c.fetchall()
+        if rows:
+            newest_ts = max(r[1] for r in rows)
+            if len(self._sensor.columns["timestamp"]):
+                newest_ts = max(newest_ts, float(self._sensor.columns["timestamp"].max()))
+            self._sensor.merge(rows, newest_ts - self.window_sec, self.min_sensor_rows)
+        elif self._sensor.last_id == 0 and not self._compact:
+            # Nothing for this dog yet: only look at newer rows from now on.
+            c.execute("/* rowid storage */ SELECT MAX(id) FROM sensor_data")
+            self._sensor.last_id = c.fetchone()[0] or 0
+
+        flags = self._flags
+        if self._reload_flags:
+            flags = _ColumnTail(FLAG_COLUMNS)
+        if flags.last_id == 0:
+            c.execute(
+                f"""
+                SELECT {", ".join(FLAG_COLUMNS)} FROM flags
+                WHERE dog_id = ? AND flag_type != 'Arrhythmia'
+                ORDER BY timestamp DESC LIMIT ?
+                """,
+                (self.dog_id, self.flag_rows),
+            )
+        else:
+            c.execute(
+                f"""
+                SELECT {", ".join(FLAG_COLUMNS)} FROM flags
+                WHERE id > ? AND +dog_id = ? AND flag_type != 'Arrhythmia'
+                ORDER BY id ASC
+                """,
+                (flags.last_id, self.dog_id),
+            )
+        rows = c.fetchall()
+        if rows:
+            flags.merge(rows, None, self.flag_rows)
+        elif flags.last_id == 0:
+            # Remember that the flags table was read, even if it is empty.
+            c.execute("SELECT MAX(id) FROM flags")
+            flags.last_id = c.fetchone()[0] or 0
+        self._flags = flags
+        self._reload_flags = False
+
+    def latest_sensor(self, limit: int, names: List[str], newest_first: bool = True) -> List[dict]:
+        self.refresh()
+        return self._sensor.newest(limit, names, newest_first)
+
+    def latest_flags(self, limit: int, newest_first: bool = True) -> List[dict]:
+        self.refresh()
+        return self._flags.newest(limit, list(FLAG_COLUMNS), newest_first)
@@ -0,0 +1,258 @@
+"""
+Heart-rate DSP in a separate process (opt-in: DOGNOSIS_DSP_PROCESS=1).
+
+PPG processing runs on every sample and is the heaviest work the logger does.
+In-process it holds the GIL against the IMU and I2C threads (and the dashboard,
+when both run on the Pi), which is where samples get dropped. With the worker
+enabled:
+
+- the acquisition side only reads the FIFO and appends (red, ir) - plus the IMU
+  motion reference, when motion cancellation is on - to a shared-memory ring
+  (SampleRing) - no locks, no pickling per sample
+- a worker process on another core replays those samples through an ordinary
+  HeartRateMonitor (handle_sample / process_signal, same rules as in-process)
+- HR changes and accepted RR intervals come back over a multiprocessing queue (a
+  few per second at most) and are published to the usual listeners from a small
+  reader thread
+
+HeartRateWorker wraps the monitor and exposes the same surface the runtimes use
+(sensor, fs, handle_sample, process_signal, publish_if_changed, add_listener,
+add_rr_listener, start_sensor / stop_sensor), so callers swap one object for the other.
+
+IMU step detection is O(1) per sample and stays in-process.
+"""
+import multiprocessing as mp
+import os
+import signal
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from updated_heartrate_monitor_v3 import HeartRateMonitor
+
+# Samples the ring holds before an unread one is overwritten (worker stalled this long)
+RING_SECONDS = 10
+# How often the worker looks for new samples when the ring is empty
+WORKER_POLL_SEC = 0.01
+
+
+class SampleRing:
+    """
+    Single-producer / single-consumer ring of float64 rows in shared memory.
+
+    Layout: one int64 write count, then `capacity` rows of `width` values. The
+    producer stores a row before bumping the count, so the consumer never reads a
+    half-written row. A consumer that falls `capacity` or more rows behind has lost
+    the oldest ones (the slot being written next counts as lost); read_from() says
+    how many.
+    """
+
+    def __init__(self, capacity, width):
+        self.capacity = capacity
+        self.width = width
+        self.shm = shared_memory.SharedMemory(create=True, size=8 + capacity * width * 8)
+        self._count = np.ndarray((1,), dtype=np.int64, buffer=self.shm.buf)
+        self._rows = np.ndarray((capacity, width), dtype=np.float64, buffer=self.shm.buf, offset=8)
+        self._count[0] = 0
+
+    def push(self, *values):
+        n = int(self._count[0])
+        self._rows[n % self.capacity] = values
+        self._count[0] = n + 1
+
+    def read_from(self, start):
+        """Rows written since count `start` -> (rows, next start, rows lost)."""
+        end = int(self._count[0])
+        lost = max(0, end - start - self.capacity)
+        start += lost
+        rows = self._rows[np.arange(start, end) % self.capacity].copy()
+        # Rows the producer overwrote while we were copying are lost too. push()
+        # stores slot `count % capacity` before bumping the count, so at count c the
+        # row c - capacity may be half-overwritten as well.
+        overwritten = min(int(self._count[0]) - self.capacity - start + 1, len(rows))
+        if overwritten > 0:
+            rows = rows[overwritten:]
+            lost += overwritten
+        return rows, end, lost
+
+    def close(self, unlink=False):
+        del self._count, self._rows  # numpy views must go before the mapping
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def _hr_state(hrm):
+    return (
+        hrm.bpm,
+        hrm.high_hr_flag,
+        hrm.low_hr_flag,
+        hrm.rapid_change_flag,
+        hrm.unstable_hr_flag,
+        hrm.sqi,
+        hrm.rmssd,
+        hrm.sdnn,
+        hrm.pnn50,
+    )
+
+
+def _run_hr_worker(ring, results, stop, parent_pid, print_raw, print_result, bpm_method,
+                   motion_channels):
+    """Worker process: replay ring samples through a sensorless HeartRateMonitor."""
+    # systemd / Ctrl-C signal the whole group; the parent decides when we stop, so
+    # the last samples are processed and `stop` is never left with a dead waiter.
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    dsp = HeartRateMonitor(
+        print_raw=print_raw, print_result=print_result, open_sensor=False, bpm_method=bpm_method
+    )
+    dsp.add_listener(lambda hrm: results.put(("hr", _hr_state(hrm))))
+    dsp.add_rr_listener(lambda beat_time, rr: results.put(("rr", (beat_time, rr))))
+    # Each row is (red, ir, *motion reference at that sample)
+    reference = [[0.0] * motion_channels]
+    if motion_channels:
+        dsp.set_motion_source(lambda: reference[0])
+    read_pos = 0
+    while not stop.is_set() and os.getppid() == parent_pid:
+        rows, read_pos, lost = ring.read_from(read_pos)
+        if lost:
+            results.put(("lost", lost))
+        if not len(rows):
+            time.sleep(WORKER_POLL_SEC)
+            continue
+        for row in rows.tolist():
+            red, ir = row[0], row[1]
+            reference[0] = row[2:]
+            if dsp.handle_sample(red, ir):
+                dsp.process_signal()
+            dsp.publish_if_changed()
+
+
+class HeartRateWorker:
+    """Stands in for a HeartRateMonitor whose DSP runs in a worker process."""
+
+    def __init__(self, hrm, ring_seconds=RING_SECONDS):
+        """hrm: the configured monitor (bpm_method, set_motion_source) to mirror."""
+        self.hrm = hrm
+        self.sensor = hrm.sensor
+        self.fs = hrm.fs
+        (
+            self.bpm,
+            self.high_hr_flag,
+            self.low_hr_flag,
+            self.rapid_change_flag,
+            self.unstable_hr_flag,
+            self.sqi,
+            self.rmssd,
+            self.sdnn,
+            self.pnn50,
+        ) = _hr_state(hrm)
+        self.listeners = []
+        self.rr_listeners = []
+        self.dropped_samples = 0
+        self.running = False
+
+        self.motion_source = hrm.motion_source
+        motion_channels = len(self.motion_source()) if self.motion_source else 0
+        self.ring = SampleRing(int(ring_seconds * self.fs), 2 + motion_channels)
+        # fork, not spawn: spawn re-runs the logger script's top level in the child.
+        # The child inherits the ring's mapping; only this process closes/unlinks it.
+        # start() has to happen before any sensor threads are running.
+        ctx = mp.get_context("fork")
+        self._results = ctx.Queue()
+        self._stop = ctx.Event()
+        self._process = ctx.Process(
+            target=_run_hr_worker,
+            args=(self.ring, self._results, self._stop, os.getpid(),
+                  hrm.print_raw, hrm.print_result, hrm.bpm_method, motion_channels),
+            name="hr-dsp",
+            daemon=True,
+        )
+        self._reader = threading.Thread(target=self._read_results, name="hr-results", daemon=True)
+
+    def start(self):
+        self._process.start()
+        self._reader.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        self._process.join(timeout=5)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._results.put(None)
+        self._reader.join()
+        self.ring.close(unlink=True)
+        if self.dropped_samples:
+            print(f"HR worker fell behind and lost {self.dropped_samples} samples")
+
+    # ------------------------
+    # HeartRateMonitor surface
+    # ------------------------
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def add_rr_listener(self, listener):
+        self.rr_listeners.append(listener)
+
+    def handle_sample(self, red, ir):
+        self._push(red, ir)
+        return False  # the worker decides when a window is ready
+
+    def process_signal(self):
+        pass
+
+    def publish_if_changed(self):
+        pass  # results arrive (already de-duplicated) on the reader thread
+
+    def start_sensor(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run)
+        self.thread.start()
+
+    def stop_sensor(self):
+        self.running = False
+        self.thread.join()
+
+    def _run(self):
+        # I/O only: everything else happens in the worker process
+        while self.running:
+            red, ir = self.sensor.read_fifo()
+            self._push(red, ir)
+            time.sleep(1 / self.fs)
+
+    def _push(self, red, ir):
+        if self.motion_source is None:
+            self.ring.push(red, ir)
+        else:
+            self.ring.push(red, ir, *self.motion_source())
+
+    def _read_results(self):
+        while True:
+            message = self._results.get()
+            if message is None:
+                return
+            kind, value = message
+            if kind == "lost":
+                self.dropped_samples += value
+                continue
+            if kind == "rr":
+                for listener in self.rr_listeners:
+                    listener(*value)
+                continue
+            (
+                self.bpm,
+                self.high_hr_flag,
+                self.low_hr_flag,
+                self.rapid_change_flag,
+                self.unstable_hr_flag,
+                self.sqi,
+                self.rmssd,
+                self.sdnn,
+                self.pnn50,
+            ) = value
+            for listener in self.listeners:
+                listener(self)
@@ -1,5 +1,7 @@
+import threading
 import time
 from mpu6050 import mpu6050
+from orientation import PostureTracker
 
 LIMP_PERCENT_THRESHOLD = 0.15   # 15% asymmetry threshold
 
@@ -20,6 +22,14 @@ class DualIMUStepAnalyzer:
         self.dog_length_in = dog_length_in
         self.limp_flag = False
 
+        # Gait metrics, recomputed once per step instead of on every read
+        self.metrics = self._compute_metrics()
+        self.listeners = []
+        self._metrics_lock = threading.Lock()
+        self.left.add_step_listener(self._on_step)
+        self.right.add_step_listener(self._on_step)
+        self.posture_tracker = PostureTracker((self.left, self.right))
+
     # ---------------------------------
     # Setup
     # ---------------------------------
@@ -38,6 +48,52 @@ class DualIMUStepAnalyzer:
         self.left.stop()
         self.right.stop()
 
+    # ---------------------------------
+    # Step events
+    # ---------------------------------
+    def add_listener(self, listener):
+        """listener(metrics_dict) runs after every step on either leg."""
+        self.listeners.append(listener)
+
+    def _compute_metrics(self):
+        left_avg = self.left.get_average_step_length()
+        right_avg = self.right.get_average_step_length()
+        if left_avg == 0 and right_avg == 0:
+            avg_len = 0
+        else:
+            avg_len = (left_avg + right_avg) / 2
+        asymmetry = abs(left_avg - right_avg)
+        return {
+            "steps": self.left.steps + self.right.steps,
+            "latest_step_length": self.left.get_latest_step_length(),
+            "avg_step_length": avg_len,
+            "asymmetry": asymmetry,
+            "limp": int(asymmetry > self.dog_length_in * LIMP_PERCENT_THRESHOLD),
+        }
+
+    def _on_step(self, imu, timestamp, step_length):
+        # Both IMU threads step independently; compute + publish one at a time.
+        with self._metrics_lock:
+            self.metrics = self._compute_metrics()
+            self.limp_flag = bool(self.metrics["limp"])
+            metrics = self.metrics
+            for listener in self.listeners:
+                listener(metrics)
+
+    def motion_reference(self):
+        """Latest accelerometer readings of both legs (g): the PPG noise reference."""
+        left = self.left.last_accel
+        right = self.right.last_accel
+        return (left['x'], left['y'], left['z'], right['x'], right['y'], right['z'])
+
+    def imu_window(self):
+        """Recent accelerometer windows (left, right) for activity.classify."""
+        return self.left.accel_window(), self.right.accel_window()
+
+    def orientation(self):
+        """Pitch / roll / posture over the samples since the last call (orientation.py)."""
+        return self.posture_tracker.update()
+
     # ---------------------------------
     # Step Metrics
     # ---------------------------------
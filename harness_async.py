@@ -0,0 +1,216 @@
+"""
+asyncio runtime for the harness logger (run by dognosis-logger.service).
+
+One event loop replaces the sleep-timed threads of test_logging_sensor_data_9.py:
+
+- each device is sampled on a deadline timer: tick k fires at start + k * period,
+  so sleep overshoot never accumulates, and an overrun skips ticks instead of
+  firing a burst of late ones
+- every SMBus call goes through one single-thread executor, so the MAX30102 and
+  both MPU-6050s never interleave transactions on the bus
+- samples travel through bounded asyncio queues to processing coroutines (the
+  HR stage can run in a separate process instead, with DOGNOSIS_DSP_PROCESS=1,
+  see dsp_worker.py)
+- SQLite writes run on their own thread
+- SIGTERM / SIGINT cancel every task, then the last row is committed and the
+  sensors and database are closed
+
+Row/flag rules are the same HarnessLogger the threaded script uses.
+
+Run: python harness_async.py
+"""
+import asyncio
+import signal
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dognosis_db import DB_PATH as DB_NAME, migrate
+from harness_logger import (
+    DOG_ID,
+    DSP_PROCESS,
+    HR_METHOD,
+    LOG_INTERVAL_SEC,
+    MOTION_CANCEL,
+    TEMP_READ_INTERVAL_SEC,
+    HarnessLogger,
+    SnapshotPublisher,
+)
+
+# Samples buffered between a sampler and its processor before the oldest are dropped
+HR_QUEUE_MAX = 200  # 2 s at 100 Hz
+IMU_QUEUE_MAX = 100  # 2 s at 50 Hz
+
+
+async def deadline_ticks(period):
+    """Yield once per period, scheduled against absolute deadlines."""
+    loop = asyncio.get_running_loop()
+    next_at = loop.time()
+    while True:
+        yield next_at
+        next_at += period
+        delay = next_at - loop.time()
+        if delay < 0:
+            # Overran one or more periods: realign instead of catching up in a burst
+            next_at += (int(-delay // period) + 1) * period
+            delay = next_at - loop.time()
+        await asyncio.sleep(delay)
+
+
+class HarnessRuntime:
+    def __init__(self, hrm, step_counter, conn, dog_id=DOG_ID):
+        self.hrm = hrm
+        self.step_counter = step_counter
+        self.conn = conn
+
+        self.readings = SnapshotPublisher()
+        self.readings.attach(hrm, step_counter)
+        self.logger = HarnessLogger(conn, dog_id)
+
+        self._i2c = ThreadPoolExecutor(max_workers=1, thread_name_prefix="i2c")
+        self._db = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db")
+        self.dropped_samples = 0
+
+    # ------------------------
+    # Helpers
+    # ------------------------
+    async def _on(self, executor, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+    def _offer(self, queue, item):
+        """Enqueue without blocking the sampler; drop the oldest sample if full."""
+        if queue.full():
+            queue.get_nowait()
+            self.dropped_samples += 1
+        queue.put_nowait(item)
+
+    # ------------------------
+    # Heart rate
+    # ------------------------
+    async def sample_heart_rate(self, queue):
+        async for _ in deadline_ticks(1 / self.hrm.fs):
+            try:
+                red, ir = await self._on(self._i2c, self.hrm.sensor.read_fifo)
+            except OSError as e:
+                print(f"HRM read error: {e}")
+                continue
+            self._offer(queue, (red, ir))
+
+    async def process_heart_rate(self, queue):
+        while True:
+            red, ir = await queue.get()
+            if self.hrm.handle_sample(red, ir):
+                self.hrm.process_signal()
+            self.hrm.publish_if_changed()
+
+    # ------------------------
+    # IMUs
+    # ------------------------
+    async def sample_imu(self, imu, queue):
+        async for _ in deadline_ticks(1 / imu.SAMPLE_RATE):
+            try:
+                accel, gyro = await self._on(self._i2c, imu.read_motion)
+            except OSError as e:
+                print(f"IMU {hex(imu.address)} read error: {e}")
+                continue
+            self._offer(queue, (accel, gyro, time.time()))
+
+    async def process_imu(self, imu, queue):
+        while True:
+            accel, gyro, now = await queue.get()
+            imu.process_accel(accel, now, gyro)
+
+    async def sample_temperature(self):
+        async for _ in deadline_ticks(TEMP_READ_INTERVAL_SEC):
+            try:
+                celsius = await self._on(self._i2c, self.step_counter.left.get_temp)
+            except OSError as e:
+                print(f"MPU temperature error: {e}")
+                celsius = None
+            self.readings.on_temperature(celsius)
+
+    # ------------------------
+    # Logging
+    # ------------------------
+    async def log_rows(self):
+        async for _ in deadline_ticks(LOG_INTERVAL_SEC):
+            await self._on(self._db, self.logger.tick, self.readings, time.time())
+
+    # ------------------------
+    # Lifecycle
+    # ------------------------
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+
+        hr_queue = asyncio.Queue(maxsize=HR_QUEUE_MAX)
+        coros = [
+            self.sample_heart_rate(hr_queue),
+            self.process_heart_rate(hr_queue),
+            self.sample_temperature(),
+            self.log_rows(),
+        ]
+        for imu in (self.step_counter.left, self.step_counter.right):
+            imu_queue = asyncio.Queue(maxsize=IMU_QUEUE_MAX)
+            coros += [self.sample_imu(imu, imu_queue), self.process_imu(imu, imu_queue)]
+        tasks = [asyncio.create_task(c) for c in coros]
+        stopper = asyncio.create_task(stop.wait())
+
+        print("Logging data to SQLite...")
+        try:
+            await asyncio.wait([stopper, *tasks], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            print("Stopping...")
+            stopper.cancel()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(stopper, *tasks, return_exceptions=True)
+            await self._close()
+
+        # A task that ended on its own crashed; let systemd see the failure and restart.
+        for task in tasks:
+            if not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+
+    async def _close(self):
+        try:
+            await self._on(self._i2c, self.hrm.sensor.shutdown)
+        except OSError as e:
+            print(f"HRM shutdown error: {e}")
+        # Any in-flight tick finishes (and commits) before the connection closes.
+        await self._on(self._db, self.logger.flush)
+        await self._on(self._db, self.conn.close)
+        for executor in (self._i2c, self._db):
+            executor.shutdown(wait=False, cancel_futures=True)
+        if self.dropped_samples:
+            print(f"Dropped {self.dropped_samples} samples (processing fell behind)")
+
+
+def main():
+    from updated_heartrate_monitor_v3 import HeartRateMonitor
+    from dual_IMU_step_counter_2 import DualIMUStepAnalyzer
+
+    step_counter = DualIMUStepAnalyzer()
+    step_counter.calibrate()
+    hrm = HeartRateMonitor(print_raw=False, print_result=False, bpm_method=HR_METHOD)
+    if MOTION_CANCEL:
+        hrm.set_motion_source(step_counter.motion_reference)
+    if DSP_PROCESS:
+        from dsp_worker import HeartRateWorker
+        # Forks the DSP worker, so it has to happen before the executors exist
+        hrm = HeartRateWorker(hrm).start()
+
+    conn = sqlite3.connect(DB_NAME, check_same_thread=False)
+    migrate(conn)
+
+    try:
+        asyncio.run(HarnessRuntime(hrm, step_counter, conn).run())
+    finally:
+        if DSP_PROCESS:
+            hrm.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,605 @@
+"""
+Per-second logging + flag rules for the harness, shared by both logger runtimes:
+test_logging_sensor_data_9.py (threads) and harness_async.py (asyncio).
+
+Sensors publish SensorSnapshot objects through a SnapshotPublisher; once a second
+HarnessLogger.tick() takes the current snapshot, writes one sensor_data row and
+inserts any flags whose rules fired.
+"""
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from activity import ACTIVITY_HR_ALLOWANCE, ACTIVITY_LABELS, GAITS, REST, classify
+from change_detect import DetectorBank
+from dognosis_db import DEFAULT_DOG_ID
+from hr_baseline import HRBaseline
+from hrv import ROLLUP_SEC, HRVSums, successive_diff
+from orientation import STANDING
+from dog_profile_hr import (
+    HR_FLAG_HIGH_ABOVE_PRED,
+    HR_FLAG_LOW_BELOW_PRED,
+    compute_predicted_hr,
+    emotional_distress_avg_threshold,
+    row_tuple_to_hr_dict,
+)
+
+# -------------------------
+# Config / Thresholds
+# -------------------------
+
+# Which dog_profile row this harness logs for (multi-dog databases)
+DOG_ID = int(os.environ.get("DOGNOSIS_DOG_ID", DEFAULT_DOG_ID))
+# Run the heart-rate DSP in its own process (dsp_worker.py) instead of on the GIL
+DSP_PROCESS = os.environ.get("DOGNOSIS_DSP_PROCESS", "0") == "1"
+# BPM from detected beats ("beats") or the Welch spectrum peak ("spectral")
+HR_METHOD = os.environ.get("DOGNOSIS_HR_METHOD", "beats")
+# Cancel gait artifacts in the PPG using the leg IMUs as reference (motion_artifact.py)
+MOTION_CANCEL = os.environ.get("DOGNOSIS_MOTION_CANCEL", "0") == "1"
+
+HIGH_TEMP_THRESHOLD = 105
+LOW_TEMP_THRESHOLD = 32
+SEVERE_LOW_TEMP_THRESHOLD = 10
+ASYMMETRY_THRESHOLD = 3.0
+
+# Standard high/low flags require the threshold to hold continuously for this long
+TEMP_HIGH_LOW_DURATION_SEC = 600  # 10 minutes
+# More severe cold exposure
+SEVERE_LOW_DURATION_SEC = 300  # 5 minutes
+
+HR_COOLDOWN = 300
+LIMP_COOLDOWN = 300
+TEMP_CHANGE_COOLDOWN = 1800
+
+# Cadence for the change detector: steps/min over this trailing window
+CADENCE_WINDOW_SEC = 60
+# An HR shift this soon after steps or a cadence shift is exercise, not a flag
+CADENCE_EXPLAINS_HR_SEC = 120
+
+# Emotional Distress: elevated avg HR over a window with low step activity (placeholders — tune with data)
+EMOTIONAL_DISTRESS_WINDOW_SEC = 90
+EMOTIONAL_DISTRESS_MAX_STEPS_PER_MIN = 10
+EMOTIONAL_DISTRESS_MIN_VALID_BPM_FRACTION = 0.65
+EMOTIONAL_DISTRESS_MIN_WINDOW_SAMPLES = 45
+EMOTIONAL_DISTRESS_COOLDOWN = 600
+
+# IMU temperature is read on its own cadence (flags need minutes of sustained readings)
+TEMP_READ_INTERVAL_SEC = 1.0
+# Logger treats readings as lost if nothing was published for this long
+STALE_SNAPSHOT_SEC = 5.0
+# dog_profile is re-read at most this often (predicted HR changes only on profile edits)
+PROFILE_REFRESH_SEC = 60
+LOG_INTERVAL_SEC = 1.0
+
+
+# -------------------------
+# Shared Data
+# -------------------------
+class SensorSnapshot(NamedTuple):
+    """
+    One immutable set of readings. Publishers swap in a new one by replacing a
+    single reference (atomic under the GIL), so readers never need a lock and never
+    see half of one update and half of the next. seq only advances when a reading
+    actually changed.
+    """
+    seq: int = 0
+    bpm: Optional[float] = None
+    high_hr: int = 0
+    low_hr: int = 0
+    rapid_change: int = 0
+    unstable_hr: int = 0
+    temperature: Optional[float] = None
+    steps: Optional[int] = None
+    latest_step_length: Optional[float] = None
+    avg_step_length: Optional[float] = None
+    asymmetry: Optional[float] = None
+    limp: Optional[int] = None
+    raw_temperature: Optional[float] = None
+    sqi: Optional[float] = None  # PPG signal quality (ppg_quality.py), None without contact
+    # Rolling HRV over the last 5 min of accepted beats (hrv.py); None until enough beats
+    rmssd: Optional[float] = None
+    sdnn: Optional[float] = None
+    pnn50: Optional[float] = None
+
+# What the logger uses when readings are lost (flags off, values NULL)
+EMPTY_SNAPSHOT = SensorSnapshot()
+
+
+class SnapshotPublisher:
+    """
+    Folds sensor events (HR changes, steps, temperature reads) into SensorSnapshot,
+    and collects accepted RR intervals until the logger takes them (take_rr).
+    """
+
+    def __init__(self):
+        self.snapshot = EMPTY_SNAPSHOT
+        # monotonic time of the last publish (stale-reading detection)
+        self.polled_at = time.monotonic()
+        # Several sensor threads may publish; readers never take this lock.
+        self._publish_lock = threading.Lock()
+        self._rr_batch = []
+        # () -> (left, right) accelerometer windows for activity.classify, and
+        # () -> orientation.Orientation or None (both set by attach)
+        self.imu_window = None
+        self.orientation = None
+
+    def publish(self, **readings):
+        with self._publish_lock:
+            current = self.snapshot
+            # Unchanged readings keep the same object (and seq).
+            if any(getattr(current, name) != value for name, value in readings.items()):
+                self.snapshot = current._replace(seq=current.seq + 1, **readings)
+            self.polled_at = time.monotonic()
+
+    # --- HEART RATE (on change) ---
+    def on_heart_rate(self, hrm):
+        self.publish(
+            bpm=hrm.bpm,
+            high_hr=int(hrm.high_hr_flag),
+            low_hr=int(hrm.low_hr_flag),
+            rapid_change=int(hrm.rapid_change_flag),
+            unstable_hr=int(hrm.unstable_hr_flag),
+            sqi=hrm.sqi,
+            rmssd=hrm.rmssd,
+            sdnn=hrm.sdnn,
+            pnn50=hrm.pnn50,
+        )
+
+    # --- RR INTERVALS (per accepted beat; logged in batches) ---
+    def on_rr(self, beat_time, rr):
+        with self._publish_lock:
+            self._rr_batch.append((beat_time, rr))
+
+    def take_rr(self):
+        """RR intervals (beat time, rr) received since the last call."""
+        with self._publish_lock:
+            batch, self._rr_batch = self._rr_batch, []
+        return batch
+
+    # --- IMU STEP COUNTER (once per step) ---
+    def on_steps(self, metrics):
+        self.publish(
+            steps=metrics["steps"],
+            latest_step_length=metrics["latest_step_length"],
+            avg_step_length=metrics["avg_step_length"],
+            asymmetry=metrics["asymmetry"],
+            limp=metrics["limp"],
+        )
+
+    # --- TEMPERATURE (own cadence) ---
+    def on_temperature(self, celsius):
+        temp = None if celsius is None else celsius * 9/5 + 32
+        self.publish(temperature=temp, raw_temperature=temp)
+
+    def attach(self, hrm, step_counter):
+        """Seed from the sensors' current state, then follow their events."""
+        self.on_heart_rate(hrm)
+        self.on_steps(step_counter.metrics)
+        hrm.add_listener(self.on_heart_rate)
+        hrm.add_rr_listener(self.on_rr)
+        step_counter.add_listener(self.on_steps)
+        self.imu_window = step_counter.imu_window
+        self.orientation = step_counter.orientation
+
+
+# -------------------------
+# Logger
+# -------------------------
+class HarnessLogger:
+    def __init__(self, conn, dog_id=DOG_ID):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.dog_id = dog_id
+
+        self.last_seq = None
+        self.snapshot_stale = False
+        self.pred_hr = None
+        self.profile_read_at = None
+        # Learned resting HR per hour of day; replaces pred_hr once it has enough data
+        self.baseline = HRBaseline(dog_id)
+        self.baseline.load(self.cursor)
+        self.limits = None
+        self.high_hr = 0
+        self.low_hr = 0
+        self.last_activity = None
+        # Last logged RR interval: successive differences span tick batches
+        self.last_rr = None
+        # EWMA/CUSUM change detectors on BPM, temperature and cadence (change_detect.py)
+        self.detectors = DetectorBank(dog_id)
+        self.detectors.load(self.cursor, time.time())
+        self.step_history = deque()  # (timestamp, steps) over CADENCE_WINDOW_SEC
+        self.cadence_changed_at = None
+        self.moved_at = None  # last tick with new steps
+
+        self.last_flag_times = {
+            "High HR": 0,
+            "Low HR": 0,
+            "Rapid HR Change": 0,
+            "Unstable HR": 0,
+            "Temperature Change": 0,
+            "Emotional Distress": 0,
+            "Limp": 0,
+            "High Temperature": 0,
+            "Low Temperature": 0,
+            "Severe Low Temperature": 0,
+        }
+
+        self.emotional_distress_history = deque()
+
+        # Sustained temperature conditions (reset when reading is lost or condition clears)
+        self.high_temp_since = None
+        self.low_temp_since = None
+        self.severe_low_since = None
+        self.high_temp_episode_fired = False
+        self.low_temp_episode_fired = False
+        self.severe_low_episode_fired = False
+
+    # -------------------------
+    # Flag helper
+    # -------------------------
+    def insert_flag(self, timestamp, dt, flag_type, description):
+        self.cursor.execute("""
+            INSERT INTO flags (timestamp, datetime, flag_type, description, is_user_generated, dog_id)
+            VALUES (?, ?, ?, ?, 0, ?)
+        """, (timestamp, dt, flag_type, description, self.dog_id))
+
+    def _refresh_profile(self, timestamp):
+        self.cursor.execute(
+            "SELECT weight, date_of_birth, breed_code FROM dog_profile WHERE id = ?",
+            (self.dog_id,),
+        )
+        prof_row = self.cursor.fetchone()
+        prof_cols = [d[0] for d in self.cursor.description] if self.cursor.description else []
+        if prof_row:
+            self.pred_hr = compute_predicted_hr(row_tuple_to_hr_dict(prof_row, prof_cols))
+        else:
+            self.pred_hr = None
+        self.limits = self.baseline.thresholds(timestamp)
+        self.profile_read_at = timestamp
+        self.last_seq = None  # re-derive HR flags against the new prediction
+
+    def tick(self, source, timestamp=None):
+        """Log one row from source.snapshot (a SnapshotPublisher) and apply flag rules."""
+        timestamp = time.time() if timestamp is None else timestamp
+        dt = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+        # Lock-free read: one reference, every field from the same update
+        snap = source.snapshot
+        if time.monotonic() - source.polled_at > STALE_SNAPSHOT_SEC:
+            # Sensors stalled (e.g. I2C hang): don't log frozen values as live
+            if not self.snapshot_stale:
+                print(f"Sensor readings stale for >{STALE_SNAPSHOT_SEC:.0f}s; logging empty rows")
+                self.snapshot_stale = True
+            snap = EMPTY_SNAPSHOT
+        elif self.snapshot_stale:
+            print("Sensor readings resumed")
+            self.snapshot_stale = False
+
+        bpm = snap.bpm
+        temp = snap.temperature
+        steps = snap.steps
+        limp = snap.limp
+        # Activity over the last IMU window (activity.py); None without fresh IMU data
+        activity = None
+        if source.imu_window is not None and not self.snapshot_stale:
+            activity = classify(*source.imu_window())
+        # Leg pitch / roll and posture over the IMU samples since the last tick
+        orientation = None
+        if source.orientation is not None and not self.snapshot_stale:
+            orientation = source.orientation()
+        if orientation is None:
+            pitch = roll = posture = None
+        else:
+            pitch, roll = round(orientation.pitch, 1), round(orientation.roll, 1)
+            # Legs swing through large angles in gait; a walking dog is standing
+            posture = STANDING if activity in GAITS else orientation.posture
+
+        if self.profile_read_at is None or timestamp - self.profile_read_at >= PROFILE_REFRESH_SEC:
+            self._refresh_profile(timestamp)
+
+        # Duplicate snapshot and same activity as last second: reuse derived flags
+        if snap.seq != self.last_seq or activity != self.last_activity:
+            self.high_hr = snap.high_hr
+            self.low_hr = snap.low_hr
+            if bpm is not None and bpm > 0:
+                # Exercise raises the high limit; the low limit holds whatever the dog is doing
+                allowance = ACTIVITY_HR_ALLOWANCE.get(activity, 0)
+                if self.limits is not None:
+                    self.high_hr = int(bpm > self.limits.high + allowance)
+                    self.low_hr = int(bpm < self.limits.low)
+                elif self.pred_hr is not None:
+                    self.high_hr = int(bpm > self.pred_hr + HR_FLAG_HIGH_ABOVE_PRED + allowance)
+                    self.low_hr = int(bpm < self.pred_hr - HR_FLAG_LOW_BELOW_PRED)
+            self.last_seq = snap.seq
+            self.last_activity = activity
+        high_hr = self.high_hr
+        low_hr = self.low_hr
+        if self.limits is not None:
+            pred_hr, pred_label = self.limits.expected, "baseline"
+        else:
+            pred_hr, pred_label = self.pred_hr, "pred"
+        self.baseline.observe(timestamp, bpm, steps, snap.sqi, activity)
+
+        emotional_distress_min_avg = emotional_distress_avg_threshold(pred_hr)
+        self.emotional_distress_history.append((timestamp, bpm, steps))
+        while (
+            self.emotional_distress_history
+            and self.emotional_distress_history[0][0] < timestamp - EMOTIONAL_DISTRESS_WINDOW_SEC
+        ):
+            self.emotional_distress_history.popleft()
+
+        # -------------------------
+        # Insert sensor data
+        # -------------------------
+        self.cursor.execute("""
+            INSERT INTO sensor_data (
+                timestamp, datetime, bpm, temperature,
+                step_count, latest_step_length, avg_step_length,
+                asymmetry, limp, raw_temperature,
+                high_hr, low_hr, rapid_change, unstable_hr,
+                arrhythmia, dog_id, sqi, rmssd, sdnn, pnn50, activity,
+                pitch, roll, posture
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            timestamp,
+            dt,
+            bpm,
+            temp,
+            steps,
+            snap.latest_step_length,
+            snap.avg_step_length,
+            snap.asymmetry,
+            limp,
+            snap.raw_temperature,
+            snap.high_hr,               # 1 if high HR, else 0
+            snap.low_hr,                # 1 if low HR, else 0
+            snap.rapid_change,          # 1 if rapid BPM change, else 0
+            snap.unstable_hr,           # 1 if unstable HR, else 0
+            None,                       # arrhythmia intentionally left blank
+            self.dog_id,
+            snap.sqi,
+            snap.rmssd,
+            snap.sdnn,
+            snap.pnn50,
+            activity,
+            pitch,
+            roll,
+            posture,
+        ))
+        self._log_rr(source.take_rr())
+        self._log_activity(timestamp, activity, bpm)
+
+        def insert_flag(flag_type, description):
+            self.insert_flag(timestamp, dt, flag_type, description)
+
+        last_flag_times = self.last_flag_times
+
+        # -------------------------
+        # HR FLAGS (NEW)
+        # -------------------------
+        if high_hr and timestamp - last_flag_times["High HR"] > HR_COOLDOWN:
+            doing = "" if activity is None else f", {ACTIVITY_LABELS[activity]}"
+            if pred_hr is not None and bpm is not None:
+                insert_flag("High HR", f"BPM elevated: {bpm:.1f} ({pred_label} {pred_hr:.1f}{doing})")
+            else:
+                insert_flag("High HR", f"BPM elevated: {bpm:.1f}")
+            last_flag_times["High HR"] = timestamp
+
+        if low_hr and timestamp - last_flag_times["Low HR"] > HR_COOLDOWN:
+            if pred_hr is not None and bpm is not None:
+                insert_flag("Low HR", f"BPM low: {bpm:.1f} ({pred_label} {pred_hr:.1f})")
+            else:
+                insert_flag("Low HR", f"BPM low: {bpm:.1f}")
+            last_flag_times["Low HR"] = timestamp
+
+        self._change_flags(timestamp, bpm, temp, steps, activity, insert_flag)
+
+        if snap.unstable_hr and timestamp - last_flag_times["Unstable HR"] > HR_COOLDOWN:
+            insert_flag("Unstable HR", "Heart rate unstable over time.")
+            last_flag_times["Unstable HR"] = timestamp
+
+        # Emotional Distress: sustained elevated HR with low movement (does not replace Rapid HR Change)
+        if len(self.emotional_distress_history) >= EMOTIONAL_DISTRESS_MIN_WINDOW_SAMPLES:
+            pts = list(self.emotional_distress_history)
+            bpms = [p[1] for p in pts if p[1] is not None and p[1] > 0]
+            if len(bpms) >= len(pts) * EMOTIONAL_DISTRESS_MIN_VALID_BPM_FRACTION:
+                avg_bpm = sum(bpms) / len(bpms)
+                step_pts = [(p[0], p[2]) for p in pts if p[2] is not None]
+                if len(step_pts) >= 2:
+                    t0, s0 = step_pts[0]
+                    t1, s1 = step_pts[-1]
+                    dur = t1 - t0
+                    if dur > 5:
+                        steps_per_min = max(0.0, (float(s1) - float(s0)) / dur) * 60.0
+                        if (
+                            avg_bpm >= emotional_distress_min_avg
+                            and steps_per_min <= EMOTIONAL_DISTRESS_MAX_STEPS_PER_MIN
+                            and timestamp - last_flag_times["Emotional Distress"] > EMOTIONAL_DISTRESS_COOLDOWN
+                        ):
+                            insert_flag(
+                                "Emotional Distress",
+                                f"Elevated avg BPM ({avg_bpm:.0f}) vs threshold {emotional_distress_min_avg:.0f} "
+                                f"over {EMOTIONAL_DISTRESS_WINDOW_SEC:.0f}s "
+                                f"with low activity (~{steps_per_min:.0f} steps/min).",
+                            )
+                            last_flag_times["Emotional Distress"] = timestamp
+
+        # -------------------------
+        # EXISTING FLAGS
+        # -------------------------
+        if limp and timestamp - last_flag_times["Limp"] > LIMP_COOLDOWN:
+            insert_flag("Limp", "Step asymmetry exceeds threshold.")
+            last_flag_times["Limp"] = timestamp
+
+        self._temperature_flags(timestamp, temp, insert_flag)
+        self.baseline.save_if_due(self.cursor, timestamp)
+        self.detectors.save_if_due(self.cursor, timestamp)
+
+        self.conn.commit()
+
+        print(f"BPM={bpm} | Temp={temp} | Steps={steps} | Limp={limp} | High HR = {high_hr}| Low HR = {low_hr} | Unstable HR = {snap.unstable_hr} | Rapid Change in BPM = {snap.rapid_change}")
+
+    def flush(self):
+        """On shutdown: save the HR baseline and change detector state."""
+        self.baseline.save(self.cursor)
+        self.detectors.save(self.cursor)
+        self.conn.commit()
+
+    def _cadence(self, timestamp, steps):
+        """Steps/min over the last CADENCE_WINDOW_SEC, or None without step data."""
+        if steps is None:
+            return None
+        history = self.step_history
+        if history and steps != history[-1][1]:
+            self.moved_at = timestamp
+        history.append((timestamp, steps))
+        while history[0][0] < timestamp - CADENCE_WINDOW_SEC:
+            history.popleft()
+        t0, s0 = history[0]
+        if timestamp - t0 <= 0:
+            return None
+        return max(0.0, (steps - s0) / (timestamp - t0) * 60.0)
+
+    def _change_flags(self, timestamp, bpm, temp, steps, activity, insert_flag):
+        """Shifts away from each signal's learned level (replaces the HRM's >30 BPM delta rule)."""
+        detectors = self.detectors
+        if detectors.update("cadence", self._cadence(timestamp, steps), timestamp):
+            self.cadence_changed_at = timestamp
+
+        exercise = activity not in (None, REST) or any(
+            t is not None and timestamp - t <= CADENCE_EXPLAINS_HR_SEC
+            for t in (self.cadence_changed_at, self.moved_at)
+        )
+        # The BPM detector only learns and alarms outside exercise: its baseline stays a resting one
+        change = None
+        if not exercise and bpm is not None and bpm > 0:
+            change = detectors.update("bpm", bpm, timestamp)
+        if change and timestamp - self.last_flag_times["Rapid HR Change"] > HR_COOLDOWN:
+            insert_flag(
+                "Rapid HR Change",
+                f"BPM shifted {change.direction}: {change.value:.1f} vs usual {change.baseline:.1f} "
+                f"({change.kind}).",
+            )
+            self.last_flag_times["Rapid HR Change"] = timestamp
+
+        change = detectors.update("temperature", temp, timestamp)
+        if change and timestamp - self.last_flag_times["Temperature Change"] > TEMP_CHANGE_COOLDOWN:
+            insert_flag(
+                "Temperature Change",
+                f"Temperature shifted {change.direction}: {change.value:.1f}°F vs usual "
+                f"{change.baseline:.1f}°F ({change.kind}).",
+            )
+            self.last_flag_times["Temperature Change"] = timestamp
+
+    def _log_activity(self, timestamp, activity, bpm):
+        """This second in activity_rollup: time in the activity and its BPM sums."""
+        if activity is None:
+            return
+        valid = bpm is not None and bpm > 0
+        self.cursor.execute("""
+            INSERT INTO activity_rollup (dog_id, minute, activity, seconds, n_bpm, sum_bpm)
+            VALUES (?, ?, ?, 1, ?, ?)
+            ON CONFLICT (dog_id, minute, activity) DO UPDATE SET
+                seconds = seconds + 1,
+                n_bpm = n_bpm + excluded.n_bpm,
+                sum_bpm = sum_bpm + excluded.sum_bpm
+        """, (
+            self.dog_id,
+            int(timestamp // ROLLUP_SEC) * ROLLUP_SEC,
+            activity,
+            int(valid),
+            bpm if valid else 0.0,
+        ))
+
+    def _log_rr(self, beats):
+        """One batch of (beat time, rr): raw rows plus the per-minute HRV sums."""
+        if not beats:
+            return
+        self.cursor.executemany(
+            "INSERT OR REPLACE INTO rr_intervals (dog_id, beat_ms, rr_ms) VALUES (?, ?, ?)",
+            [(self.dog_id, round(t * 1000), round(rr * 1000)) for t, rr in beats],
+        )
+        minutes = {}
+        for t, rr in beats:
+            diff = successive_diff(self.last_rr, t, rr)
+            self.last_rr = (t, rr)
+            minute = int(t // ROLLUP_SEC) * ROLLUP_SEC
+            minutes[minute] = minutes.get(minute, HRVSums()).add(rr, diff)
+        self.cursor.executemany("""
+            INSERT INTO hrv_rollup (
+                dog_id, minute, n_rr, sum_rr, sum_rr_sq, n_diff, sum_diff_sq, n_nn50
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (dog_id, minute) DO UPDATE SET
+                n_rr = n_rr + excluded.n_rr,
+                sum_rr = sum_rr + excluded.sum_rr,
+                sum_rr_sq = sum_rr_sq + excluded.sum_rr_sq,
+                n_diff = n_diff + excluded.n_diff,
+                sum_diff_sq = sum_diff_sq + excluded.sum_diff_sq,
+                n_nn50 = n_nn50 + excluded.n_nn50
+        """, [(self.dog_id, minute, *sums) for minute, sums in minutes.items()])
+
+    def _temperature_flags(self, timestamp, temp, insert_flag):
+        # Temperature flags: require sustained readings (timers reset if condition breaks or data is lost)
+        if temp is None:
+            self.high_temp_since = self.low_temp_since = self.severe_low_since = None
+            self.high_temp_episode_fired = False
+            self.low_temp_episode_fired = False
+            self.severe_low_episode_fired = False
+            return
+
+        if temp < SEVERE_LOW_TEMP_THRESHOLD:
+            if self.severe_low_since is None:
+                self.severe_low_since = timestamp
+            elif (
+                not self.severe_low_episode_fired
+                and (timestamp - self.severe_low_since) >= SEVERE_LOW_DURATION_SEC
+            ):
+                insert_flag(
+                    "Severe Low Temperature",
+                    f"Sustained temperature below {SEVERE_LOW_TEMP_THRESHOLD:.0f}°F for over "
+                    f"{SEVERE_LOW_DURATION_SEC // 60:.0f} min (current {temp:.1f}°F).",
+                )
+                self.last_flag_times["Severe Low Temperature"] = timestamp
+                self.severe_low_episode_fired = True
+        else:
+            self.severe_low_since = None
+            self.severe_low_episode_fired = False
+
+        if temp > HIGH_TEMP_THRESHOLD:
+            if self.high_temp_since is None:
+                self.high_temp_since = timestamp
+            elif (
+                not self.high_temp_episode_fired
+                and (timestamp - self.high_temp_since) >= TEMP_HIGH_LOW_DURATION_SEC
+            ):
+                insert_flag(
+                    "High Temperature",
+                    f"Sustained temperature above {HIGH_TEMP_THRESHOLD:.0f}°F for over "
+                    f"{TEMP_HIGH_LOW_DURATION_SEC // 60:.0f} min (current {temp:.1f}°F).",
+                )
+                self.last_flag_times["High Temperature"] = timestamp
+                self.high_temp_episode_fired = True
+        else:
+            self.high_temp_since = None
+            self.high_temp_episode_fired = False
+
+        if temp < LOW_TEMP_THRESHOLD:
+            if self.low_temp_since is None:
+                self.low_temp_since = timestamp
+            elif (
+                not self.low_temp_episode_fired
+                and (timestamp - self.low_temp_since) >= TEMP_HIGH_LOW_DURATION_SEC
+            ):
+                insert_flag(
+                    "Low Temperature",
+                    f"Sustained temperature below {LOW_TEMP_THRESHOLD:.0f}°F for over "
+                    f"{TEMP_HIGH_LOW_DURATION_SEC // 60:.0f} min (current {temp:.1f}°F).",
+                )
+                self.last_flag_times["Low Temperature"] = timestamp
+                self.low_temp_episode_fired = True
+        else:
+            self.low_temp_since = None
+            self.low_temp_episode_fired = False
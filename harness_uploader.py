@@ -0,0 +1,301 @@
+"""
+Store-and-forward uploader for streaming harness samples to the `/ingest` endpoint.
+
+Samples are appended to a small SQLite queue on disk first, so nothing is lost when
+Wi-Fi drops or the Pi reboots. A background thread drains the queue over one
+keep-alive requests.Session: batches grow while uploads succeed (fast catch-up after
+a gap), shrink when the server is slow or rejects the size, and failed attempts back
+off exponentially.
+"""
+import gzip
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Mapping, Any, Optional, Tuple
+
+import requests
+
+DEFAULT_QUEUE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "upload_queue.db"
+)
+
+MIN_BATCH = 1
+MAX_BATCH = 5000
+INITIAL_BATCH = 50
+# Grow the batch while a round-trip stays under this; halve it above.
+TARGET_UPLOAD_SEC = 2.0
+BACKOFF_BASE_SEC = 1.0
+BACKOFF_MAX_SEC = 60.0
+# Bodies smaller than this are not worth compressing.
+GZIP_MIN_BYTES = 1024
+IDLE_POLL_SEC = 0.5
+# Whole-request 400s (no per-row errors) in a row before the batch is halved; at one
+# sample, that sample is moved to upload_dead_letter so the rest can go.
+BODY_REJECT_LIMIT = 3
+
+
+class SampleQueue:
+    """Durable FIFO of JSON-encoded samples (one row per sample)."""
+
+    def __init__(self, path: str = DEFAULT_QUEUE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS upload_queue (id INTEGER PRIMARY KEY, body TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS upload_dead_letter ("
+            "id INTEGER PRIMARY KEY, body TEXT NOT NULL, reason TEXT, failed_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def put(self, samples: Iterable[Mapping[str, Any]]) -> int:
+        rows = [(json.dumps(dict(s)),) for s in samples]
+        if not rows:
+            return 0
+        with self._lock:
+            self._conn.executemany("INSERT INTO upload_queue (body) VALUES (?)", rows)
+            self._conn.commit()
+        return len(rows)
+
+    def peek(self, limit: int) -> Tuple[List[int], List[str]]:
+        """Oldest `limit` samples as raw JSON strings, with their queue ids."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, body FROM upload_queue ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()
+        return [r[0] for r in rows], [r[1] for r in rows]
+
+    def ack(self, last_id: int) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM upload_queue WHERE id <= ?", (last_id,))
+            self._conn.commit()
+
+    def drop(self, ids: Iterable[int]) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM upload_queue WHERE id = ?", ((i,) for i in ids))
+            self._conn.commit()
+
+    def dead_letter(self, ids: List[int], reason: str) -> None:
+        """Move samples the server will never take to upload_dead_letter (kept for inspection)."""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                """
+                INSERT OR REPLACE INTO upload_dead_letter (id, body, reason, failed_at)
+                SELECT id, body, ?, ? FROM upload_queue WHERE id = ?
+                """,
+                ((reason, now, i) for i in ids),
+            )
+            self._conn.executemany("DELETE FROM upload_queue WHERE id = ?", ((i,) for i in ids))
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM upload_queue").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class HarnessUploader:
+    def __init__(
+        self,
+        url: str,
+        queue_path: str = DEFAULT_QUEUE_PATH,
+        timeout: float = 10.0,
+        use_gzip: bool = True,
+        max_batch: int = MAX_BATCH,
+        dog_id: Optional[int] = None,
+        device_id: Optional[str] = None,
+    ):
+        self.url = url
+        self.timeout = timeout
+        self.use_gzip = use_gzip
+        self.max_batch = max_batch
+        self.batch_size = min(INITIAL_BATCH, max_batch)
+
+        self.queue = SampleQueue(queue_path)
+        self.session = requests.Session()
+        self.session.headers["Content-Type"] = "application/json"
+        # Identify this harness once per session instead of in every sample.
+        if dog_id is not None:
+            self.session.headers["X-Dog-Id"] = str(dog_id)
+        if device_id is not None:
+            self.session.headers["X-Device-Id"] = str(device_id)
+
+        self._failures = 0
+        self._body_rejects = 0
+        self._retry_at = 0.0
+        self._wake = threading.Event()
+        self.running = False
+        self.thread = None
+
+    # ------------------------
+    # Producer side
+    # ------------------------
+    def enqueue(self, samples: Iterable[Mapping[str, Any]]) -> None:
+        if self.queue.put(samples):
+            self._wake.set()
+
+    # ------------------------
+    # Upload side
+    # ------------------------
+    def _post(self, bodies: List[str]) -> requests.Response:
+        data = ("[" + ",".join(bodies) + "]").encode("utf-8")
+        headers = {}
+        if self.use_gzip and len(data) >= GZIP_MIN_BYTES:
+            data = gzip.compress(data, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+        return self.session.post(self.url, data=data, headers=headers, timeout=self.timeout)
+
+    def _backoff(self) -> None:
+        self._failures += 1
+        delay = min(BACKOFF_MAX_SEC, BACKOFF_BASE_SEC * (2 ** (self._failures - 1)))
+        # Jitter keeps several harnesses from retrying in lockstep after an outage.
+        self._retry_at = time.monotonic() + delay * random.uniform(0.5, 1.0)
+
+    def upload_once(self) -> Optional[int]:
+        """
+        Send one batch. Returns the number of samples removed from the queue (stored,
+        or rejected by the server), 0 if the queue is empty, or None if the attempt
+        failed (and a backoff was scheduled).
+        """
+        if time.monotonic() < self._retry_at:
+            return None
+        ids, bodies = self.queue.peek(self.batch_size)
+        if not bodies:
+            return 0
+
+        started = time.monotonic()
+        try:
+            resp = self._post(bodies)
+        except requests.RequestException as exc:
+            print(f"[harness_uploader] Upload failed ({len(bodies)} queued samples kept): {exc}")
+            self._backoff()
+            return None
+        elapsed = time.monotonic() - started
+
+        if resp.status_code == 413 and self.batch_size > MIN_BATCH:
+            self.batch_size = max(MIN_BATCH, self.batch_size // 2)
+            return None
+        if resp.status_code not in (400, 413) and resp.status_code >= 300:
+            # Server down, busy, or misconfigured URL: keep the samples and retry later.
+            print(f"[harness_uploader] Upload rejected (HTTP {resp.status_code}); backing off")
+            self._backoff()
+            return None
+
+        if resp.status_code >= 400:
+            return self._drop_rejected(ids, resp)
+
+        # 2xx: the server stored every valid row and any rejected ones would fail
+        # again, so the batch is done.
+        self.queue.ack(ids[-1])
+        self._failures = 0
+        self._body_rejects = 0
+
+        if elapsed > TARGET_UPLOAD_SEC:
+            self.batch_size = max(MIN_BATCH, self.batch_size // 2)
+        elif len(bodies) == self.batch_size:
+            self.batch_size = min(self.max_batch, self.batch_size * 2)
+        return len(bodies)
+
+    def _drop_rejected(self, ids: List[int], resp: requests.Response) -> Optional[int]:
+        """
+        400: nothing was stored. Drop only the samples the server named in its per-row
+        errors (the rest go again in the next batch). Without any, the whole request was
+        refused (bad body, proxy, wrong URL): keep the batch and back off, and after
+        BODY_REJECT_LIMIT such replies halve the batch, down to dead-lettering the one
+        sample at the head of the queue, so a single bad sample cannot block the rest.
+        """
+        try:
+            detail = resp.json()
+        except ValueError:
+            detail = {}
+        errors = detail.get("errors") if isinstance(detail, dict) else None
+        rejected = sorted(
+            {
+                e["index"]
+                for e in errors or ()
+                if isinstance(e, dict) and isinstance(e.get("index"), int)
+                and 0 <= e["index"] < len(ids)
+            }
+        )
+        if not rejected:
+            message = detail.get("message") if isinstance(detail, dict) else None
+            reason = f"HTTP 400: {message or resp.text[:200]}"
+            self._body_rejects += 1
+            if self._body_rejects >= BODY_REJECT_LIMIT and len(ids) == 1:
+                self.queue.dead_letter(ids, reason)
+                self._failures = self._body_rejects = 0
+                print(f"[harness_uploader] Upload rejected ({reason}); sample moved to dead letter")
+                return 1
+            if self._body_rejects >= BODY_REJECT_LIMIT:
+                # Isolate the offending sample; restart the backoff for the smaller batch
+                self.batch_size = max(MIN_BATCH, len(ids) // 2)
+                self._failures = self._body_rejects = 0
+            print(
+                f"[harness_uploader] Upload rejected ({reason}); "
+                f"{len(ids)} samples kept, backing off (next batch {self.batch_size})"
+            )
+            self._backoff()
+            return None
+        self.queue.drop(ids[i] for i in rejected)
+        self._failures = 0
+        self._body_rejects = 0
+        print(f"[harness_uploader] Dropped {len(rejected)} rejected samples: {errors[:5]}")
+        return len(rejected)
+
+    def flush(self, deadline_sec: Optional[float] = None) -> bool:
+        """Upload until the queue is empty (True) or an attempt fails / time runs out."""
+        end = None if deadline_sec is None else time.monotonic() + deadline_sec
+        while end is None or time.monotonic() < end:
+            sent = self.upload_once()
+            if sent is None:
+                return False
+            if sent == 0:
+                return True
+        return False
+
+    # ------------------------
+    # Start / Stop
+    # ------------------------
+    def start(self) -> None:
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self, drain_sec: float = 5.0) -> None:
+        """Stop the worker; whatever is not uploaded within drain_sec stays on disk."""
+        self.running = False
+        self._wake.set()
+        if self.thread is not None:
+            self.thread.join(timeout=self.timeout + 1.0)
+            if self.thread.is_alive():
+                # Still inside an upload: draining now would race it on the same
+                # session and queue. Its samples stay on disk for the next start.
+                print("[harness_uploader] Worker still uploading; skipping the final drain")
+                return
+        if drain_sec > 0:
+            self.flush(deadline_sec=drain_sec)
+        self.session.close()
+        self.queue.close()
+
+    def _run(self) -> None:
+        while self.running:
+            sent = self.upload_once()
+            if sent:
+                continue  # more may be waiting: keep the link busy
+            if sent is None:
+                wait = max(IDLE_POLL_SEC, self._retry_at - time.monotonic())
+            else:
+                wait = IDLE_POLL_SEC
+            self._wake.wait(wait)
+            self._wake.clear()
@@ -0,0 +1,110 @@
+"""
+Learned resting-HR baseline per dog and hour of day (quantile_sketch.TDigest).
+
+The logger feeds every second at rest (valid BPM, no new steps for RESTING_SEC,
+IMU activity "rest") into the digest for the current local hour. Digests live in hr_baseline, one
+row per dog per hour: new values since the last save are merged into the stored
+digest every SAVE_INTERVAL_SEC, so a year of baseline is 24 rows of a few hundred
+bytes and a threshold is one in-memory lookup.
+
+Once an hour has MIN_BASELINE_SEC of rest, its median replaces the profile
+regression (dog_profile_hr.compute_predicted_hr) as the dog's expected HR, and
+the High/Low HR limits are never tighter than its 1st / 99th percentile.
+"""
+import time
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from activity import REST
+from dog_profile_hr import HR_FLAG_HIGH_ABOVE_PRED, HR_FLAG_LOW_BELOW_PRED
+from quantile_sketch import TDigest
+
+# No new steps for this long counts as resting
+RESTING_SEC = 120
+# An hour's baseline is used once it holds this much resting time (1 value per second)
+MIN_BASELINE_SEC = 1800
+SAVE_INTERVAL_SEC = 300
+LOW_QUANTILE = 0.01
+HIGH_QUANTILE = 0.99
+
+
+class Thresholds(NamedTuple):
+    expected: float  # the dog's typical resting BPM this hour
+    low: float  # Low HR below this
+    high: float  # High HR above this
+
+
+class HRBaseline:
+    def __init__(self, dog_id):
+        self.dog_id = dog_id
+        self.digests = {}  # hour -> everything known (stored + new)
+        self._pending = {}  # hour -> values since the last save
+        self._saved_at = None
+        self._steps = None
+        self._steps_changed_at = None
+
+    def load(self, cursor):
+        cursor.execute("SELECT hour, digest FROM hr_baseline WHERE dog_id = ?", (self.dog_id,))
+        self.digests = {hour: TDigest.from_bytes(blob) for hour, blob in cursor.fetchall()}
+
+    def observe(self, timestamp, bpm, steps, sqi, activity=None):
+        """One logged second; kept if the dog is at rest and the reading is valid."""
+        if steps != self._steps:
+            self._steps = steps
+            self._steps_changed_at = timestamp
+        if (
+            bpm is None
+            or bpm <= 0
+            or sqi is None
+            or steps is None
+            or activity not in (None, REST)
+            or timestamp - self._steps_changed_at < RESTING_SEC
+        ):
+            return
+        hour = datetime.fromtimestamp(timestamp).hour
+        for digests in (self.digests, self._pending):
+            digest = digests.get(hour)
+            if digest is None:
+                digest = digests[hour] = TDigest()
+            digest.add(bpm)
+
+    def thresholds(self, timestamp) -> Optional[Thresholds]:
+        """Limits from this hour's resting baseline; None until it has enough data."""
+        digest = self.digests.get(datetime.fromtimestamp(timestamp).hour)
+        if digest is None or digest.count < MIN_BASELINE_SEC:
+            return None
+        expected = digest.quantile(0.5)
+        return Thresholds(
+            round(expected, 1),
+            min(expected - HR_FLAG_LOW_BELOW_PRED, digest.quantile(LOW_QUANTILE)),
+            max(expected + HR_FLAG_HIGH_ABOVE_PRED, digest.quantile(HIGH_QUANTILE)),
+        )
+
+    def save_if_due(self, cursor, timestamp):
+        if self._saved_at is None:
+            self._saved_at = timestamp
+        elif timestamp - self._saved_at >= SAVE_INTERVAL_SEC:
+            self.save(cursor, timestamp)
+
+    def save(self, cursor, timestamp=None):
+        """Merge pending values into the stored digests (in the caller's transaction)."""
+        timestamp = time.time() if timestamp is None else timestamp
+        self._saved_at = timestamp
+        for hour, pending in self._pending.items():
+            # Read-merge-write: another logger for this dog may have saved meanwhile
+            cursor.execute(
+                "SELECT digest FROM hr_baseline WHERE dog_id = ? AND hour = ?",
+                (self.dog_id, hour),
+            )
+            row = cursor.fetchone()
+            digest = TDigest.from_bytes(row[0]) if row else TDigest()
+            digest.merge(pending)
+            cursor.execute(
+                """
+                INSERT OR REPLACE INTO hr_baseline (dog_id, hour, digest, updated_at)
+                VALUES (?, ?, ?, ?)
+                """,
+                (self.dog_id, hour, digest.to_bytes(), timestamp),
+            )
+            self.digests[hour] = digest
+        self._pending = {}
@@ -0,0 +1,137 @@
+"""
+Heart-rate variability from accepted RR intervals, with O(1) work per beat.
+
+RMSSD, SDNN and pNN50 only need a handful of running sums (HRVSums): count, sum
+and sum of squares of the RR intervals, plus count, sum of squares and NN50 count
+of the successive differences. Sums of disjoint stretches of beats add up, so:
+
+- RollingHRV keeps them over the last window_sec of beats, adding each beat as it
+  arrives and subtracting it again when it leaves the window
+- the hrv_rollup table stores one HRVSums row per dog per minute, and any longer
+  window is the SUM() of its minutes - raw beats are never re-read
+
+A successive difference only counts when two RR intervals share a beat (no
+rejected beat or lost contact between them).
+"""
+import math
+from collections import deque
+from typing import NamedTuple, Optional
+
+HRV_WINDOW_SEC = 300  # the usual short-term HRV window
+ROLLUP_SEC = 60  # hrv_rollup bucket: one row per dog per minute
+NN50_SEC = 0.05
+# Fewer successive differences than this: HRV is reported as None
+MIN_HRV_DIFFS = 10
+# Beat times come from the sample clock; "shares a beat" allows for float rounding
+SUCCESSIVE_TOLERANCE_SEC = 1e-3
+
+
+class HRV(NamedTuple):
+    rmssd: Optional[float]  # ms
+    sdnn: Optional[float]  # ms
+    pnn50: Optional[float]  # 0-1
+
+
+NO_HRV = HRV(None, None, None)
+
+
+class HRVSums(NamedTuple):
+    n_rr: int = 0
+    sum_rr: float = 0.0
+    sum_rr_sq: float = 0.0
+    n_diff: int = 0
+    sum_diff_sq: float = 0.0
+    n_nn50: int = 0
+
+    def add(self, rr, diff=None):
+        """These sums plus one RR interval (seconds) and its successive difference."""
+        if diff is None:
+            return self._replace(
+                n_rr=self.n_rr + 1, sum_rr=self.sum_rr + rr, sum_rr_sq=self.sum_rr_sq + rr * rr
+            )
+        return HRVSums(
+            self.n_rr + 1,
+            self.sum_rr + rr,
+            self.sum_rr_sq + rr * rr,
+            self.n_diff + 1,
+            self.sum_diff_sq + diff * diff,
+            self.n_nn50 + (abs(diff) > NN50_SEC),
+        )
+
+    def combine(self, other):
+        """Sums over both sets of beats."""
+        return HRVSums(*(a + b for a, b in zip(self, other)))
+
+    def metrics(self, min_diffs=MIN_HRV_DIFFS) -> HRV:
+        return hrv_from_sums(*self, min_diffs=min_diffs)
+
+
+def hrv_from_sums(n_rr, sum_rr, sum_rr_sq, n_diff, sum_diff_sq, n_nn50, min_diffs=MIN_HRV_DIFFS) -> HRV:
+    """HRV from (possibly SQL-summed) HRVSums fields."""
+    if not n_diff or n_diff < min_diffs:
+        return NO_HRV
+    mean = sum_rr / n_rr
+    # Running sums can leave a tiny negative where the exact value is 0
+    variance = max(0.0, sum_rr_sq / n_rr - mean * mean)
+    return HRV(
+        1000.0 * math.sqrt(max(0.0, sum_diff_sq) / n_diff),
+        1000.0 * math.sqrt(variance),
+        n_nn50 / n_diff,
+    )
+
+
+def successive_diff(previous, beat_time, rr):
+    """
+    previous: (beat time, rr) of the last accepted interval, or None. Returns
+    rr - previous rr when both intervals share a beat, else None.
+    """
+    if previous is None:
+        return None
+    prev_time, prev_rr = previous
+    if abs((beat_time - rr) - prev_time) > SUCCESSIVE_TOLERANCE_SEC:
+        return None
+    return rr - prev_rr
+
+
+class RollingHRV:
+    """HRVSums over the beats of the last window_sec, updated per beat."""
+
+    def __init__(self, window_sec=HRV_WINDOW_SEC):
+        self.window_sec = window_sec
+        self.reset()
+
+    def reset(self):
+        self._beats = deque()  # (beat time, rr, diff or None)
+        self._sums = HRVSums()
+        self._previous = None
+
+    def add(self, beat_time, rr) -> HRV:
+        """Add one accepted RR interval ending at beat_time; returns the window's HRV."""
+        diff = successive_diff(self._previous, beat_time, rr)
+        self._previous = (beat_time, rr)
+        self._beats.append((beat_time, rr, diff))
+        self._sums = self._sums.add(rr, diff)
+
+        horizon = beat_time - self.window_sec
+        while self._beats[0][0] < horizon:
+            self._drop(*self._beats.popleft())
+        return self.metrics()
+
+    def _drop(self, _time, rr, diff):
+        s = self._sums
+        if diff is None:
+            self._sums = s._replace(
+                n_rr=s.n_rr - 1, sum_rr=s.sum_rr - rr, sum_rr_sq=s.sum_rr_sq - rr * rr
+            )
+        else:
+            self._sums = HRVSums(
+                s.n_rr - 1,
+                s.sum_rr - rr,
+                s.sum_rr_sq - rr * rr,
+                s.n_diff - 1,
+                s.sum_diff_sq - diff * diff,
+                s.n_nn50 - (abs(diff) > NN50_SEC),
+            )
+
+    def metrics(self) -> HRV:
+        return self._sums.metrics()
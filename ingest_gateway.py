@@ -0,0 +1,262 @@
+"""
+Asyncio ingestion gateway for many harnesses sharing one dog_harness.db.
+
+Speaks the same `/ingest` contract as app.py (JSON / NDJSON / msgpack, optional gzip,
+X-Dog-Id / X-Device-Id headers), but is built for dozens of devices posting at once:
+
+- request handlers decode + validate on a small CPU thread pool (off the event
+  loop, apart from the DB thread), then hand rows to a bounded queue
+- a single writer task coalesces queued batches from all devices into one
+  executemany + commit, run on a dedicated DB thread (SQLite is single-writer);
+  if that transaction fails it is rolled back and each request is written on its
+  own, so only the request with the bad rows gets the error
+- when the queue is full, handlers wait briefly and then answer 503 + Retry-After,
+  which harness_uploader treats as "back off and keep the samples"
+
+A request is answered only after its rows are committed, so a 201 is a durable ack.
+
+Run: python ingest_gateway.py --port 5001   (requires aiohttp)
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+try:
+    from aiohttp import web
+except ImportError:  # aiohttp is only needed on the machine running the gateway
+    web = None
+
+from dognosis_db import connect
+from dognosis_ingest import (
+    INGEST_MAX_REPORTED_ERRORS,
+    INGEST_MAX_ROWS,
+    IngestError,
+    decode_payload,
+    identity_defaults,
+    insert_rows,
+    validate_batch,
+)
+
+# Rows waiting for the writer across all devices (50 harnesses @ 1 Hz is ~50 rows/s).
+QUEUE_MAX_ROWS = 100000
+# How long a request may wait for queue space before it is told to retry.
+BACKPRESSURE_WAIT_SEC = 2.0
+RETRY_AFTER_SEC = 5
+# Writer coalescing: commit when this many rows are pending or this much time passed.
+COALESCE_MAX_ROWS = 5000
+COALESCE_WINDOW_SEC = 0.05
+# Threads decoding + validating request bodies (kept off the event loop and DB thread)
+DECODE_WORKERS = 4
+
+
+class _RowQueue:
+    """asyncio queue bounded by row count rather than by number of requests."""
+
+    def __init__(self, max_rows: int):
+        self.max_rows = max_rows
+        self.pending_rows = 0
+        self._items: "asyncio.Queue[Tuple[List[tuple], asyncio.Future]]" = asyncio.Queue()
+        self._space = asyncio.Condition()
+
+    async def put(self, rows: List[tuple], timeout: float) -> asyncio.Future:
+        async with self._space:
+            await asyncio.wait_for(
+                self._space.wait_for(
+                    lambda: self.pending_rows == 0
+                    or self.pending_rows + len(rows) <= self.max_rows
+                ),
+                timeout,
+            )
+            self.pending_rows += len(rows)
+        done = asyncio.get_running_loop().create_future()
+        self._items.put_nowait((rows, done))
+        return done
+
+    async def get(self) -> Tuple[List[tuple], asyncio.Future]:
+        return await self._items.get()
+
+    def get_nowait(self) -> Tuple[List[tuple], asyncio.Future]:
+        return self._items.get_nowait()
+
+    async def release(self, n_rows: int) -> None:
+        async with self._space:
+            self.pending_rows -= n_rows
+            self._space.notify_all()
+
+
+class IngestGateway:
+    def __init__(self, max_rows: int = QUEUE_MAX_ROWS):
+        self.max_rows = max_rows
+        self.queue: Optional[_RowQueue] = None
+        self._db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-db")
+        self._cpu_executor = ThreadPoolExecutor(
+            max_workers=DECODE_WORKERS, thread_name_prefix="ingest-decode"
+        )
+        self._conn = None
+        self._writer_task = None
+        self.rows_written = 0
+
+    # ------------------------
+    # Writer
+    # ------------------------
+    def _write(self, rows: List[tuple]) -> int:
+        # Runs on the single DB thread, which owns the connection.
+        if self._conn is None:
+            self._conn = connect()
+        return insert_rows(self._conn, rows)
+
+    async def _writer(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            n_rows = len(batch[0][0])
+            deadline = loop.time() + COALESCE_WINDOW_SEC
+            while n_rows < COALESCE_MAX_ROWS:
+                try:
+                    item = self.queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    await asyncio.sleep(min(remaining, 0.01))
+                    continue
+                batch.append(item)
+                n_rows += len(item[0])
+
+            rows = [row for item_rows, _ in batch for row in item_rows]
+            try:
+                await loop.run_in_executor(self._db_executor, self._write, rows)
+            except Exception as exc:  # noqa: BLE001 - retried per request below
+                if len(batch) == 1:
+                    self._resolve(batch[0], exc=exc)
+                else:
+                    # One request's rows can fail the whole coalesced transaction:
+                    # write each request on its own so only that one sees the error.
+                    for item in batch:
+                        try:
+                            await loop.run_in_executor(self._db_executor, self._write, item[0])
+                        except Exception as item_exc:  # noqa: BLE001 - reported to its waiter
+                            self._resolve(item, exc=item_exc)
+                        else:
+                            self._resolve(item)
+            else:
+                for item in batch:
+                    self._resolve(item)
+            finally:
+                await self.queue.release(n_rows)
+
+    def _resolve(self, item: Tuple[List[tuple], asyncio.Future], exc=None) -> None:
+        item_rows, done = item
+        if exc is None:
+            self.rows_written += len(item_rows)
+        if done.done():
+            return
+        if exc is None:
+            done.set_result(len(item_rows))
+        else:
+            done.set_exception(exc)
+
+    async def start(self, app=None) -> None:
+        self.queue = _RowQueue(self.max_rows)
+        self._writer_task = asyncio.create_task(self._writer())
+
+    async def stop(self, app=None) -> None:
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+        loop = asyncio.get_running_loop()
+        if self._conn is not None:
+            await loop.run_in_executor(self._db_executor, self._conn.close)
+        self._db_executor.shutdown(wait=True)
+        self._cpu_executor.shutdown(wait=True)
+
+    # ------------------------
+    # HTTP handlers
+    # ------------------------
+    async def handle_ingest(self, request):
+        loop = asyncio.get_running_loop()
+        try:
+            defaults = identity_defaults(request.headers, request.query)
+            body = await request.read()
+            samples = await loop.run_in_executor(
+                self._cpu_executor,
+                decode_payload,
+                body,
+                request.content_type,
+                request.headers.get("Content-Encoding", ""),
+            )
+        except IngestError as exc:
+            return web.json_response({"status": "error", "message": str(exc)}, status=exc.status)
+
+        if not samples:
+            return web.json_response(
+                {"status": "error", "message": "No samples provided"}, status=400
+            )
+        if len(samples) > INGEST_MAX_ROWS:
+            return web.json_response(
+                {"status": "error", "message": f"Batch exceeds {INGEST_MAX_ROWS} samples"},
+                status=413,
+            )
+
+        rows, _, errors = await loop.run_in_executor(
+            self._cpu_executor, validate_batch, samples, defaults
+        )
+
+        inserted = 0
+        if rows:
+            try:
+                done = await self.queue.put(rows, BACKPRESSURE_WAIT_SEC)
+            except asyncio.TimeoutError:
+                return web.json_response(
+                    {"status": "error", "message": "Gateway busy, retry later"},
+                    status=503,
+                    headers={"Retry-After": str(RETRY_AFTER_SEC)},
+                )
+            inserted = await done
+
+        body = {
+            "status": "ok" if not errors else ("partial" if inserted else "error"),
+            "inserted": inserted,
+            "rejected": len(samples) - inserted,
+            "errors": errors[:INGEST_MAX_REPORTED_ERRORS],
+        }
+        return web.json_response(body, status=201 if inserted else 400)
+
+    async def handle_health(self, request):
+        return web.json_response(
+            {
+                "status": "ok",
+                "pending_rows": self.queue.pending_rows if self.queue else 0,
+                "rows_written": self.rows_written,
+                "time": time.time(),
+            }
+        )
+
+
+def create_app(gateway: Optional[IngestGateway] = None):
+    if web is None:
+        raise RuntimeError("aiohttp is required for the ingest gateway (pip install aiohttp)")
+    gateway = gateway or IngestGateway()
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_post("/ingest", gateway.handle_ingest)
+    app.router.add_get("/health", gateway.handle_health)
+    app.on_startup.append(gateway.start)
+    app.on_cleanup.append(gateway.stop)
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Multi-harness ingest gateway for Dognosis.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5001)
+    args = parser.parse_args()
+    web.run_app(create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
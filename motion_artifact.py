@@ -0,0 +1,89 @@
+"""
+Motion-artifact cancellation for the PPG, using the harness IMUs as noise reference.
+
+On a walking dog the IR channel picks up the gait (sensor shifting on the skin,
+blood sloshing) at 1-3 Hz - right in the heart-rate band, so band-pass filtering
+cannot remove it. The accelerometers see the same motion, but not the pulse, so an
+adaptive filter that predicts the IR from recent accelerometer samples predicts
+only the artifact; subtracting that prediction leaves the pulse.
+
+Block RLS: samples are collected in blocks of BLOCK_SEC. Per block, one matrix of
+tapped reference samples (block x channels*taps) gives the artifact estimate with
+one matrix-vector product, then the exponentially weighted correlation matrices
+absorb the block and the weights are re-solved (one small linear solve per block).
+NLMS was tried first but the six accelerometer channels move together, and with
+that eigenvalue spread it stalled at ~3x the least-squares residual; RLS does not
+care. Both inputs are high-passed first (gravity and the IR DC level are not motion).
+
+The cleaned block is the raw IR minus the artifact estimate, so levels downstream
+(contact and perfusion checks) are unchanged. It is BLOCK_SEC late, which the
+sample clock absorbs (beat times stay exact).
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import butter, lfilter, lfilter_zi
+
+BLOCK_SEC = 0.25  # below the beat detector's refractory period: <= 1 beat per block
+TAPS = 8  # reference history per channel (80 ms at 100 Hz)
+MEMORY_SEC = 10.0  # forgetting time constant of the RLS correlations
+RIDGE = 1e-3  # regularisation, relative to the mean reference power
+HIGHPASS_HZ = 0.5
+
+
+class MotionArtifactCanceller:
+    def __init__(self, fs, channels, block_sec=BLOCK_SEC, taps=TAPS, memory_sec=MEMORY_SEC):
+        self.fs = fs
+        self.channels = channels
+        self.block = int(block_sec * fs)
+        self.taps = taps
+        self.forget = np.exp(-self.block / (memory_sec * fs))  # per block
+        self.b, self.a = butter(1, HIGHPASS_HZ / (fs / 2), btype="high")
+        self._zi_unit = lfilter_zi(self.b, self.a)
+        # Learned coupling from motion to IR; kept across contact resets
+        n = channels * taps
+        self.weights = np.zeros(n)
+        self._xx = np.zeros((n, n))
+        self._xd = np.zeros(n)
+        self.reset()
+
+    def reset(self):
+        """Drop buffered samples and filter state (after lost contact)."""
+        self._ir = []
+        self._ref = []
+        self._ir_zi = None
+        self._ref_zi = None
+        self._history = np.zeros((self.taps - 1, self.channels))
+
+    def push(self, ir, reference):
+        """Buffer one IR sample and the motion reference at that moment; returns the
+        cleaned block (array of block samples) when one completes, else None."""
+        self._ir.append(ir)
+        self._ref.append(reference)
+        if len(self._ir) < self.block:
+            return None
+        ir = np.asarray(self._ir, dtype=np.float64)
+        ref = np.asarray(self._ref, dtype=np.float64)
+        self._ir = []
+        self._ref = []
+        return ir - self._cancel(ir, ref)
+
+    def _cancel(self, ir, ref):
+        if self._ir_zi is None:
+            # Start in steady state: no step from the IR DC level or from gravity
+            self._ir_zi = self._zi_unit * ir[0]
+            self._ref_zi = np.outer(self._zi_unit, ref[0])
+        d, self._ir_zi = lfilter(self.b, self.a, ir, zi=self._ir_zi)
+        ref, self._ref_zi = lfilter(self.b, self.a, ref, axis=0, zi=self._ref_zi)
+
+        # Row n holds the last `taps` reference samples of every channel at sample n
+        stacked = np.vstack((self._history, ref))
+        self._history = stacked[len(stacked) - (self.taps - 1):]
+        x = sliding_window_view(stacked, self.taps, axis=0).reshape(len(ref), -1)
+
+        # A-priori estimate (weights from earlier blocks), then learn from this block
+        artifact = x @ self.weights
+        self._xx = self.forget * self._xx + x.T @ x
+        self._xd = self.forget * self._xd + x.T @ d
+        ridge = RIDGE * np.trace(self._xx) / len(self._xd) + 1e-12
+        self.weights = np.linalg.solve(self._xx + ridge * np.eye(len(self._xd)), self._xd)
+        return artifact
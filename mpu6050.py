@@ -9,9 +9,13 @@ https://github.com/m-rtijn/mpu6050
 """
 
 import smbus
+import struct
 import time
 import math
 import threading
+from collections import deque
+
+import numpy as np
 
 class mpu6050:
 
@@ -64,6 +68,9 @@ class mpu6050:
     GYRO_YOUT0 = 0x45
     GYRO_ZOUT0 = 0x47
 
+    # ACCEL_XOUT_H .. GYRO_ZOUT_L in one burst: accel x/y/z, temp, gyro x/y/z
+    MOTION_BURST = struct.Struct('>7h')
+
     ACCEL_CONFIG = 0x1C
     GYRO_CONFIG = 0x1B
     MPU_CONFIG = 0x1A
@@ -74,6 +81,8 @@ class mpu6050:
     SAMPLE_RATE = 50
     MIN_STEP_INTERVAL = 0.5
     CALIBRATION_TIME = 3
+    STEP_HISTORY = 1000  # step_times / step_lengths kept for inspection
+    MOTION_HISTORY = 128  # readings kept for accel_window (activity.WINDOW_SAMPLES)
 
     # --- Dog scaling parameters ---
     DEFAULT_STRIDE_FACTOR = 0.45  # stride ≈ 45% of body length
@@ -89,8 +98,15 @@ class mpu6050:
         self.stride_factor = self.DEFAULT_STRIDE_FACTOR
 
         self.steps = 0
-        self.step_times = []
-        self.step_lengths = []
+        # Recent history only; the average uses the running sum/count below so
+        # memory stays flat on multi-day runs.
+        self.step_times = deque(maxlen=self.STEP_HISTORY)
+        self.step_lengths = deque(maxlen=self.STEP_HISTORY)
+        self.step_length_sum = 0.0
+        self.step_length_count = 0
+
+        # Called as listener(imu, timestamp, step_length_or_None) after each step
+        self.step_listeners = []
 
         self.last_step_time = 0
         self.running = False
@@ -99,6 +115,20 @@ class mpu6050:
 
         # Gravity estimate for high-pass filtering
         self.gravity = {'x': 0, 'y': 0, 'z': 0}
+        # Latest raw reading (g); the PPG motion canceller samples it as its reference
+        self.last_accel = {'x': 0.0, 'y': 0.0, 'z': 0.0}
+        # Ring of recent readings for windowed features (activity.py, orientation.py),
+        # read by the logger once a second: accel x/y/z (g), gyro x/y/z (deg/s)
+        self._motion_ring = np.zeros((self.MOTION_HISTORY, 6))
+        self._motion_times = np.zeros(self.MOTION_HISTORY)
+        self._motion_count = 0
+        self._motion_lock = threading.Lock()
+        # Mean accel (g) while calibrating, i.e. gravity with the dog standing
+        self.standing_gravity = None
+
+        # Scales for read_motion (kept in step with set_accel_range / set_gyro_range)
+        self._accel_scale = self._accel_scale_for(self.read_accel_range(True))
+        self._gyro_scale = self._gyro_scale_for(self.read_gyro_range(True))
         self.alpha = 0.9  # gravity LPF constant
 
     # I2C communication methods
@@ -146,6 +176,15 @@ class mpu6050:
 
         # Write the new range to the ACCEL_CONFIG register
         self.bus.write_byte_data(self.address, self.ACCEL_CONFIG, accel_range)
+        self._accel_scale = self._accel_scale_for(accel_range)
+
+    def _accel_scale_for(self, accel_range):
+        return {
+            self.ACCEL_RANGE_2G: self.ACCEL_SCALE_MODIFIER_2G,
+            self.ACCEL_RANGE_4G: self.ACCEL_SCALE_MODIFIER_4G,
+            self.ACCEL_RANGE_8G: self.ACCEL_SCALE_MODIFIER_8G,
+            self.ACCEL_RANGE_16G: self.ACCEL_SCALE_MODIFIER_16G,
+        }.get(accel_range, self.ACCEL_SCALE_MODIFIER_2G)
 
     def read_accel_range(self, raw = False):
         """Reads the range the accelerometer is set to.
@@ -220,6 +259,15 @@ class mpu6050:
 
         # Write the new range to the ACCEL_CONFIG register
         self.bus.write_byte_data(self.address, self.GYRO_CONFIG, gyro_range)
+        self._gyro_scale = self._gyro_scale_for(gyro_range)
+
+    def _gyro_scale_for(self, gyro_range):
+        return {
+            self.GYRO_RANGE_250DEG: self.GYRO_SCALE_MODIFIER_250DEG,
+            self.GYRO_RANGE_500DEG: self.GYRO_SCALE_MODIFIER_500DEG,
+            self.GYRO_RANGE_1000DEG: self.GYRO_SCALE_MODIFIER_1000DEG,
+            self.GYRO_RANGE_2000DEG: self.GYRO_SCALE_MODIFIER_2000DEG,
+        }.get(gyro_range, self.GYRO_SCALE_MODIFIER_250DEG)
 
     def set_filter_range(self, filter_range=FILTER_BW_256):
         """Sets the low-pass bandpass filter frequency"""
@@ -282,6 +330,19 @@ class mpu6050:
 
         return {'x': x, 'y': y, 'z': z}
 
+    def read_motion(self):
+        """Accel (g) and gyro (deg/s) from one 14-byte burst read.
+
+        One I2C transaction per sample, against seven for get_accel_data alone
+        (six register reads plus the range), so adding the gyro costs nothing.
+        Returns (accel dict, (gx, gy, gz)).
+        """
+        raw = self.bus.read_i2c_block_data(self.address, self.ACCEL_XOUT0, self.MOTION_BURST.size)
+        ax, ay, az, _temp, gx, gy, gz = self.MOTION_BURST.unpack(bytes(raw))
+        a = self._accel_scale
+        g = self._gyro_scale
+        return {'x': ax / a, 'y': ay / a, 'z': az / a}, (gx / g, gy / g, gz / g)
+
     def get_all_data(self):
         """Reads and returns all the available data."""
         temp = self.get_temp()
@@ -325,15 +386,20 @@ class mpu6050:
     def calibrate(self):
         print(f"Calibrating IMU at address {hex(self.address)}...")
         samples = []
+        gravity = [0.0, 0.0, 0.0]
         start = time.time()
 
         while time.time() - start < self.CALIBRATION_TIME:
-            accel = self.get_accel_data(g=True)
+            accel, _ = self.read_motion()
             accel_lin = self.remove_gravity(accel)
             mag = self.accel_magnitude(accel_lin)
             samples.append(mag)
+            for i, axis in enumerate('xyz'):
+                gravity[i] += accel[axis]
             time.sleep(1 / self.SAMPLE_RATE)
 
+        # Posture (orientation.py) measures leg tilt from this: calibrate with the dog standing
+        self.standing_gravity = tuple(v / len(samples) for v in gravity)
         mean = sum(samples) / len(samples)
         std = (
             sum((x - mean) ** 2 for x in samples) / len(samples)
@@ -364,20 +430,28 @@ class mpu6050:
     # ------------------------
     def _run(self):
         while self.running:
-            accel = self.get_accel_data(g=True)
-            accel_lin = self.remove_gravity(accel)
-            mag = self.accel_magnitude(accel_lin)
-
-            now = time.time()
-
-            if (
-                mag > self.threshold and
-                (now - self.last_step_time) > self.MIN_STEP_INTERVAL
-            ):
-                self._register_step(now)
+            accel, gyro = self.read_motion()
+            self.process_accel(accel, time.time(), gyro)
 
             time.sleep(1 / self.SAMPLE_RATE)
 
+    def process_accel(self, accel, now, gyro=(0.0, 0.0, 0.0)):
+        """Step detection for one accelerometer sample (in g) taken at `now`; gyro (deg/s) is buffered."""
+        self.last_accel = accel
+        with self._motion_lock:
+            i = self._motion_count % self.MOTION_HISTORY
+            self._motion_ring[i] = (accel['x'], accel['y'], accel['z'], *gyro)
+            self._motion_times[i] = now
+            self._motion_count += 1
+        accel_lin = self.remove_gravity(accel)
+        mag = self.accel_magnitude(accel_lin)
+
+        if (
+            mag > self.threshold and
+            (now - self.last_step_time) > self.MIN_STEP_INTERVAL
+        ):
+            self._register_step(now)
+
     # ------------------------
     # Step registration logic
     # ------------------------
@@ -401,6 +475,8 @@ class mpu6050:
             )
 
             self.step_lengths.append(step_length)
+            self.step_length_sum += step_length
+            self.step_length_count += 1
 
             print(
                 f"[{hex(self.address)}] "
@@ -409,11 +485,37 @@ class mpu6050:
             )
 
         else:
+            step_length = None
             print(f"[{hex(self.address)}] Step {self.steps}")
 
         self.step_times.append(timestamp)
         self.last_step_time = timestamp
 
+        for listener in self.step_listeners:
+            listener(self, timestamp, step_length)
+
+    def add_step_listener(self, listener):
+        self.step_listeners.append(listener)
+
+    def accel_window(self):
+        """The last MOTION_HISTORY accel readings (g) as an (n, 3) array, oldest first; None until full."""
+        with self._motion_lock:
+            if self._motion_count < self.MOTION_HISTORY:
+                return None
+            split = self._motion_count % self.MOTION_HISTORY
+            return np.concatenate((self._motion_ring[split:, :3], self._motion_ring[:split, :3]))
+
+    def samples_since(self, count):
+        """
+        Readings after the first `count` (as many as the ring still holds), oldest first:
+        (new count, times (n,), accel + gyro (n, 6)).
+        """
+        with self._motion_lock:
+            total = self._motion_count
+            n = min(total - count, self.MOTION_HISTORY)
+            idx = np.arange(total - n, total) % self.MOTION_HISTORY
+            return total, self._motion_times[idx], self._motion_ring[idx]
+
     # ------------------------
     # Public getters
     # ------------------------
@@ -423,8 +525,8 @@ class mpu6050:
         return 0
 
     def get_average_step_length(self):
-        if self.step_lengths:
-            return sum(self.step_lengths) / len(self.step_lengths)
+        if self.step_length_count:
+            return self.step_length_sum / self.step_length_count
         return 0
 
     
@@ -0,0 +1,127 @@
+"""
+Pitch / roll of each leg IMU and the dog's posture, updated once per logged second.
+
+Each MPU-6050 keeps its recent accel + gyro samples (mpu6050.samples_since). Once a
+second every OrientationFilter takes the samples read since its last update and
+runs a complementary filter over them: the gyro rate integrates smoothly but
+drifts, the accelerometer's gravity direction is noisy but drift-free, so
+
+    angle[k] = a * (angle[k-1] + rate[k] * dt[k]) + (1 - a) * accel_angle[k]
+    a = TAU_SEC / (TAU_SEC + dt)
+
+With one `a` per block (the block's median dt) this is a first-order IIR, so a
+second of samples is one lfilter call per angle instead of a Python loop.
+
+Posture comes from how far each leg has tilted from its gravity direction at
+calibration (mpu6050.calibrate, done with the dog standing): averaged over both
+legs, small tilt is standing, moderate sitting, large lying.
+"""
+import math
+from typing import NamedTuple, Optional
+
+import numpy as np
+from scipy.signal import lfilter
+
+# Complementary filter time constant: gyro trusted below this, accelerometer above
+TAU_SEC = 0.5
+# Longer gaps between samples restart the filter from the accelerometer alone
+MAX_GAP_SEC = 1.0
+
+POSTURE_LABELS = ("lying", "sitting", "standing")
+LYING, SITTING, STANDING = range(len(POSTURE_LABELS))
+# Mean leg tilt from the standing calibration (degrees); placeholders to tune with data
+SITTING_TILT_DEG = 35.0
+LYING_TILT_DEG = 65.0
+
+
+class Orientation(NamedTuple):
+    pitch: float  # degrees from the standing calibration, mean of both legs
+    roll: float
+    tilt: float  # angle between gravity now and at calibration, mean of both legs
+    posture: int  # POSTURE_LABELS index
+
+
+def accel_angles(accel):
+    """(pitch, roll) in degrees of gravity as seen by (n, 3) accelerometer samples."""
+    x, y, z = accel[:, 0], accel[:, 1], accel[:, 2]
+    roll = np.degrees(np.arctan2(y, z))
+    pitch = np.degrees(np.arctan2(-x, np.hypot(y, z)))
+    return pitch, roll
+
+
+def gravity_direction(pitch, roll):
+    """Unit gravity vector in the sensor frame for pitch / roll (degrees)."""
+    p, r = math.radians(pitch), math.radians(roll)
+    return np.array((-math.sin(p), math.cos(p) * math.sin(r), math.cos(p) * math.cos(r)))
+
+
+class OrientationFilter:
+    def __init__(self, tau=TAU_SEC):
+        self.tau = tau
+        self.pitch = None
+        self.roll = None
+        self.last_time = None
+
+    def update(self, times, accel, gyro):
+        """
+        Filter one block: times (n,), accel (n, 3) in g, gyro (n, 3) in deg/s.
+        Returns the latest (pitch, roll) in degrees, or None before any samples.
+        """
+        if not len(times):
+            return None if self.pitch is None else (self.pitch, self.roll)
+        acc_pitch, acc_roll = accel_angles(accel)
+        if self.pitch is None or times[0] - self.last_time > MAX_GAP_SEC:
+            self.pitch, self.roll = float(acc_pitch[0]), float(acc_roll[0])
+            self.last_time = times[0]
+
+        dt = np.diff(times, prepend=self.last_time)
+        a = self.tau / (self.tau + max(float(np.median(dt)), 1e-3))
+        angles = []
+        # roll turns about x, pitch about y
+        for state, acc, rate in ((self.pitch, acc_pitch, gyro[:, 1]), (self.roll, acc_roll, gyro[:, 0])):
+            # Keep the accelerometer angle within 180 degrees of the filter (no wrap jumps)
+            acc = np.unwrap(np.concatenate(([state], acc)), period=360.0)[1:]
+            drive = a * rate * dt + (1 - a) * acc
+            angles.append(float(lfilter([1.0], [1.0, -a], drive, zi=[a * state])[0][-1]))
+        self.pitch, self.roll = angles
+        self.last_time = times[-1]
+        return self.pitch, self.roll
+
+
+def posture_from_tilt(tilt) -> int:
+    if tilt >= LYING_TILT_DEG:
+        return LYING
+    if tilt >= SITTING_TILT_DEG:
+        return SITTING
+    return STANDING
+
+
+class PostureTracker:
+    """One OrientationFilter per IMU; update() once a second from the logger."""
+
+    def __init__(self, imus):
+        self.imus = imus
+        self.filters = [OrientationFilter() for _ in imus]
+        self._seen = [0] * len(imus)
+
+    def update(self) -> Optional[Orientation]:
+        """Orientation over both legs, or None until every IMU has samples and a calibration."""
+        pitches, rolls, tilts = [], [], []
+        for i, (imu, filt) in enumerate(zip(self.imus, self.filters)):
+            self._seen[i], times, motion = imu.samples_since(self._seen[i])
+            angles = filt.update(times, motion[:, :3], motion[:, 3:])
+            reference = imu.standing_gravity
+            if angles is None or reference is None:
+                return None
+            ref_pitch, ref_roll = accel_angles(np.asarray(reference, dtype=np.float64)[None, :])
+            pitches.append(angles[0] - ref_pitch[0])
+            rolls.append((angles[1] - ref_roll[0] + 180.0) % 360.0 - 180.0)
+            cos_tilt = gravity_direction(*angles) @ gravity_direction(ref_pitch[0], ref_roll[0])
+            tilts.append(math.degrees(math.acos(min(1.0, max(-1.0, cos_tilt)))))
+        tilt = sum(tilts) / len(tilts)
+        return Orientation(
+            sum(pitches) / len(pitches),
+            sum(rolls) / len(rolls),
+            tilt,
+            posture_from_tilt(tilt),
+        )
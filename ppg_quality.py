@@ -0,0 +1,103 @@
+"""
+PPG signal quality index (SQI), one assessment per spectral hop (1 s).
+
+Scores the same IR window the spectral estimator uses (4-8 s: it fills
+progressively after contact), all in NumPy, cheapest check first so a window that
+is obviously bad never reaches the FFT:
+
+1. clipping: share of samples at the ADC rail or below the contact level
+2. perfusion index: pulsatile (AC) swing as a percentage of the DC level
+3. spectral purity: share of heart-band power under the spectral peak
+4. template correlation: how alike the detected beats in the window look
+   (each beat's waveform vs. their mean)
+
+`sqi` (0-1) is purity x template correlation x unclipped share x window fill.
+`good` means every check passed. HeartRateMonitor ignores beats and estimates
+from windows that are not good, so motion and loose contact cannot drive the HR
+flags.
+
+A provisional reading from a part-filled window carries less confidence, and its
+sqi rises as the window fills. Such a window is a single Welch segment, whose
+spectrum is noisy: broadband noise reaches the purity threshold in ~15% of 4 s
+windows. Provisional windows therefore need more alike beats instead
+(PROVISIONAL_MIN_TEMPLATE_CORR).
+"""
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+# MAX30102 samples are 18-bit; readings at the top are saturated
+ADC_MAX = (1 << 18) - 1
+CLIP_LEVEL = 0.99 * ADC_MAX
+# Below this the sensor is not touching skin (the old `ir < 5000` check)
+CONTACT_MIN = 5000
+MAX_CLIPPED_FRACTION = 0.05
+# Perfusion index (%) outside this range is no contact or motion, not pulse
+PERFUSION_RANGE = (0.05, 20.0)
+MIN_SPECTRAL_PURITY = 0.6
+MIN_TEMPLATE_CORR = 0.8
+# Windows not yet full (provisional BPM); a clean pulse is ~0.99
+PROVISIONAL_MIN_TEMPLATE_CORR = 0.9
+MIN_TEMPLATE_BEATS = 3
+# Beat waveform compared around each detected peak
+TEMPLATE_PRE_SEC = 0.2
+TEMPLATE_POST_SEC = 0.3
+
+
+class SignalQuality(NamedTuple):
+    time: float
+    sqi: float
+    good: bool
+    clipped: float
+    perfusion: float
+    purity: Optional[float] = None  # None: window rejected before the FFT
+    template_corr: Optional[float] = None  # None: too few beats / not reached
+
+
+def _template_corr(window, beat_offsets, pre, post):
+    offsets = np.asarray(beat_offsets, dtype=np.intp)
+    offsets = offsets[(offsets >= pre) & (offsets + post <= len(window))]
+    if len(offsets) < MIN_TEMPLATE_BEATS:
+        return None
+    lags = np.arange(-pre, post)
+    beats = window[offsets[:, None] + lags]
+    # Remove each beat's mean and slope: baseline wander is not a shape difference
+    ramp = lags - lags.mean()
+    beats = beats - beats.mean(axis=1, keepdims=True)
+    beats -= np.outer(beats @ ramp / (ramp @ ramp), ramp)
+    template = beats.mean(axis=0)
+    norms = np.linalg.norm(beats, axis=1) * np.linalg.norm(template)
+    if not np.all(norms > 0):
+        return 0.0
+    return float(np.mean(beats @ template / norms))
+
+
+def assess_window(window, fs, beat_offsets, spectral, time=0.0):
+    """
+    window: latest raw IR samples (oldest first); beat_offsets: indices into it of
+    beats the detector reported; spectral: SpectralBPMEstimator positioned on the
+    same window. Returns (SignalQuality, SpectralEstimate or None if not reached).
+    """
+    clipped = float(np.mean((window >= CLIP_LEVEL) | (window < CONTACT_MIN)))
+    dc = float(window.mean())
+    low, high = np.percentile(window, (5, 95))
+    perfusion = 100.0 * float(high - low) / dc if dc > 0 else 0.0
+
+    if clipped > MAX_CLIPPED_FRACTION or not (
+        PERFUSION_RANGE[0] <= perfusion <= PERFUSION_RANGE[1]
+    ):
+        return SignalQuality(time, 0.0, False, clipped, perfusion), None
+
+    estimate = spectral.estimate()
+    purity = estimate.confidence
+    fill = len(window) / spectral.size
+    corr = _template_corr(
+        window, beat_offsets, int(TEMPLATE_PRE_SEC * fs), int(TEMPLATE_POST_SEC * fs)
+    )
+    good = (
+        purity >= MIN_SPECTRAL_PURITY
+        and corr is not None
+        and corr >= (MIN_TEMPLATE_CORR if fill >= 1.0 else PROVISIONAL_MIN_TEMPLATE_CORR)
+    )
+    sqi = purity * max(corr or 0.0, 0.0) * (1.0 - clipped) * fill
+    return SignalQuality(time, round(sqi, 3), good, clipped, perfusion, purity, corr), estimate
@@ -0,0 +1,123 @@
+"""
+Merging t-digest (Dunning & Ertl): a bounded-size, mergeable quantile sketch.
+
+Values are summarised as at most ~COMPRESSION weighted centroids. The k1 scale
+function keeps centroids small near the tails and large around the median, so the
+percentiles thresholds care about (1st / 99th) stay accurate however many values
+went in. Two digests merge by pooling their centroids and compressing again, so
+a day's sketch folds into the stored one without keeping any raw values.
+
+Serialized (to_bytes) as a small header plus float32 (mean, weight) pairs: a few
+hundred bytes per digest.
+"""
+import math
+import struct
+
+import numpy as np
+
+COMPRESSION = 32
+# Raw values buffered before they are folded into the centroids
+BUFFER_SIZE = 4 * COMPRESSION
+
+_HEADER = struct.Struct("<BHff")  # format version, compression, min, max
+_FORMAT_VERSION = 1
+
+
+class TDigest:
+    def __init__(self, compression=COMPRESSION):
+        self.compression = compression
+        self._means = np.empty(0)
+        self._weights = np.empty(0)
+        self._buffer = []
+        self.min = math.inf
+        self.max = -math.inf
+
+    @property
+    def count(self):
+        return float(self._weights.sum()) + len(self._buffer)
+
+    def add(self, x):
+        self._buffer.append(x)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+        if len(self._buffer) >= BUFFER_SIZE:
+            self._compress()
+
+    def merge(self, other):
+        """Fold other's values into this digest (other is unchanged); returns self."""
+        other._compress()
+        self._compress(other._means, other._weights)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q):
+        """Estimated q-quantile (0-1), or None for an empty digest."""
+        self._compress()
+        if not len(self._means):
+            return None
+        total = self._weights.sum()
+        # Each centroid's mean sits at the middle of its weight; min and max pin the ends
+        centers = np.cumsum(self._weights) - self._weights / 2
+        return float(np.interp(
+            q * total,
+            np.concatenate(([0.0], centers, [total])),
+            np.concatenate(([self.min], self._means, [self.max])),
+        ))
+
+    def _k(self, q):
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _compress(self, extra_means=None, extra_weights=None):
+        parts_m = [self._means, np.asarray(self._buffer, dtype=np.float64)]
+        parts_w = [self._weights, np.ones(len(self._buffer))]
+        if extra_means is not None:
+            parts_m.append(extra_means)
+            parts_w.append(extra_weights)
+        self._buffer = []
+        means = np.concatenate(parts_m)
+        if len(means) <= 1:
+            self._means, self._weights = means, np.concatenate(parts_w)
+            return
+        order = np.argsort(means, kind="stable")
+        means = means[order].tolist()
+        weights = np.concatenate(parts_w)[order].tolist()
+
+        total = sum(weights)
+        out_m, out_w = [], []
+        done = 0.0  # weight of the centroids already emitted
+        cur_m, cur_w = means[0], weights[0]
+        limit = self._k(0.0) + 1
+        for m, w in zip(means[1:], weights[1:]):
+            if self._k(min(1.0, (done + cur_w + w) / total)) <= limit:
+                cur_w += w
+                cur_m += (m - cur_m) * w / cur_w
+            else:
+                out_m.append(cur_m)
+                out_w.append(cur_w)
+                done += cur_w
+                limit = self._k(done / total) + 1
+                cur_m, cur_w = m, w
+        out_m.append(cur_m)
+        out_w.append(cur_w)
+        self._means = np.asarray(out_m)
+        self._weights = np.asarray(out_w)
+
+    def to_bytes(self):
+        self._compress()
+        pairs = np.column_stack((self._means, self._weights)).astype("<f4")
+        return _HEADER.pack(_FORMAT_VERSION, self.compression, self.min, self.max) + pairs.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        version, compression, lo, hi = _HEADER.unpack_from(data)
+        if version != _FORMAT_VERSION:
+            raise ValueError(f"Unsupported t-digest format {version}")
+        digest = cls(compression)
+        pairs = np.frombuffer(data, dtype="<f4", offset=_HEADER.size).reshape(-1, 2)
+        digest._means = pairs[:, 0].astype(np.float64)
+        digest._weights = pairs[:, 1].astype(np.float64)
+        digest.min, digest.max = float(lo), float(hi)
+        return digest
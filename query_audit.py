@@ -0,0 +1,178 @@
+"""
+EXPLAIN QUERY PLAN audit for every SQL statement the app and logger run.
+
+Pulls the SQL string literals passed to .execute() / .executemany() out of the
+audited files (via ast, nothing is imported or run), plans each one against a
+database migrated to the current schema, and exits non-zero if any statement
+would scan a whole table or sort its matches. Run after touching queries or indexes:
+
+    python query_audit.py                 # fresh in-memory DBs at SCHEMA_VERSION
+    python query_audit.py --db dog_harness.db   # real DB (uses its ANALYZE stats)
+
+Fresh audits cover both sensor_data layouts (rowid table and compact storage).
+Statements written for only one of them carry a /* rowid storage */ or
+/* compact storage */ comment and are planned against that layout only.
+"""
+import argparse
+import ast
+import os
+import sqlite3
+import sys
+from typing import Iterator, List, NamedTuple, Optional
+
+from dognosis_db import enable_compact_storage, is_compact, migrate
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+AUDIT_FILES = (
+    "app.py",
+    "test_logging_sensor_data_9.py",
+    "harness_logger.py",
+    "hr_baseline.py",
+    "change_detect.py",
+    "dognosis_tail_cache.py",
+)
+
+# Tables small enough that a scan is the right plan (one row per dog).
+ALLOWED_SCAN_TABLES = {"dog_profile"}
+
+_EXECUTE_METHODS = {"execute", "executemany"}
+_PLANNED_VERBS = ("SELECT", "UPDATE", "DELETE", "INSERT", "WITH")
+
+
+class Statement(NamedTuple):
+    path: str
+    line: int
+    sql: str
+
+
+class Finding(NamedTuple):
+    statement: Statement
+    storage: str
+    plan: List[str]
+    problems: List[str]
+    skipped: Optional[str] = None
+
+STORAGE_MARKERS = {"rowid": "/* rowid storage */", "compact": "/* compact storage */"}
+
+
+def _sql_literal(node: ast.AST) -> Optional[str]:
+    """Literal SQL text; f-string holes become `*` (they only ever hold column lists)."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.JoinedStr):
+        parts = []
+        for value in node.values:
+            if isinstance(value, ast.Constant):
+                parts.append(str(value.value))
+            else:
+                parts.append("*")
+        return "".join(parts)
+    return None
+
+
+def extract_statements(path: str) -> Iterator[Statement]:
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    for node in ast.walk(tree):
+        if not (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Attribute)
+            and node.func.attr in _EXECUTE_METHODS
+            and node.args
+        ):
+            continue
+        sql = _sql_literal(node.args[0])
+        if sql is None:
+            continue
+        sql = " ".join(sql.split())
+        verb = sql
+        for marker in STORAGE_MARKERS.values():
+            verb = verb.replace(marker, "").strip()
+        if verb.upper().startswith(_PLANNED_VERBS):
+            yield Statement(os.path.relpath(path, _BASE_DIR), node.lineno, sql)
+
+
+def _problems(plan: List[str]) -> List[str]:
+    problems = []
+    for detail in plan:
+        words = detail.split()
+        if words[:1] != ["SCAN"] or detail.startswith("SCAN CONSTANT ROW"):
+            continue
+        table = words[1]
+        if table in ALLOWED_SCAN_TABLES:
+            continue
+        # "SCAN t USING COVERING INDEX" is still a full pass over the table.
+        problems.append(f"full scan: {detail}")
+    # Sorting means every matching row is read before the first one is returned.
+    problems.extend(f"sort: {d}" for d in plan if d.startswith("USE TEMP B-TREE"))
+    return problems
+
+
+def _applies_to(stmt: Statement, storage: str) -> bool:
+    other = [m for s, m in STORAGE_MARKERS.items() if s != storage]
+    return not any(marker in stmt.sql for marker in other)
+
+
+def audit_statement(conn: sqlite3.Connection, stmt: Statement, storage: str) -> Finding:
+    try:
+        rows = conn.execute(
+            "EXPLAIN QUERY PLAN " + stmt.sql, [None] * stmt.sql.count("?")
+        ).fetchall()
+    except sqlite3.Error as exc:
+        return Finding(stmt, storage, [], [], skipped=str(exc))
+    plan = [row[3] for row in rows]
+    return Finding(stmt, storage, plan, _problems(plan))
+
+
+def run_audit(conn: sqlite3.Connection, files=AUDIT_FILES) -> List[Finding]:
+    storage = "compact" if is_compact(conn) else "rowid"
+    findings = []
+    for name in files:
+        path = name if os.path.isabs(name) else os.path.join(_BASE_DIR, name)
+        for stmt in extract_statements(path):
+            if _applies_to(stmt, storage):
+                findings.append(audit_statement(conn, stmt, storage))
+    return findings
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Fail on full scans / sorts in Dognosis SQL.")
+    parser.add_argument("--db", help="audit against this database instead of a fresh one")
+    parser.add_argument("--verbose", "-v", action="store_true", help="print every plan")
+    parser.add_argument("files", nargs="*", default=list(AUDIT_FILES))
+    args = parser.parse_args()
+
+    findings = []
+    if args.db:
+        # Read-only: never migrate or otherwise touch a live database from an audit.
+        conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+        findings += run_audit(conn, args.files)
+        conn.close()
+    else:
+        for compact in (False, True):
+            conn = sqlite3.connect(":memory:")
+            migrate(conn)
+            if compact:
+                enable_compact_storage(conn)
+            findings += run_audit(conn, args.files)
+            conn.close()
+
+    failed = 0
+    for f in findings:
+        where = f"{f.statement.path}:{f.statement.line} [{f.storage}]"
+        if f.skipped:
+            print(f"SKIP {where}: {f.skipped}")
+            continue
+        if f.problems:
+            failed += 1
+        if f.problems or args.verbose:
+            print(f"{'FAIL' if f.problems else 'ok  '} {where}: {f.statement.sql[:100]}")
+            for detail in f.plan:
+                print(f"       {detail}")
+    print(f"{len(findings)} statements audited, {failed} with full scans or sorts")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
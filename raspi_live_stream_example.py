@@ -2,6 +2,8 @@
 Example Raspberry Pi client for streaming harness data to the Flask backend.
 
 This script POSTs samples to the `/ingest` endpoint defined in `app.py`.
+Samples go through `harness_uploader.HarnessUploader`, which queues them on disk
+and uploads in batches, so Wi-Fi dropouts delay data instead of losing it.
 You can either:
  1) Import `send_samples` into your own sensor script, or
  2) Run this file directly to send dummy test data.
@@ -9,38 +11,44 @@ You can either:
 
 import argparse
 import time
-from typing import Iterable, Mapping, Any
+from typing import Dict, Iterable, Mapping, Any
 
-import requests
+from harness_uploader import DEFAULT_QUEUE_PATH, HarnessUploader
 
 
 DEFAULT_BACKEND_URL = "http://127.0.0.1:5000/ingest"
 
+# One background uploader per (url, queue file), started on first use.
+_uploaders: Dict[tuple, HarnessUploader] = {}
+
+
+def get_uploader(
+    url: str = DEFAULT_BACKEND_URL,
+    queue_path: str = DEFAULT_QUEUE_PATH,
+    timeout: float = 10.0,
+) -> HarnessUploader:
+    key = (url, queue_path)
+    uploader = _uploaders.get(key)
+    if uploader is None:
+        uploader = HarnessUploader(url, queue_path=queue_path, timeout=timeout)
+        uploader.start()
+        _uploaders[key] = uploader
+    return uploader
+
 
 def send_samples(
     samples: Iterable[Mapping[str, Any]],
     url: str = DEFAULT_BACKEND_URL,
-    timeout: float = 2.0,
+    timeout: float = 10.0,
 ) -> None:
     """
-    Send one or more samples to the backend.
-
-    Each sample must be a mapping with at least:
-      - timestamp : int (unix seconds)
-      - bpm       : float
-      - arrhythmia: int (0/1)
-      - raw_ir    : int
-      - raw_red   : int
-    """
-    payload = list(samples)
-    if not payload:
-        return
+    Queue one or more samples for upload to the backend (returns immediately).
 
-    try:
-        resp = requests.post(url, json=payload, timeout=timeout)
-        resp.raise_for_status()
-    except Exception as exc:  # noqa: BLE001
-        print(f"[raspi_live_stream_example] Failed to send samples: {exc}")
+    Each sample is a mapping of sensor_data columns with at least:
+      - timestamp : float (unix seconds)
+    and typically bpm, temperature, step_count, raw_ir, raw_red, ...
+    """
+    get_uploader(url, timeout=timeout).enqueue(samples)
 
 
 def main() -> None:
@@ -88,6 +96,9 @@ def main() -> None:
             time.sleep(args.interval)
     except KeyboardInterrupt:
         print("\nStopping dummy stream.")
+    finally:
+        for uploader in _uploaders.values():
+            uploader.stop()
 
 
 if __name__ == "__main__":
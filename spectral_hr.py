@@ -0,0 +1,137 @@
+"""
+Spectral (Welch) BPM estimate from the PPG, once per hop instead of per beat.
+
+Complements beat_detector.py: rather than finding individual beats, average the
+power spectrum of a few overlapping, windowed segments of the last WINDOW_SEC of
+IR samples and take the strongest frequency in the dog heart-rate band. One short
+burst of motion or a missed beat barely moves it, and the share of band power
+under the peak doubles as a confidence score.
+
+The window fills progressively: the first (provisional) estimate comes as soon as
+one segment of samples is in (MIN_WINDOW_SEC), and each hop after that averages
+every segment that fits, up to the full window. mark_gap() after a contact
+dropout does the same from the first sample after it, instead of waiting for the
+dropout to age out of a full window.
+
+Everything that does not depend on the data is computed once: the Hann window,
+the FFT length, the in-band bins and the segment length. Each hop is a single
+batched rfft over all segments (scipy.fft caches its plans per length).
+"""
+from typing import NamedTuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.fft import next_fast_len, rfft, rfftfreq
+from scipy.signal import get_window
+
+BAND_HZ = (1.0, 4.0)  # same band as the beat detector's band-pass (60-240 bpm)
+WINDOW_SEC = 8.0  # samples each estimate covers
+SEGMENT_SEC = 4.0  # Welch segment (50% overlap -> 3 segments per window)
+MIN_WINDOW_SEC = SEGMENT_SEC  # first (provisional) estimate: a single segment
+HOP_SEC = 1.0  # one estimate per hop
+MIN_NFFT = 1024  # zero-padded FFT length (~0.1 Hz bins at 100 Hz)
+# Confidence = share of in-band power within this distance of the peak
+PEAK_HALF_WIDTH_HZ = 0.25
+
+
+class SpectralEstimate(NamedTuple):
+    time: float  # sample-clock time of the newest sample in the window
+    bpm: float
+    confidence: float  # 0..1; a clean pulse is ~0.95, broadband noise ~0.4
+    window_sec: float  # data behind the estimate; < WINDOW_SEC while still filling
+
+
+class SpectralBPMEstimator:
+    def __init__(self, fs=100, band=BAND_HZ, window_sec=WINDOW_SEC,
+                 segment_sec=SEGMENT_SEC, hop_sec=HOP_SEC, min_window_sec=MIN_WINDOW_SEC):
+        self.fs = fs
+        self.size = int(window_sec * fs)
+        self.segment = int(segment_sec * fs)
+        self.min_size = max(self.segment, int(min_window_sec * fs))
+        self.step = self.segment // 2
+        self.hop = int(hop_sec * fs)
+
+        self.taper = get_window("hann", self.segment)
+        self.nfft = next_fast_len(max(MIN_NFFT, self.segment))
+        freqs = rfftfreq(self.nfft, 1 / fs)
+        self.bin_hz = fs / self.nfft
+        self.peak_bins = max(1, int(round(PEAK_HALF_WIDTH_HZ / self.bin_hz)))
+        lo = int(np.searchsorted(freqs, band[0]))
+        hi = int(np.searchsorted(freqs, band[1], side="right"))
+        # Bins just outside the band are computed too, so a peak near a band edge
+        # still has neighbours for interpolation and the confidence window.
+        self.margin = min(lo, self.peak_bins)
+        self.bins = slice(lo - self.margin, hi + self.peak_bins)
+        self.in_band = slice(self.margin, self.margin + hi - lo)
+        self.freqs = freqs[self.bins]
+
+        # Each sample is written twice, so _samples[pos:pos + size] is always the
+        # latest window in order - no copy or np.roll per hop.
+        self._samples = np.zeros(2 * self.size)
+        self.reset()
+
+    def reset(self, start_time=0.0):
+        """Forget all samples (after lost contact); sample times restart at start_time."""
+        self.start_time = start_time
+        self.n = 0
+        self._pos = 0
+        self._valid_from = 0
+
+    def mark_gap(self):
+        """Samples pushed so far are not continuous with the next ones (contact
+        dropout): the window restarts, but sample times keep counting."""
+        self._valid_from = self.n
+
+    @property
+    def filled(self):
+        """Samples in the current window (at most `size`)."""
+        return min(self.size, self.n - self._valid_from)
+
+    def push(self, x):
+        """Store one raw sample; True when a hop completes (from MIN_WINDOW_SEC on)."""
+        self._samples[self._pos] = x
+        self._samples[self._pos + self.size] = x
+        self._pos = (self._pos + 1) % self.size
+        self.n += 1
+        since = self.n - self._valid_from
+        return since >= self.min_size and (since - self.min_size) % self.hop == 0
+
+    def update(self, x):
+        """Feed one raw sample; returns a SpectralEstimate once per hop."""
+        return self.estimate() if self.push(x) else None
+
+    def window(self):
+        """The latest `filled` samples, oldest first (a view; valid until the next push)."""
+        end = self._pos + self.size
+        return self._samples[end - self.filled:end]
+
+    def estimate(self):
+        window = self.window()
+        # Segments end on the newest sample; the oldest partial one is left out
+        window = window[(len(window) - self.segment) % self.step:]
+        segments = sliding_window_view(window, self.segment)[::self.step]
+        segments = (segments - segments.mean(axis=1, keepdims=True)) * self.taper
+        power = np.abs(rfft(segments, n=self.nfft, axis=1)[:, self.bins]) ** 2
+        power = power.mean(axis=0)
+
+        window_sec = self.filled / self.fs
+        total = power[self.in_band].sum()
+        if total <= 0:
+            return SpectralEstimate(self._time(), 0.0, 0.0, window_sec)
+        k = self.margin + int(np.argmax(power[self.in_band]))
+        peak = power[max(0, k - self.peak_bins):k + self.peak_bins + 1].sum()
+
+        # Parabolic interpolation on log power: sub-bin peak frequency
+        offset = 0.0
+        if 0 < k < len(power) - 1 and power[k - 1] > 0 and power[k + 1] > 0:
+            left, mid, right = np.log(power[k - 1:k + 2])
+            denom = left - 2 * mid + right
+            if denom < 0:
+                offset = 0.5 * (left - right) / denom
+        freq = self.freqs[k] + offset * self.bin_hz
+        return SpectralEstimate(
+            self._time(), float(60.0 * freq), float(min(1.0, peak / total)), window_sec
+        )
+
+    def _time(self):
+        return self.start_time + (self.n - 1) / self.fs
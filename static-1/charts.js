@@ -19,7 +19,9 @@ async function fetchJson(url, timeoutMs = LIVE_DATA_TIMEOUT_MS) {
     const controller = new AbortController();
     const timeoutId = window.setTimeout(() => controller.abort(), timeoutMs);
     try {
-        const response = await fetch(url, { cache: "no-store", signal: controller.signal });
+        // "no-cache" revalidates with ETag/Last-Modified: unchanged data comes back as a
+        // bodyless 304 and the browser replays its cached copy.
+        const response = await fetch(url, { cache: "no-cache", signal: controller.signal });
         if (!response.ok) throw new Error(`HTTP ${response.status} for ${url}`);
         return await response.json();
     } finally {
@@ -27,6 +29,13 @@ async function fetchJson(url, timeoutMs = LIVE_DATA_TIMEOUT_MS) {
     }
 }
 
+/** Multi-dog servers: open the dashboard as `/?dog_id=N` to scope every API call to one dog. */
+function withDogSelector(url) {
+    const dogId = new URLSearchParams(window.location.search).get("dog_id");
+    if (!dogId) return url;
+    return `${url}${url.includes("?") ? "&" : "?"}dog_id=${encodeURIComponent(dogId)}`;
+}
+
 let hrChart = null;
 let stepsChart = null;
 let tempChart = null;
@@ -36,6 +45,15 @@ let currentTimeWindowSeconds = 1800; // default 30 min
 const ACTIVITY_ROLLING_WINDOW_SEC = 90; // ~1.5 min (try 60–120)
 const ACTIVITY_LOW_STEPS_PER_MIN = 8;
 const ACTIVITY_HIGH_STEPS_PER_MIN = 35;
+// Logger's IMU activity (`activity` column, index into activity.ACTIVITY_LABELS);
+// rows without it (older rows, no IMU window yet) fall back to steps/min above
+const ACTIVITY_STATE_BADGES = [
+    ["Resting", "badge bg-warning text-dark mb-3"],
+    ["Active", "badge bg-info text-dark mb-3"],
+    ["Walking", "badge bg-success mb-3"],
+    ["Running", "badge bg-danger mb-3"],
+    ["Trotting", "badge bg-primary mb-3"],
+];
 
 // Temperature (°F) — matches logger display
 const TEMP_F_LOW_MAX = 32;
@@ -304,8 +322,11 @@ function updateActivityTempCards(latestSample, allSamples) {
     if (actEl) {
         actEl.textContent = steps != null ? String(steps) : "--";
     }
+    const activityBadge = ACTIVITY_STATE_BADGES[latestSample.activity];
     if (actStatus) {
-        if (stepsPerMin == null) {
+        if (activityBadge) {
+            [actStatus.textContent, actStatus.className] = activityBadge;
+        } else if (stepsPerMin == null) {
             actStatus.textContent = "Collecting";
             actStatus.className = "badge bg-secondary mb-3";
         } else if (stepsPerMin < ACTIVITY_LOW_STEPS_PER_MIN) {
@@ -477,6 +498,30 @@ function formatIncidentTimestamp(ts, fallbackDatetime) {
     return "--";
 }
 
+/**
+ * Incident samples arrive column-major from `/incident-context?shape=columns`:
+ * `{ timestamp: [...], bpm: [...], ... }`. Plain arrays of row objects are still accepted.
+ */
+function incidentSampleCount(samples) {
+    if (Array.isArray(samples)) return samples.length;
+    if (samples && Array.isArray(samples.timestamp)) return samples.timestamp.length;
+    return 0;
+}
+
+function incidentSampleAt(samples, i) {
+    if (Array.isArray(samples)) return samples[i];
+    const col = (name) => (Array.isArray(samples[name]) ? samples[name][i] : null);
+    return {
+        timestamp: col("timestamp"),
+        datetime: col("datetime"),
+        bpm: col("bpm"),
+        temperature: col("temperature"),
+        step_count: col("step_count"),
+        limp: col("limp"),
+        asymmetry: col("asymmetry"),
+    };
+}
+
 function renderIncidentDataRows(samples) {
     const tbody = document.getElementById("flagIncidentDataBody");
     const emptyEl = document.getElementById("flagIncidentDataEmpty");
@@ -486,7 +531,8 @@ function renderIncidentDataRows(samples) {
     loadingEl.classList.add("d-none");
     tbody.innerHTML = "";
 
-    if (!Array.isArray(samples) || samples.length === 0) {
+    const count = incidentSampleCount(samples);
+    if (count === 0) {
         emptyEl.classList.remove("d-none");
         tbody.innerHTML =
             '<tr><td colspan="6" class="text-muted">No samples in this window</td></tr>';
@@ -494,7 +540,9 @@ function renderIncidentDataRows(samples) {
     }
 
     emptyEl.classList.add("d-none");
-    samples.forEach((sample) => {
+    const fragment = document.createDocumentFragment();
+    for (let i = 0; i < count; i += 1) {
+        const sample = incidentSampleAt(samples, i);
         const tr = document.createElement("tr");
 
         const timeCell = document.createElement("td");
@@ -521,8 +569,9 @@ function renderIncidentDataRows(samples) {
         tr.appendChild(stepsCell);
         tr.appendChild(limpCell);
         tr.appendChild(asymCell);
-        tbody.appendChild(tr);
-    });
+        fragment.appendChild(tr);
+    }
+    tbody.appendChild(fragment);
 }
 
 async function loadIncidentDataForFlag(flag) {
@@ -545,11 +594,11 @@ async function loadIncidentDataForFlag(flag) {
 
     try {
         const payload = await fetchJson(
-            `/incident-context/${flag.id}?window_minutes=15`,
+            withDogSelector(`/incident-context/${flag.id}?window_minutes=15&shape=columns`),
             FLAGS_INCIDENT_FETCH_TIMEOUT_MS
         );
         if (thisRequestToken !== incidentDataRequestToken) return;
-        renderIncidentDataRows(payload.samples || []);
+        renderIncidentDataRows(payload.samples || {});
         dashboardState.incidentDataLoadedForFlagId =
             flag && flag.id != null ? Number(flag.id) : null;
     } catch (err) {
@@ -906,7 +955,7 @@ function applyFlagTypeFilterAndRender() {
 
 async function loadFlagsSummary() {
     try {
-        const data = await fetchJson("/flags-summary", FLAGS_INCIDENT_FETCH_TIMEOUT_MS);
+        const data = await fetchJson(withDogSelector("/flags-summary"), FLAGS_INCIDENT_FETCH_TIMEOUT_MS);
         if (!Array.isArray(data)) throw new Error("Unexpected flags-summary payload");
 
         // User rows are exactly is_user_generated === 1; everything else is device (null/0/missing).
@@ -975,7 +1024,7 @@ function initAddFlagModal() {
 
             if (!Number.isFinite(ts)) throw new Error("Invalid date/time");
 
-            const res = await fetch("/flags-add", {
+            const res = await fetch(withDogSelector("/flags-add"), {
                 method: "POST",
                 headers: { "Content-Type": "application/json" },
                 body: JSON.stringify({ timestamp: ts, flag_type, description }),
@@ -1050,7 +1099,7 @@ function initEditDeleteFlagModal() {
             if (!id) throw new Error("Missing flag id");
             if (!Number.isFinite(ts)) throw new Error("Invalid timestamp");
 
-            const res = await fetch("/flags-update", {
+            const res = await fetch(withDogSelector("/flags-update"), {
                 method: "POST",
                 headers: { "Content-Type": "application/json" },
                 body: JSON.stringify({ id, timestamp: ts, flag_type, description }),
@@ -1081,7 +1130,7 @@ function initEditDeleteFlagModal() {
             const ok = confirm("Delete this user-flag? This cannot be undone.");
             if (!ok) return;
 
-            const res = await fetch("/flags-delete", {
+            const res = await fetch(withDogSelector("/flags-delete"), {
                 method: "POST",
                 headers: { "Content-Type": "application/json" },
                 body: JSON.stringify({ id }),
@@ -1107,7 +1156,7 @@ async function updateChart() {
     if (updateChartInFlight) return;
     updateChartInFlight = true;
     try {
-        const data = await fetchJson("/live-data");
+        const data = await fetchJson(withDogSelector("/live-data"));
 
         if (!Array.isArray(data) || data.length === 0) {
             if (hrChart) {
@@ -1194,7 +1243,7 @@ async function updateFlags() {
     if (!listEl) return;
 
     try {
-        const data = await fetchJson("/flags");
+        const data = await fetchJson(withDogSelector("/flags"));
         if (!Array.isArray(data) || data.length === 0) {
             listEl.innerHTML =
                 '<li class="list-group-item text-muted">No flags recorded yet</li>';
@@ -1,172 +1,70 @@
 # Updated version for new bpm flags replacing arrythmia detection
+# Threaded runtime (one thread per device). Row/flag logic lives in harness_logger.py;
+# harness_async.py runs the same logic on asyncio (used by dognosis-logger.service).
 
 import time
 import sqlite3
 import threading
-from collections import deque
-from datetime import datetime
 
-from dognosis_db import DB_PATH as DB_NAME, ensure_schema
-from dog_profile_hr import (
-    HR_FLAG_HIGH_ABOVE_PRED,
-    HR_FLAG_LOW_BELOW_PRED,
-    compute_predicted_hr,
-    emotional_distress_avg_threshold,
-    row_tuple_to_hr_dict,
+from dognosis_db import DB_PATH as DB_NAME, migrate
+from harness_logger import (
+    DOG_ID,
+    DSP_PROCESS,
+    HR_METHOD,
+    LOG_INTERVAL_SEC,
+    MOTION_CANCEL,
+    TEMP_READ_INTERVAL_SEC,
+    HarnessLogger,
+    SnapshotPublisher,
 )
 from updated_heartrate_monitor_v3 import HeartRateMonitor
 from dual_IMU_step_counter_2 import DualIMUStepAnalyzer
 
-# -------------------------
-# Config / Thresholds
-# -------------------------
-
-HIGH_TEMP_THRESHOLD = 105
-LOW_TEMP_THRESHOLD = 32
-SEVERE_LOW_TEMP_THRESHOLD = 10
-ASYMMETRY_THRESHOLD = 3.0
-
-# Standard high/low flags require the threshold to hold continuously for this long
-TEMP_HIGH_LOW_DURATION_SEC = 600  # 10 minutes
-# More severe cold exposure
-SEVERE_LOW_DURATION_SEC = 300  # 5 minutes
-
-HR_COOLDOWN = 300
-LIMP_COOLDOWN = 300
-
-# Emotional Distress: elevated avg HR over a window with low step activity (placeholders — tune with data)
-EMOTIONAL_DISTRESS_WINDOW_SEC = 90
-EMOTIONAL_DISTRESS_MAX_STEPS_PER_MIN = 10
-EMOTIONAL_DISTRESS_MIN_VALID_BPM_FRACTION = 0.65
-EMOTIONAL_DISTRESS_MIN_WINDOW_SAMPLES = 45
-EMOTIONAL_DISTRESS_COOLDOWN = 600
-
-# -------------------------
-# Shared Data
-# -------------------------
-sensor_data = {
-    "bpm": None,
-    "high_hr": 0,
-    "low_hr": 0,
-    "rapid_change": 0,
-    "unstable_hr": 0,
-    "temperature": None,
-    "steps": None,
-    "latest_step_length": None,
-    "avg_step_length": None,
-    "asymmetry": None,
-    "limp": None,
-    "raw_temperature": None
-}
-
-data_lock = threading.Lock()
-
-last_flag_times = {
-    "High HR": 0,
-    "Low HR": 0,
-    "Rapid HR Change": 0,
-    "Unstable HR": 0,
-    "Emotional Distress": 0,
-    "Limp": 0,
-    "High Temperature": 0,
-    "Low Temperature": 0,
-    "Severe Low Temperature": 0,
-}
-
-emotional_distress_history = deque()
-
-# Sustained temperature conditions (reset when reading is lost or condition clears)
-high_temp_since = None
-low_temp_since = None
-severe_low_since = None
-high_temp_episode_fired = False
-low_temp_episode_fired = False
-severe_low_episode_fired = False
-
 # -------------------------
 # Sensor Manager Thread
 # -------------------------
-class SensorManager(threading.Thread):
-    def __init__(self, hrm, step_counter, update_interval=0.05):
-        super().__init__()
+class SensorManager(SnapshotPublisher, threading.Thread):
+    """
+    Heart rate and gait metrics arrive through listeners, from the sensors' own
+    threads, only when they change; this thread just reads the IMU temperature at
+    its own (slow) cadence.
+    """
+
+    def __init__(self, hrm, step_counter, temp_interval=TEMP_READ_INTERVAL_SEC):
+        threading.Thread.__init__(self)
+        SnapshotPublisher.__init__(self)
         self.hrm = hrm
         self.step_counter = step_counter
         self.running = True
-        self.update_interval = update_interval
+        self.temp_interval = temp_interval
+        self.attach(hrm, step_counter)
 
+    # --- TEMPERATURE (this thread, every temp_interval) ---
     def run(self):
         while self.running:
-            # --- HEART RATE ---
-            try:
-                bpm = self.hrm.bpm
-
-            #     # NEW FLAGS FROM HRM
-            #     high_hr = int(self.hrm.bpm > 180)
-            #     low_hr = int(self.hrm.bpm < 50 and self.hrm.bpm > 0)
-
-            #     if len(self.hrm.bpm_history) >= 2:
-            #         rapid_change = int(abs(self.hrm.bpm_history[-1] - self.hrm.bpm_history[-2]) > 30)
-            #     else:
-            #         rapid_change = 0
-
-            #     if len(self.hrm.bpm_history) >= 5:
-            #         unstable_hr = int(max(self.hrm.bpm_history) - min(self.hrm.bpm_history) > 30)
-            #     else:
-            #         unstable_hr = 0
-
-            except Exception as e:
-                print(f"HRM error: {e}")
-                bpm = None
-                high_hr = low_hr = rapid_change = unstable_hr = None
-
-            # --- TEMPERATURE ---
             try:
-                temp = self.step_counter.left.get_temp()
-                temp = temp * 9/5 + 32
-                rawTemp = temp
+                celsius = self.step_counter.left.get_temp()
             except Exception as e:
                 print(f"MPU temperature error: {e}")
-                temp = None
-                rawTemp = None
-
-            # --- IMU STEP COUNTER ---
-            try:
-                steps = self.step_counter.get_total_steps()
-                latest_len = self.step_counter.left.get_latest_step_length()
-                avg_len = self.step_counter.get_average_step_length()
-                asymmetry = self.step_counter.get_step_asymmetry()
-                limp = int(self.step_counter.detect_limp())
-            except Exception as e:
-                print(f"IMU error: {e}")
-                steps = latest_len = avg_len = asymmetry = limp = None
+                celsius = None
 
-            # --- Update shared data ---
-            with data_lock:
-                sensor_data.update({
-                    "bpm": bpm,
-                    "arrhythmia": None,  # deprecated
-                    "temperature": temp,
-                    "steps": steps,
-                    "latest_step_length": latest_len,
-                    "avg_step_length": avg_len,
-                    "asymmetry": asymmetry,
-                    "limp": limp,
-                    "raw_temperature": rawTemp,
-                    "high_hr": int(hrm.high_hr_flag),
-                    "low_hr": int(hrm.low_hr_flag),
-                    "rapid_change": int(hrm.rapid_change_flag),
-                    "unstable_hr": int(hrm.unstable_hr_flag)
-                })
-
-            time.sleep(self.update_interval)
+            self.on_temperature(celsius)
+            time.sleep(self.temp_interval)
 
 # -------------------------
 # Initialize Sensors
 # -------------------------
-hrm = HeartRateMonitor(print_raw=False, print_result=False)
 step_counter = DualIMUStepAnalyzer()
-
 step_counter.calibrate()
+
+hrm = HeartRateMonitor(print_raw=False, print_result=False, bpm_method=HR_METHOD)
+if MOTION_CANCEL:
+    hrm.set_motion_source(step_counter.motion_reference)
+if DSP_PROCESS:
+    from dsp_worker import HeartRateWorker
+    # Forks the DSP worker, so it has to happen before any sensor thread starts
+    hrm = HeartRateWorker(hrm).start()
+
 step_counter.start()
 hrm.start_sensor()
 
@@ -177,216 +75,15 @@ sensor_manager.start()
 # Database Connection
 # -------------------------
 conn = sqlite3.connect(DB_NAME, check_same_thread=False)
-cursor = conn.cursor()
-ensure_schema(conn)
+migrate(conn)
+harness_logger = HarnessLogger(conn, DOG_ID)
 
 print("Logging data to SQLite...")
 
 try:
     while True:
-        timestamp = time.time()
-        dt = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        with data_lock:
-            bpm = sensor_data["bpm"]
-            high_hr = sensor_data["high_hr"]
-            low_hr = sensor_data["low_hr"]
-            rapid_change = sensor_data["rapid_change"]
-            unstable_hr = sensor_data["unstable_hr"]
-            temp = sensor_data["temperature"]
-            steps = sensor_data["steps"]
-            latest_len = sensor_data["latest_step_length"]
-            avg_len = sensor_data["avg_step_length"]
-            asymmetry = sensor_data["asymmetry"]
-            limp = sensor_data["limp"]
-            rawTemp = sensor_data["raw_temperature"]
-
-        cursor.execute(
-            "SELECT weight, date_of_birth, breed_code FROM dog_profile WHERE id = 1"
-        )
-        prof_row = cursor.fetchone()
-        prof_cols = [d[0] for d in cursor.description] if cursor.description else []
-        if prof_row:
-            pred_hr = compute_predicted_hr(row_tuple_to_hr_dict(prof_row, prof_cols))
-        else:
-            pred_hr = None
-
-        if pred_hr is not None and bpm is not None and bpm > 0:
-            high_hr = int(bpm > pred_hr + HR_FLAG_HIGH_ABOVE_PRED)
-            low_hr = int(bpm < pred_hr - HR_FLAG_LOW_BELOW_PRED)
-
-        emotional_distress_min_avg = emotional_distress_avg_threshold(pred_hr)
-        emotional_distress_history.append((timestamp, bpm, steps))
-        while (
-            emotional_distress_history
-            and emotional_distress_history[0][0] < timestamp - EMOTIONAL_DISTRESS_WINDOW_SEC
-        ):
-            emotional_distress_history.popleft()
-
-        rawIR = None
-        rawRed = None
-
-        # -------------------------
-        # Insert sensor data
-        # -------------------------
-        # -------------------------
-        cursor.execute("""
-            INSERT INTO sensor_data (
-                timestamp, datetime, bpm, temperature,
-                step_count, latest_step_length, avg_step_length,
-                asymmetry, limp, raw_temperature,
-                high_hr, low_hr, rapid_change, unstable_hr,
-                arrhythmia
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            timestamp,
-            dt,
-            bpm,
-            temp,
-            steps,
-            latest_len,
-            avg_len,
-            asymmetry,
-            limp,
-            rawTemp,
-            int(hrm.high_hr_flag),      # 1 if high HR, else 0
-            int(hrm.low_hr_flag),       # 1 if low HR, else 0
-            int(hrm.rapid_change_flag), # 1 if rapid BPM change, else 0
-            int(hrm.unstable_hr_flag),  # 1 if unstable HR, else 0
-            None                        # arrhythmia intentionally left blank
-        ))
-
-        # -------------------------
-        # Flag helper
-        # -------------------------
-        def insert_flag(flag_type, description):
-            cursor.execute("""
-                INSERT INTO flags (timestamp, datetime, flag_type, description, is_user_generated)
-                VALUES (?, ?, ?, ?, 0)
-            """, (timestamp, dt, flag_type, description))
-
-        # -------------------------
-        # HR FLAGS (NEW)
-        # -------------------------
-        if high_hr and timestamp - last_flag_times["High HR"] > HR_COOLDOWN:
-            if pred_hr is not None and bpm is not None:
-                insert_flag("High HR", f"BPM elevated: {bpm:.1f} (pred {pred_hr:.1f})")
-            else:
-                insert_flag("High HR", f"BPM elevated: {bpm:.1f}")
-            last_flag_times["High HR"] = timestamp
-
-        if low_hr and timestamp - last_flag_times["Low HR"] > HR_COOLDOWN:
-            if pred_hr is not None and bpm is not None:
-                insert_flag("Low HR", f"BPM low: {bpm:.1f} (pred {pred_hr:.1f})")
-            else:
-                insert_flag("Low HR", f"BPM low: {bpm:.1f}")
-            last_flag_times["Low HR"] = timestamp
-
-        if rapid_change and timestamp - last_flag_times["Rapid HR Change"] > HR_COOLDOWN:
-            insert_flag("Rapid HR Change", "Sudden BPM spike/drop detected.")
-            last_flag_times["Rapid HR Change"] = timestamp
-
-        if unstable_hr and timestamp - last_flag_times["Unstable HR"] > HR_COOLDOWN:
-            insert_flag("Unstable HR", "Heart rate unstable over time.")
-            last_flag_times["Unstable HR"] = timestamp
-
-        # Emotional Distress: sustained elevated HR with low movement (does not replace Rapid HR Change)
-        if len(emotional_distress_history) >= EMOTIONAL_DISTRESS_MIN_WINDOW_SAMPLES:
-            pts = list(emotional_distress_history)
-            bpms = [p[1] for p in pts if p[1] is not None and p[1] > 0]
-            if len(bpms) >= len(pts) * EMOTIONAL_DISTRESS_MIN_VALID_BPM_FRACTION:
-                avg_bpm = sum(bpms) / len(bpms)
-                step_pts = [(p[0], p[2]) for p in pts if p[2] is not None]
-                if len(step_pts) >= 2:
-                    t0, s0 = step_pts[0]
-                    t1, s1 = step_pts[-1]
-                    dur = t1 - t0
-                    if dur > 5:
-                        steps_per_min = max(0.0, (float(s1) - float(s0)) / dur) * 60.0
-                        if (
-                            avg_bpm >= emotional_distress_min_avg
-                            and steps_per_min <= EMOTIONAL_DISTRESS_MAX_STEPS_PER_MIN
-                            and timestamp - last_flag_times["Emotional Distress"] > EMOTIONAL_DISTRESS_COOLDOWN
-                        ):
-                            insert_flag(
-                                "Emotional Distress",
-                                f"Elevated avg BPM ({avg_bpm:.0f}) vs threshold {emotional_distress_min_avg:.0f} "
-                                f"over {EMOTIONAL_DISTRESS_WINDOW_SEC:.0f}s "
-                                f"with low activity (~{steps_per_min:.0f} steps/min).",
-                            )
-                            last_flag_times["Emotional Distress"] = timestamp
-
-        # -------------------------
-        # EXISTING FLAGS
-        # -------------------------
-        if limp and timestamp - last_flag_times["Limp"] > LIMP_COOLDOWN:
-            insert_flag("Limp", "Step asymmetry exceeds threshold.")
-            last_flag_times["Limp"] = timestamp
-
-        # Temperature flags: require sustained readings (timers reset if condition breaks or data is lost)
-        if temp is None:
-            high_temp_since = low_temp_since = severe_low_since = None
-            high_temp_episode_fired = low_temp_episode_fired = severe_low_episode_fired = False
-        else:
-            if temp < SEVERE_LOW_TEMP_THRESHOLD:
-                if severe_low_since is None:
-                    severe_low_since = timestamp
-                elif (
-                    not severe_low_episode_fired
-                    and (timestamp - severe_low_since) >= SEVERE_LOW_DURATION_SEC
-                ):
-                    insert_flag(
-                        "Severe Low Temperature",
-                        f"Sustained temperature below {SEVERE_LOW_TEMP_THRESHOLD:.0f}°F for over "
-                        f"{SEVERE_LOW_DURATION_SEC // 60:.0f} min (current {temp:.1f}°F).",
-                    )
-                    last_flag_times["Severe Low Temperature"] = timestamp
-                    severe_low_episode_fired = True
-            else:
-                severe_low_since = None
-                severe_low_episode_fired = False
-
-            if temp > HIGH_TEMP_THRESHOLD:
-                if high_temp_since is None:
-                    high_temp_since = timestamp
-                elif (
-                    not high_temp_episode_fired
-                    and (timestamp - high_temp_since) >= TEMP_HIGH_LOW_DURATION_SEC
-                ):
-                    insert_flag(
-                        "High Temperature",
-                        f"Sustained temperature above {HIGH_TEMP_THRESHOLD:.0f}°F for over "
-                        f"{TEMP_HIGH_LOW_DURATION_SEC // 60:.0f} min (current {temp:.1f}°F).",
-                    )
-                    last_flag_times["High Temperature"] = timestamp
-                    high_temp_episode_fired = True
-            else:
-                high_temp_since = None
-                high_temp_episode_fired = False
-
-            if temp < LOW_TEMP_THRESHOLD:
-                if low_temp_since is None:
-                    low_temp_since = timestamp
-                elif (
-                    not low_temp_episode_fired
-                    and (timestamp - low_temp_since) >= TEMP_HIGH_LOW_DURATION_SEC
-                ):
-                    insert_flag(
-                        "Low Temperature",
-                        f"Sustained temperature below {LOW_TEMP_THRESHOLD:.0f}°F for over "
-                        f"{TEMP_HIGH_LOW_DURATION_SEC // 60:.0f} min (current {temp:.1f}°F).",
-                    )
-                    last_flag_times["Low Temperature"] = timestamp
-                    low_temp_episode_fired = True
-            else:
-                low_temp_since = None
-                low_temp_episode_fired = False
-
-        conn.commit()
-
-        print(f"BPM={bpm} | Temp={temp} | Steps={steps} | Limp={limp} | High HR = {high_hr}| Low HR = {low_hr} | Unstable HR = {unstable_hr} | Rapid Change in BPM = {rapid_change}")
-
-        time.sleep(1)
+        harness_logger.tick(sensor_manager)
+        time.sleep(LOG_INTERVAL_SEC)
 
 except KeyboardInterrupt:
     print("Stopping...")
@@ -396,4 +93,7 @@ finally:
     sensor_manager.join()
     step_counter.stop()
     hrm.stop_sensor()
-    conn.close()
\ No newline at end of file
+    if DSP_PROCESS:
+        hrm.close()
+    harness_logger.flush()
+    conn.close()
@@ -1,43 +1,68 @@
 # Switch from arrythmia detection to detecting abnormal heart rates
 import time
 import threading
+from collections import deque
+
 import numpy as np
-from scipy.signal import butter, filtfilt, find_peaks
 from heartrate_sensor.max30102 import MAX30102
+from beat_detector import StreamingBeatDetector
+from spectral_hr import SpectralBPMEstimator
+from ppg_quality import CONTACT_MIN, assess_window
+from motion_artifact import MotionArtifactCanceller
+from hrv import NO_HRV, RollingHRV
 
-
-def bandpass_filter(signal, fs=100, low=1.0, high=4.0):
-    b, a = butter(2, [low / (fs / 2), high / (fs / 2)], btype='band')
-    return filtfilt(b, a, signal)
-
-
-def detect_arrhythmia(rr_intervals):
-    if len(rr_intervals) < 5:
-        return False
-
-    rr_mean = np.mean(rr_intervals)
-    for rr in rr_intervals:
-        if abs(rr - rr_mean) > 0.3 * rr_mean:
-            return True
-    return False
+# BPM is the median of this many most recent RR intervals
+BPM_MEDIAN_BEATS = 10
+# BPM drops to 0 when no usable beat/estimate has been seen for this long
+BEAT_TIMEOUT_SEC = 10
+# Contact must be lost this long before all HR state is reset
+NO_CONTACT_SEC = 1.0
 
 
 class HeartRateMonitor:
     starting_BPM = 0
 
-    def __init__(self, print_raw=False, print_result=True):
+    def __init__(self, print_raw=False, print_result=True, open_sensor=True, bpm_method="beats"):
         self.print_raw = print_raw
         self.print_result = print_result
+        # "beats": median RR of detected beats; "spectral": Welch peak (spectral_hr.py)
+        self.bpm_method = bpm_method
 
-        self.sensor = MAX30102()
+        # open_sensor=False: DSP state only (dsp_worker.py runs one in its own process)
+        self.sensor = MAX30102() if open_sensor else None
         self.running = False
 
-        self.ir_buffer = []
-        self.rr_intervals = []
-        self.last_peak_time = None
-
         self.fs = 100  # Hz
-        self.buffer_size = self.fs * 10  # 10 seconds
+        # One update per sample; each beat is reported once (as last_beat)
+        self.detector = StreamingBeatDetector(self.fs)
+        self.last_beat = None
+        self.rr_intervals = deque(maxlen=30)
+        # Rolling RMSSD / SDNN / pNN50 over the accepted RR intervals (hrv.py)
+        self.hrv = RollingHRV()
+        self.rmssd = self.sdnn = self.pnn50 = None
+        # Runs alongside the beat detector (one FFT batch per second); the latest
+        # SpectralEstimate is kept whichever method drives bpm
+        self.spectral = SpectralBPMEstimator(self.fs)
+        self.spectral_estimate = None
+        # Signal quality of the latest window (ppg_quality.py); beats and estimates
+        # only count while it is good
+        self.signal_quality = None
+        self.sqi = None
+        self._beat_samples = deque(maxlen=64)
+        # Beats seen before the window's first assessment; judged by that assessment
+        self._unassessed_beats = []
+        self._prev_beat_used = False
+        self._in_dropout = False
+        self._last_used_at = None
+        self._no_contact_samples = 0
+        self._last_contact_ir = None
+        self._hop_estimate = None
+        self._samples_fed = 0
+
+        # IMU-referenced motion cancellation (set_motion_source); None = off
+        self.motion_source = None
+        self.motion_canceller = None
+        self._pending_raw = []
 
         self.bpm = self.starting_BPM
         self.arrhythmia_flag = False
@@ -49,8 +74,46 @@ class HeartRateMonitor:
         self.rapid_change_flag = False
         self.unstable_hr_flag = False
 
-        # NEW: BPM history
-        self.bpm_history = []
+        # NEW: BPM history (one entry per beat)
+        self.bpm_history = deque(maxlen=10)
+
+        # Called as listener(hrm) whenever bpm or an HR flag changes
+        self.listeners = []
+        self._last_published = None
+        # Called as listener(beat_time, rr) for every accepted RR interval
+        self.rr_listeners = []
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def add_rr_listener(self, listener):
+        self.rr_listeners.append(listener)
+
+    def publish_if_changed(self):
+        state = (
+            self.bpm,
+            self.high_hr_flag,
+            self.low_hr_flag,
+            self.rapid_change_flag,
+            self.unstable_hr_flag,
+            self.sqi,
+            self.rmssd,
+            self.sdnn,
+            self.pnn50,
+        )
+        if state != self._last_published:
+            self._last_published = state
+            for listener in self.listeners:
+                listener(self)
+
+    def set_motion_source(self, source):
+        """
+        source() -> current accelerometer readings (e.g.
+        DualIMUStepAnalyzer.motion_reference); sampled with every PPG sample as the
+        noise reference for motion_artifact.MotionArtifactCanceller.
+        """
+        self.motion_source = source
+        self.motion_canceller = MotionArtifactCanceller(self.fs, len(source()))
 
     def start_sensor(self):
         self.running = True
@@ -64,73 +127,181 @@ class HeartRateMonitor:
     def _run(self):
         while self.running:
             red, ir = self.sensor.read_fifo()
+            if self.handle_sample(red, ir):
+                self.process_signal()
+            self.publish_if_changed()
+            time.sleep(1 / self.fs)
 
-            # Basic signal quality check
-            if ir < 5000:
-                # No finger/contact detected → reset values
-                self.ir_buffer.clear()
-                self.rr_intervals.clear()
-                self.last_peak_time = None
-
-                self.bpm = 0
-                self.arrhythmia_flag = False
-                self.bpm_history.clear()
-                self.high_hr_flag = False
-                self.low_hr_flag = False
-                self.rapid_change_flag = False
-                self.unstable_hr_flag = False
-
+    def handle_sample(self, red, ir):
+        """
+        Feed one FIFO reading. Returns True when process_signal() should update
+        BPM and the HR flags: once per RR interval (bpm_method="beats") or per
+        spectral estimate ("spectral"), and only while the signal quality is good.
+        (The threaded and asyncio runtimes both drive this.)
+        """
+        # Basic signal quality check: only a sustained loss of contact resets
+        if ir < CONTACT_MIN:
+            self._no_contact_samples += 1
+            if self._no_contact_samples == int(NO_CONTACT_SEC * self.fs):
+                self._reset()
                 if self.print_result:
                     print("No contact - BPM: 0")
+            if self._no_contact_samples >= int(NO_CONTACT_SEC * self.fs):
+                return False
+        else:
+            self._no_contact_samples = 0
+            self._last_contact_ir = ir
+
+        if self._samples_fed == 0:
+            # Beat timestamps are sample-clock seconds from the first contact sample
+            now = time.time()
+            self.detector.reset(start_time=now)
+            self.spectral.reset(start_time=now)
+        self._samples_fed += 1
+
+        # During a brief dropout the filters hold the last contact value instead of
+        # seeing a huge step; _process_sample restarts the SQI window after it.
+        held = ir if self._last_contact_ir is None or ir >= CONTACT_MIN else self._last_contact_ir
+        if self.motion_canceller is None:
+            return self._process_sample(held, ir >= CONTACT_MIN)
+
+        self._pending_raw.append(ir)
+        cleaned = self.motion_canceller.push(held, self.motion_source())
+        if cleaned is None:
+            return False
+        ready = False
+        for x, raw in zip(cleaned.tolist(), self._pending_raw):
+            ready |= self._process_sample(x, raw >= CONTACT_MIN)
+        self._pending_raw = []
+        return ready
+
+    def _process_sample(self, x, contact):
+        """Beat detection, spectral window and gating for one (cleaned) sample."""
+        if not contact and not self._in_dropout:
+            # Only the segment around the dropout is lost: RR pairing and quality
+            # restart, the BPM shown so far stays (until BEAT_TIMEOUT_SEC).
+            self._in_dropout = True
+            self.signal_quality = None
+            self.sqi = None
+            self._unassessed_beats = []
+            self._prev_beat_used = False
+        elif contact and self._in_dropout:
+            self._in_dropout = False
+            self.spectral.mark_gap()
+
+        beat = self.detector.update(x)
+        retro_ready = False
+        if self.spectral.push(x) and contact:
+            retro_ready = self._assess_quality()
 
-                time.sleep(1 / self.fs)
-                continue
-
-            self.ir_buffer.append(ir)
-
-            if len(self.ir_buffer) > self.buffer_size:
-                self.ir_buffer.pop(0)
-
-            if len(self.ir_buffer) == self.buffer_size:
-                self.process_signal()
-
-            time.sleep(1 / self.fs)
+        if self.print_raw:
+            print(self.detector.filtered)
+
+        good = self.signal_quality is not None and self.signal_quality.good
+        ready = retro_ready and self.bpm_method == "beats"
+        if beat is not None:
+            self.last_beat = beat
+            self._beat_samples.append(beat.sample)
+            if self.signal_quality is None:
+                self._unassessed_beats.append(beat)
+            else:
+                # An RR interval counts only if both of its beats came from good windows
+                if good and self._prev_beat_used and beat.rr is not None:
+                    self._accept_rr(beat)
+                    ready = self.bpm_method == "beats"
+                self._prev_beat_used = good
+        if self.bpm_method == "spectral" and self._hop_estimate is not None:
+            ready = good
+            self._hop_estimate = None
+
+        if ready:
+            self._last_used_at = self.detector.time
+        elif self.bpm and self.detector.time - (self._last_used_at or 0) > BEAT_TIMEOUT_SEC:
+            self._clear_hr()
+        return ready
+
+    def _assess_quality(self):
+        """
+        Score the latest window. Returns True when the first assessment after a
+        (re)start accepted the beats that arrived while the window was filling.
+        """
+        first = self.signal_quality is None
+        window_start = self.spectral.n - self.spectral.filled
+        offsets = [n - window_start for n in self._beat_samples if n >= window_start]
+        self.signal_quality, estimate = assess_window(
+            self.spectral.window(), self.fs, offsets, self.spectral, self.detector.time
+        )
+        self.sqi = self.signal_quality.sqi
+        # None when the window failed the cheap checks (no FFT was run)
+        self._hop_estimate = estimate
+        if estimate is not None:
+            self.spectral_estimate = estimate
+
+        if not first:
+            return False
+        # Provisional BPM: beats inside a good first window count straight away
+        # instead of waiting for the next ones
+        beats = [b for b in self._unassessed_beats if b.sample >= window_start]
+        self._unassessed_beats = []
+        if not self.signal_quality.good:
+            return False
+        self._prev_beat_used = bool(beats)
+        accepted = [b for b in beats[1:] if b.rr is not None]
+        for beat in accepted:
+            self._accept_rr(beat)
+        return bool(accepted)
+
+    def _accept_rr(self, beat):
+        self.rr_intervals.append(beat.rr)
+        self.rmssd, self.sdnn, self.pnn50 = self.hrv.add(beat.time, beat.rr)
+        for listener in self.rr_listeners:
+            listener(beat.time, beat.rr)
+
+    def _reset(self):
+        self.detector.reset()
+        self.spectral.reset()
+        self.last_beat = None
+        self.spectral_estimate = None
+        self.signal_quality = None
+        self.sqi = None
+        self._hop_estimate = None
+        self._beat_samples.clear()
+        self._unassessed_beats = []
+        self._prev_beat_used = False
+        self._in_dropout = False
+        self._last_contact_ir = None
+        self._samples_fed = 0
+        self._pending_raw = []
+        if self.motion_canceller is not None:
+            self.motion_canceller.reset()
+        self.rr_intervals.clear()
+        self.hrv.reset()
+        self.rmssd, self.sdnn, self.pnn50 = NO_HRV
+        self.bpm_history.clear()
+        self._clear_hr()
+
+    def _clear_hr(self):
+        self.bpm = 0
+        self.arrhythmia_flag = False
+        self.high_hr_flag = False
+        self.low_hr_flag = False
+        self.rapid_change_flag = False
+        self.unstable_hr_flag = False
 
     def process_signal(self):
-        signal = np.array(self.ir_buffer)
-
-        # Remove DC offset
-        signal = signal - np.mean(signal)
-
-        # Filter for dog heart rate range
-        filtered = bandpass_filter(signal, fs=self.fs)
-
-        # Detect peaks
-        peaks, _ = find_peaks(filtered, distance=int(self.fs * 0.4))
-
-        if len(peaks) < 2:
-            self.bpm = 0
-            self.arrhythmia_flag = False
-            return
-
-        peak_times = peaks / self.fs
-        rr_intervals = np.diff(peak_times)
-
-        # Save RR intervals
-        self.rr_intervals.extend(rr_intervals)
-        self.rr_intervals = self.rr_intervals[-30:]
-
-        # UPDATED: use median for stability
-        if len(rr_intervals) > 0:
-            self.bpm = 60 / np.median(rr_intervals)
+        """
+        Per-beat (or, with bpm_method="spectral", per confident estimate) update:
+        BPM, then the HR flags.
+        """
+        if self.bpm_method == "spectral":
+            self.bpm = self.spectral_estimate.bpm
         else:
-            self.bpm = 0
+            recent = list(self.rr_intervals)[-BPM_MEDIAN_BEATS:]
+            # UPDATED: use median for stability
+            self.bpm = 60 / float(np.median(recent))
 
         # NEW: update BPM history
         self.bpm_history.append(self.bpm)
-        self.bpm_history = self.bpm_history[-10:]
-
-       
 
         # High / Low BPM
         self.high_hr_flag = self.bpm > 180
@@ -159,9 +330,6 @@ class HeartRateMonitor:
         # Keep arrhythmia_flag unused but set False
         self.arrhythmia_flag = False
 
-        if self.print_raw:
-            print(filtered[-1])
-
         if self.print_result:
             print(
                 f"BPM: {self.bpm:.1f} | "